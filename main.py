@@ -1,9 +1,30 @@
 import sys
 
-from PyQt6.QtWidgets import QApplication
-from src.app import AutoBrightnessApp
+from src.startup_profile import profiler
 
 if __name__ == "__main__":
+    if "--profile-startup" in sys.argv:
+        sys.argv.remove("--profile-startup")
+        profiler.enabled = True
+
+    # Heavy modules are imported here rather than at the top so the
+    # profiler can attribute their cost
+    from PyQt6.QtCore import QTimer
+    from PyQt6.QtWidgets import QApplication
+    profiler.mark("PyQt6 imported")
+
+    from src.app import AutoBrightnessApp
+    profiler.mark("application modules imported")
+
     app = QApplication(sys.argv)
+    profiler.mark("QApplication created")
+
     auto_brightness_app = AutoBrightnessApp()
-    sys.exit(app.exec())
\ No newline at end of file
+    profiler.mark("main window created")
+
+    def on_event_loop_started() -> None:
+        profiler.mark("event loop running")
+        profiler.report()
+
+    QTimer.singleShot(0, on_event_loop_started)
+    sys.exit(app.exec())
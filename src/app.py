@@ -1,32 +1,43 @@
 import sys
+from typing import Optional
 from PyQt6.QtWidgets import QApplication, QMessageBox
-from PyQt6.QtCore import Qt
-from PyQt6.QtGui import QPixmap, QPainter, QColor, QFont
+from PyQt6.QtCore import QEvent
 
 from .config import Config
 from .logger import logger
-from .webcam_controller import WebcamController
+from .startup_profile import profiler
 from .ui import AutoBrightnessUI
 
 
 class AutoBrightnessApp(AutoBrightnessUI):
     def __init__(self):
         try:
-            super().__init__()
-            self.config = Config()
-            
+            # Loaded once and shared with the UI and the webcam controller
+            super().__init__(Config())
+            profiler.mark("config loaded and UI built")
+            # Edits made to config.json by hand or by config tooling are
+            # applied without a restart
+            self.config.subscribe(lambda config: self.config_reloaded_signal.emit())
+            self.config.start_watching()
+
             # Initialize webcam controller
             self.webcam_controller = None
+            self.stats_panel = None
+            self.duty_cycle = None
+            self.last_reading = None
             
             # Connect signals
             self.start_stop_signal.connect(self.toggle_webcam)
             self.reset_signal.connect(self.reset_webcam)
+            self.calibration_signal.connect(self.toggle_calibration)
+            self.calibration_slider.valueChanged.connect(self.set_calibration_level)
+            self.stats_signal.connect(self.show_stats)
             
             # Show the main window
             self.show()
             logger.info("Application initialized successfully")
         except Exception as e:
-            logger.critical(f"Failed to initialize application: {e}")
+            logger.critical("Failed to initialize application: %s", e)
             QMessageBox.critical(
                 None,
                 "Critical Error",
@@ -42,81 +53,171 @@ class AutoBrightnessApp(AutoBrightnessUI):
             else:
                 self.stop_webcam()
         except Exception as e:
-            logger.error(f"Error toggling webcam: {e}")
+            logger.error("Error toggling webcam: %s", e)
             self.show_error("Webcam Error", f"Failed to toggle webcam: {str(e)}")
 
     def start_webcam(self) -> None:
         """Start webcam capture"""
         try:
-            self.webcam_controller = WebcamController(
-                self.brightness_slider,
-                self.exposure_slider
-            )
-            self.webcam_controller.frame_ready.connect(self.update_display)
-            self.webcam_controller.camera_error.connect(
-                lambda msg: self.show_error("Camera Error", msg)
-            )
+            # OpenCV, NumPy and the brightness backend are only loaded once
+            # the user actually starts the webcam, keeping startup fast
+            from .webcam_controller import WebcamController
+            profiler.mark("capture pipeline imported")
+
+            # The controller lives for the rest of the session so the
+            # brightness backend and the open camera survive Stop and Reset
+            if self.webcam_controller is None:
+                self.webcam_controller = WebcamController(
+                    self.config,
+                    self.brightness_slider,
+                    self.exposure_slider,
+                    self.smooth_transitions_checkbox,
+                )
+                profiler.mark("brightness backend initialized")
+                self.webcam_controller.frame_ready.connect(self.update_display)
+                # Bound slots (not lambdas) so signals emitted from the worker
+                # threads are queued onto the GUI thread
+                self.webcam_controller.camera_error.connect(self.show_camera_error)
+                self.webcam_controller.duty_cycle_changed.connect(self.update_duty_cycle)
+                self.webcam_controller.capture_lost.connect(self.show_capture_lost)
             self.webcam_controller.start_webcam()
+            profiler.mark("webcam started")
+            profiler.report()
             logger.info("Webcam started")
         except Exception as e:
-            logger.error(f"Error starting webcam: {e}")
+            logger.error("Error starting webcam: %s", e)
             self.show_error("Webcam Error", f"Failed to start webcam: {str(e)}")
 
-    def stop_webcam(self) -> None:
-        """Stop webcam capture"""
+    def stop_webcam(self, release: Optional[bool] = None) -> None:
+        """Stop webcam capture, keeping the camera open if configured to"""
+        if release is None:
+            release = not self.config.get("camera", "keep_open_when_stopped")
+        # Finishing here saves what was recorded before the camera stops
+        self.calibrate_button.setChecked(False)
         try:
             if self.webcam_controller:
-                self.webcam_controller.stop_webcam()
-                self.webcam_controller = None
+                self.webcam_controller.stop_webcam(release=release)
                 logger.info("Webcam stopped")
         except Exception as e:
-            logger.error(f"Error stopping webcam: {e}")
+            logger.error("Error stopping webcam: %s", e)
             self.show_error("Webcam Error", f"Failed to stop webcam: {str(e)}")
 
     def reset_webcam(self) -> None:
-        """Reset webcam capture"""
+        """Re-apply the reset parameters and drop the calibrated curve"""
         try:
             if self.webcam_controller:
-                self.webcam_controller.stop_webcam()
-                self.start_webcam()
+                # Cleared first, so leaving calibration below saves nothing
+                self.webcam_controller.clear_calibration()
+                self.calibrate_button.setChecked(False)
+                self.webcam_controller.apply_parameters()
                 logger.info("Webcam reset")
+            else:
+                from .calibration import clear_calibration
+                clear_calibration(self.config)
+            self.update_threshold_controls()
         except Exception as e:
-            logger.error(f"Error resetting webcam: {e}")
+            logger.error("Error resetting webcam: %s", e)
             self.show_error("Webcam Error", f"Failed to reset webcam: {str(e)}")
 
-    def update_display(self, pixmap: QPixmap, luminance: float, brightness: int) -> None:
-        """Update the display with new camera frame and information"""
+    def toggle_calibration(self, enabled: bool) -> None:
+        """Start recording calibration samples, or fit and save the curve"""
         try:
-            # Update camera view
-            scaled_pixmap = pixmap.scaled(
-                360, 270,
-                aspectRatioMode=Qt.AspectRatioMode.KeepAspectRatio
-            )
-            self.camera_label.setPixmap(scaled_pixmap)
+            if enabled:
+                core = self.webcam_controller.core if self.webcam_controller else None
+                if core is None or not core.running or core.paused:
+                    self.calibrate_button.setChecked(False)
+                    self.show_error("Calibration", "Start the webcam before calibrating.")
+                    return
+                # Start from the level currently on screen
+                if self.last_reading is not None:
+                    self.calibration_slider.setValue(self.last_reading[1])
+                self.webcam_controller.start_calibration(self.calibration_slider.value())
+            elif self.webcam_controller:
+                if self.webcam_controller.finish_calibration():
+                    logger.info("Brightness curve calibrated")
+                self.update_threshold_controls()
+        except Exception as e:
+            logger.error("Error toggling calibration: %s", e)
+            self.show_error("Calibration Error", f"Failed to toggle calibration: {str(e)}")
 
-            # Update info display
-            self.info_label.setText(
-                f"Luminance: {luminance:.2f}\nBrightness: {brightness}%"
-            )
+    def set_calibration_level(self, level: int) -> None:
+        """Forward the calibration slider to the display"""
+        if self.webcam_controller:
+            self.webcam_controller.set_calibration_level(level)
+
+    def show_stats(self) -> None:
+        """Open the pipeline statistics window"""
+        try:
+            if self.stats_panel is None:
+                from .stats_panel import StatsPanel
+                self.stats_panel = StatsPanel(
+                    lambda: self.webcam_controller.core.metrics if self.webcam_controller else None
+                )
+            self.stats_panel.show()
+            self.stats_panel.raise_()
+        except Exception as e:
+            logger.error("Error showing statistics: %s", e)
+
+    def update_display(self, luminance: float, brightness: int, latency_ms: float) -> None:
+        """Update the preview and information display with a new reading"""
+        self.last_reading = (luminance, brightness, latency_ms)
+        # Nothing is visible, so skip the work until the window comes back
+        if self.isMinimized() or not self.isVisible():
+            return
+
+        try:
+            self.preview.set_luminance(luminance)
+
+            details = f"{latency_ms:.0f} ms"
+            if self.duty_cycle is not None:
+                details += f", camera on {self.duty_cycle:.0%}"
+            text = f"Luminance: {luminance:.2f}\nBrightness: {brightness}% ({details})"
+            if text != self.info_label.text():
+                self.info_label.setText(text)
         except Exception as e:
-            logger.error(f"Error updating display: {e}")
+            logger.error("Error updating display: %s", e)
+
+    def changeEvent(self, event) -> None:
+        """Refresh the display when the window is restored"""
+        super().changeEvent(event)
+        if (
+            event.type() == QEvent.Type.WindowStateChange
+            and not self.isMinimized()
+            and self.last_reading is not None
+        ):
+            self.update_display(*self.last_reading)
+
+    def update_duty_cycle(self, duty_cycle: float) -> None:
+        """Remember the camera duty cycle for the info display"""
+        self.duty_cycle = duty_cycle
+
+    def show_capture_lost(self, message: str) -> None:
+        """Show that the light source is being reopened; the next reading replaces it"""
+        self.info_label.setText(f"Camera unavailable, reconnecting...\n{message}")
+
+    def show_camera_error(self, message: str) -> None:
+        """Show an error reported by the webcam controller"""
+        self.show_error("Camera Error", message)
 
     def show_error(self, title: str, message: str) -> None:
         """Show error dialog"""
         try:
             QMessageBox.critical(self, title, message)
-            logger.error(f"Error dialog shown: {title} - {message}")
+            logger.error("Error dialog shown: %s - %s", title, message)
         except Exception as e:
-            logger.error(f"Error showing error dialog: {e}")
+            logger.error("Error showing error dialog: %s", e)
 
     def closeEvent(self, event) -> None:
         """Handle application close event"""
         try:
-            self.stop_webcam()
+            self.stop_webcam(release=True)
+            if self.stats_panel is not None:
+                self.stats_panel.close()
+            self.config.close()
             event.accept()
             logger.info("Application closed")
         except Exception as e:
-            logger.error(f"Error during application close: {e}")
+            logger.error("Error during application close: %s", e)
             event.accept()
 
 
@@ -0,0 +1,490 @@
+"""Headless benchmarks for the Auto Brightness hot paths.
+
+Neither a camera nor a display is needed, so these can run on a CI box.
+
+Usage:
+    python -m src.benchmark frames [--width W --height H --frames N]
+                                   [--noise SIGMA --ramp FROM:TO --spikes P]
+                                   [--video PATH] [--methods mean,downscale,...]
+                                   [--allocations] [--scene-detection]
+                                   [--filter none,ema,median,one_euro]
+    python -m src.benchmark backend [--iterations N] [--sysfs-root PATH]
+    python -m src.benchmark mapping [--iterations N] [--threshold T]
+    python -m src.benchmark sensor [--iterations N] [--sysfs-root PATH]
+    python -m src.benchmark yuyv [--file PATH] [--width W --height H]
+                                 [--frames N] [--methods mean,downscale,...]
+"""
+import argparse
+import itertools
+import os
+import statistics
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from .brightness_control import (
+    BrightnessController,
+    CachedBrightnessController,
+    LinuxBrightnessController,
+    NullBrightnessController,
+    SysfsBacklightController,
+    within_deadband,
+)
+from .calibration import BrightnessCurve, get_brightness_curve
+from .config import Config
+from .filters import LuminanceFilter, get_luminance_filter
+from .light_source import IIO_ROOT, IioLightSensor, find_illuminance_sensors
+from .luminance import (
+    DownscaleEstimator,
+    FullFrameEstimator,
+    LuminanceEstimator,
+    PercentileEstimator,
+    StridedEstimator,
+    limited_to_full_range,
+    luminance_to_brightness,
+)
+from .ramp import BrightnessRamp
+from .scene import SceneChangeDetector
+from .v4l2 import YuyvFileCamera
+
+STAGES = ("read", "detect", "sample", "measure", "filter", "map", "smooth", "apply")
+
+
+def summarize(samples_ms: List[float]) -> Dict[str, float]:
+    """Mean, p50, p99 and max of a list of timings in milliseconds"""
+    ordered = sorted(samples_ms)
+    if not ordered:
+        return {"mean": 0.0, "p50": 0.0, "p99": 0.0, "max": 0.0}
+    return {
+        "mean": statistics.fmean(ordered),
+        "p50": ordered[len(ordered) // 2],
+        "p99": ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))],
+        "max": ordered[-1],
+    }
+
+
+def format_summary(name: str, samples_ms: List[float]) -> str:
+    stats = summarize(samples_ms)
+    return (
+        f"{name:<24} mean {stats['mean']:8.3f} ms  p50 {stats['p50']:8.3f} ms  "
+        f"p99 {stats['p99']:8.3f} ms  max {stats['max']:8.3f} ms"
+    )
+
+
+def time_calls(func: Callable[[int], object], iterations: int) -> List[float]:
+    samples = []
+    for i in range(iterations):
+        started = time.perf_counter()
+        func(i)
+        samples.append((time.perf_counter() - started) * 1000)
+    return samples
+
+
+class SyntheticSource:
+    """Generates BGR frames with sensor-like noise and a lighting ramp.
+
+    A small pool of noise patterns is generated up front and the lighting
+    level is added into a reused buffer, so "reading" a frame costs about
+    as much as a camera driver copying one out. With `spikes` set, that
+    fraction of frames gets a momentary jump in brightness, like someone
+    in a white shirt walking past.
+    """
+
+    def __init__(
+        self,
+        width: int = 1280,
+        height: int = 720,
+        frames: int = 300,
+        noise: float = 8.0,
+        ramp: Tuple[float, float] = (40.0, 200.0),
+        pool_size: int = 8,
+        seed: int = 0,
+        spikes: float = 0.0,
+    ):
+        self.frames = frames
+        self.ramp = ramp
+        rng = np.random.default_rng(seed)
+        self._spikes = rng.random(frames) < spikes
+        self._pool = [
+            np.clip(rng.normal(0, noise, (height, width, 3)) + 128, 0, 255).astype(np.uint8)
+            for _ in range(pool_size)
+        ]
+        self._buffer = np.empty((height, width, 3), dtype=np.uint8)
+
+    def __iter__(self) -> Iterator[np.ndarray]:
+        start, end = self.ramp
+        for index in range(self.frames):
+            level = start + (end - start) * index / max(1, self.frames - 1) - 128
+            if self._spikes[index]:
+                level += 80
+            noise = self._pool[index % len(self._pool)]
+            if level >= 0:
+                cv2.add(noise, (level, level, level, 0), dst=self._buffer)
+            else:
+                cv2.subtract(noise, (-level, -level, -level, 0), dst=self._buffer)
+            yield self._buffer
+
+
+class VideoFileSource:
+    """Replays a recorded video file, looping until enough frames were read"""
+
+    def __init__(self, path: str, frames: int = 300):
+        self.path = path
+        self.frames = frames
+
+    def __iter__(self) -> Iterator[np.ndarray]:
+        cap = cv2.VideoCapture(self.path)
+        if not cap.isOpened():
+            raise RuntimeError(f"Failed to open video file {self.path}")
+        try:
+            for _ in range(self.frames):
+                ret, frame = cap.read()
+                if not ret:
+                    cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                    ret, frame = cap.read()
+                    if not ret:
+                        return
+                yield frame
+        finally:
+            cap.release()
+
+
+class FrameBenchmark:
+    """Runs frames through the same stages as AutoBrightnessCore.update_frame"""
+
+    def __init__(
+        self,
+        estimator: LuminanceEstimator,
+        threshold: int = 190,
+        fps: float = 30.0,
+        controller: Optional[BrightnessController] = None,
+        config: Optional[Config] = None,
+        detector: Optional[SceneChangeDetector] = None,
+        luminance_filter: Optional[LuminanceFilter] = None,
+    ):
+        config = config or Config()
+        self.estimator = estimator
+        self.detector = detector
+        self.luminance_filter = luminance_filter or get_luminance_filter(config)
+        self.threshold = threshold
+        self.curve = get_brightness_curve(config, threshold)
+        self.dt = 1.0 / fps
+        self.null_controller = controller or NullBrightnessController()
+        self.deadband = config.get("brightness", "deadband")
+        self.controller = CachedBrightnessController(self.null_controller, max_rate=0)
+        self.ramp = BrightnessRamp(
+            self.controller,
+            curve=config.get("ramp", "curve"),
+            rate_hz=config.get("ramp", "rate_hz"),
+            max_slew=config.get("ramp", "max_slew"),
+            time_constant=config.get("ramp", "time_constant"),
+            gamma=config.get("ramp", "gamma"),
+        )
+
+    def run(self, source, allocations: bool = False) -> Dict[str, object]:
+        timings: Dict[str, List[float]] = {stage: [] for stage in STAGES}
+        totals: List[float] = []
+        peaks: List[int] = []
+        current: Optional[float] = None
+        target: Optional[int] = None
+
+        if allocations:
+            tracemalloc.start()
+        frames = iter(source)
+        wall_started = time.perf_counter()
+        for index in itertools.count():
+            if allocations:
+                tracemalloc.reset_peak()
+                baseline = tracemalloc.get_traced_memory()[0]
+
+            # One timestamp before the first stage and after each stage
+            marks = [time.perf_counter()]
+            frame = next(frames, None)
+            if frame is None:
+                break
+            marks.append(time.perf_counter())
+            changed = self.detector is None or self.detector.changed(frame)
+            marks.append(time.perf_counter())
+            if changed:
+                sample = self.estimator.sample(frame)
+                marks.append(time.perf_counter())
+                measured = self.estimator.measure(sample)
+                marks.append(time.perf_counter())
+                # Frames are timestamped on the simulated capture clock
+                luminance = self.luminance_filter.update(measured, index * self.dt)
+                if self.detector is not None and abs(luminance - measured) > self.detector.threshold:
+                    self.detector.invalidate()
+                marks.append(time.perf_counter())
+                mapped = self.curve.map(luminance)
+                if not within_deadband(mapped, target, self.deadband):
+                    target = mapped
+                marks.append(time.perf_counter())
+                current = target if current is None else self.ramp.step(current, target, self.dt)
+                marks.append(time.perf_counter())
+                self.controller.set_brightness(int(round(current)))
+                marks.append(time.perf_counter())
+
+            if allocations:
+                peaks.append(tracemalloc.get_traced_memory()[1] - baseline)
+            # Skipped frames only cost the read and the detector
+            for stage, started, ended in zip(STAGES, marks, marks[1:]):
+                timings[stage].append((ended - started) * 1000)
+            totals.append((marks[-1] - marks[0]) * 1000)
+        wall = time.perf_counter() - wall_started
+        if allocations:
+            tracemalloc.stop()
+
+        return {
+            "frames": len(totals),
+            "fps": len(totals) / wall if wall > 0 else 0.0,
+            "stages": timings,
+            "latency": totals,
+            "peak_alloc": peaks,
+            "writes": self.controller.write_count,
+            "skipped": self.detector.skipped_frames if self.detector else 0,
+        }
+
+
+def estimators_for(methods: List[str], config: Config) -> Dict[str, LuminanceEstimator]:
+    available = {
+        "mean": lambda: FullFrameEstimator(),
+        "strided": lambda: StridedEstimator(stride=config.get("luminance", "stride")),
+        "downscale": lambda: DownscaleEstimator(
+            sample_width=config.get("luminance", "sample_width")
+        ),
+        "percentile": lambda: PercentileEstimator(
+            percentile=config.get("luminance", "percentile"),
+            sample_width=config.get("luminance", "sample_width"),
+        ),
+    }
+    unknown = [method for method in methods if method not in available]
+    if unknown:
+        raise SystemExit(f"Unknown luminance method(s): {', '.join(unknown)}")
+    return {method: available[method]() for method in methods}
+
+
+def run_frames(args: argparse.Namespace) -> None:
+    config = Config()
+    start, end = (float(value) for value in args.ramp.split(":"))
+    for method, estimator in estimators_for(args.methods.split(","), config).items():
+        if args.video:
+            source = VideoFileSource(args.video, args.frames)
+        else:
+            source = SyntheticSource(
+                args.width, args.height, args.frames, args.noise, (start, end),
+                spikes=args.spikes,
+            )
+        detector = None
+        if args.scene_detection:
+            detector = SceneChangeDetector(
+                threshold=config.get("scene", "threshold"),
+                grid=(config.get("scene", "grid_width"), config.get("scene", "grid_height")),
+            )
+        result = FrameBenchmark(
+            estimator, args.threshold, config=config, detector=detector,
+            luminance_filter=get_luminance_filter(config, args.filter),
+        ).run(source, args.allocations)
+
+        print(
+            f"[{method}] {result['frames']} frames, {result['fps']:.1f} fps, "
+            f"{result['writes']} brightness writes, {result['skipped']} skipped"
+        )
+        for stage in STAGES:
+            print("  " + format_summary(stage, result["stages"][stage]))
+        print("  " + format_summary("total", result["latency"]))
+        if args.allocations and result["peak_alloc"]:
+            peaks = result["peak_alloc"]
+            print(
+                f"  {'peak alloc/frame':<24} mean {statistics.fmean(peaks) / 1024:8.1f} KiB"
+                f"  max {max(peaks) / 1024:8.1f} KiB"
+            )
+
+
+def benchmark_backend(controller: BrightnessController, iterations: int) -> List[float]:
+    """Time set_brightness calls sweeping across the whole range"""
+    return time_calls(lambda i: controller.set_brightness(i % 101), iterations)
+
+
+def run_backend(args: argparse.Namespace) -> None:
+    backends = {
+        "sysfs": lambda: SysfsBacklightController(root=args.sysfs_root),
+        "screen_brightness_control": LinuxBrightnessController,
+    }
+    for name, factory in backends.items():
+        controller = factory()
+        if not controller._enabled:
+            print(f"{name:<24} unavailable")
+            continue
+        print(format_summary(name, benchmark_backend(controller, args.iterations)))
+
+
+def run_mapping(args: argparse.Namespace) -> None:
+    """Compare the arithmetic mapping with the lookup tables"""
+    config = Config()
+    readings = np.random.default_rng(0).uniform(0, 255, args.iterations).tolist()
+    mappings = {
+        "formula": lambda luminance: luminance_to_brightness(luminance, args.threshold),
+        "linear lut": BrightnessCurve.linear(args.threshold).map,
+        "configured curve": get_brightness_curve(config, args.threshold).map,
+    }
+    for name, mapping in mappings.items():
+        # Per-call timer overhead would swamp a lookup, so time batches
+        batch = 1000
+        samples = time_calls(
+            lambda i: [mapping(luminance) for luminance in readings[i * batch:(i + 1) * batch]],
+            max(1, len(readings) // batch),
+        )
+        print(format_summary(name, [sample * 1000 / batch for sample in samples]).replace(" ms", " us"))
+
+
+def run_sensor(args: argparse.Namespace) -> None:
+    """Time pread-based reads of every ambient light sensor"""
+    sensors = find_illuminance_sensors(args.sysfs_root)
+    if not sensors:
+        print(f"No ambient light sensor under {args.sysfs_root}")
+        return
+    for device_dir in sensors:
+        sensor = IioLightSensor(device_dir)
+        try:
+            samples = time_calls(lambda i: sensor.read_lux(), args.iterations)
+            name = f"{sensor.name} ({sensor.read_lux():g} lux)"
+            micros = [sample * 1000 for sample in samples]
+            print(format_summary(name, micros).replace(" ms", " us"))
+        finally:
+            sensor.close()
+
+
+def write_synthetic_yuyv(path: str, width: int, height: int, frames: int) -> None:
+    """Write a noisy limited-range YUYV lighting ramp to a raw file"""
+    rng = np.random.default_rng(0)
+    with open(path, "wb") as file:
+        for index in range(frames):
+            level = 16 + 219 * index / max(1, frames - 1)
+            packed = np.full((height, width, 2), 128, dtype=np.uint8)
+            packed[:, :, 0] = np.clip(rng.normal(level, 8.0, (height, width)), 16, 235)
+            file.write(packed.tobytes())
+
+
+def run_yuyv(args: argparse.Namespace) -> None:
+    """Compare metering on the Y plane with decoding to BGR through OpenCV"""
+    config = Config()
+    path = args.file
+    if path is None:
+        handle, path = tempfile.mkstemp(suffix=".yuyv")
+        os.close(handle)
+        write_synthetic_yuyv(path, args.width, args.height, min(args.frames, 30))
+    try:
+        for method, estimator in estimators_for(args.methods.split(","), config).items():
+            camera = YuyvFileCamera(path, args.width, args.height)
+            indices = [index % camera.frame_count for index in range(args.frames)]
+            decoded: List[float] = []
+            direct: List[float] = []
+
+            def opencv(i: int) -> None:
+                frame = cv2.cvtColor(
+                    camera.packed_frame(indices[i]), cv2.COLOR_YUV2BGR_YUYV
+                )
+                decoded.append(estimator.estimate(frame))
+
+            def y_plane(i: int) -> None:
+                index, frame = camera.read()
+                direct.append(limited_to_full_range(estimator.estimate(frame)))
+                camera.requeue(index)
+
+            opencv_samples = time_calls(opencv, len(indices))
+            y_plane_samples = time_calls(y_plane, len(indices))
+            difference = statistics.fmean(
+                abs(a - b) for a, b in zip(decoded, direct)
+            )
+            print(f"[{method}] {len(indices)} frames, {args.width}x{args.height} YUYV")
+            print("  " + format_summary("opencv decode", opencv_samples))
+            print("  " + format_summary("y plane", y_plane_samples))
+            print(f"  {'mean difference':<24} {difference:8.3f} luminance levels")
+            camera.close()
+    finally:
+        if args.file is None:
+            os.remove(path)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Auto Brightness benchmarks")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    frames = subparsers.add_parser("frames", help="time the frame processing stages")
+    frames.add_argument("--width", type=int, default=1280)
+    frames.add_argument("--height", type=int, default=720)
+    frames.add_argument("--frames", type=int, default=300)
+    frames.add_argument("--noise", type=float, default=8.0, help="noise sigma")
+    frames.add_argument(
+        "--ramp", default="40:200", help="lighting ramp as FROM:TO luminance"
+    )
+    frames.add_argument(
+        "--spikes", type=float, default=0.0, help="fraction of frames with a momentary bright event"
+    )
+    frames.add_argument("--video", help="recorded video file instead of synthetic frames")
+    frames.add_argument("--threshold", type=int, default=190)
+    frames.add_argument(
+        "--methods",
+        default="mean,strided,downscale,percentile",
+        help="comma separated luminance methods to compare",
+    )
+    frames.add_argument(
+        "--allocations", action="store_true", help="also trace per-frame allocations"
+    )
+    frames.add_argument(
+        "--scene-detection",
+        action="store_true",
+        help="skip frames the scene change detector considers unchanged",
+    )
+    frames.add_argument(
+        "--filter", help="luminance filter to use instead of the configured one"
+    )
+    frames.set_defaults(func=run_frames)
+
+    backend = subparsers.add_parser("backend", help="compare Linux brightness backends")
+    backend.add_argument("--iterations", type=int, default=200)
+    backend.add_argument(
+        "--sysfs-root",
+        default=SysfsBacklightController.BACKLIGHT_ROOT,
+        help="backlight class directory, e.g. a fake tree for testing",
+    )
+    backend.set_defaults(func=run_backend)
+
+    mapping = subparsers.add_parser(
+        "mapping", help="compare the brightness formula with the lookup tables"
+    )
+    mapping.add_argument("--iterations", type=int, default=200000)
+    mapping.add_argument("--threshold", type=int, default=190)
+    mapping.set_defaults(func=run_mapping)
+
+    sensor = subparsers.add_parser("sensor", help="time ambient light sensor reads")
+    sensor.add_argument("--iterations", type=int, default=1000)
+    sensor.add_argument(
+        "--sysfs-root", default=IIO_ROOT, help="IIO device directory, e.g. a fake tree"
+    )
+    sensor.set_defaults(func=run_sensor)
+
+    yuyv = subparsers.add_parser(
+        "yuyv", help="compare Y-plane metering with decoding YUYV through OpenCV"
+    )
+    yuyv.add_argument("--file", help="raw YUYV recording instead of a synthetic ramp")
+    yuyv.add_argument("--width", type=int, default=640)
+    yuyv.add_argument("--height", type=int, default=480)
+    yuyv.add_argument("--frames", type=int, default=300)
+    yuyv.add_argument(
+        "--methods",
+        default="mean,downscale",
+        help="comma separated luminance methods to compare",
+    )
+    yuyv.set_defaults(func=run_yuyv)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
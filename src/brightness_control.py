@@ -1,6 +1,12 @@
+import os
 import sys
+import threading
+import time
 from abc import ABC, abstractmethod
-from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from .config import Config
 from .logger import logger
 
 
@@ -15,31 +21,98 @@ class BrightnessController(ABC):
         """Get current screen brightness level"""
         pass
 
+    @staticmethod
+    def list_displays() -> List[str]:
+        """Names of the displays this backend can control"""
+        return []
+
+    @staticmethod
+    def alternate_interfaces(displays: List[str]) -> List[str]:
+        """Entries of list_displays() that control a display listed before them"""
+        return []
+
+    def attach_thread(self) -> None:
+        """Prepare the calling thread to use this controller until detach_thread()"""
+        pass
+
+    def detach_thread(self) -> None:
+        """Release what attach_thread() set up for the calling thread"""
+        pass
+
 
 class WindowsBrightnessController(BrightnessController):
-    def __init__(self):
+    """Sets the brightness through WMI.
+
+    WMI objects are COM objects tied to the thread that created them, so
+    every thread gets its own. Worker threads that use the controller for
+    their whole lifetime call attach_thread() and detach_thread(); calls
+    from any other thread initialize COM just for that call.
+    """
+
+    def __init__(self, display: int = 0):
+        self.display = display
+        self._local = threading.local()
         try:
+            import pythoncom
             import wmi
 
-            self.wmi_interface = wmi.WMI(namespace="wmi")
+            self._pythoncom = pythoncom
+            self._wmi = wmi
             self._enabled = True
         except ImportError:
             logger.error("WMI module not available for Windows brightness control")
             self._enabled = False
-        except Exception as e:
-            logger.error(f"Failed to initialize Windows brightness control: {e}")
-            self._enabled = False
+
+    def attach_thread(self) -> None:
+        if self._enabled and not getattr(self._local, "attached", False):
+            self._pythoncom.CoInitialize()
+            self._local.attached = True
+
+    def detach_thread(self) -> None:
+        local = self._local
+        if getattr(local, "attached", False):
+            # The COM objects have to go before COM is shut down on this thread
+            local.interface = None
+            local.methods = None
+            local.attached = False
+            self._pythoncom.CoUninitialize()
+
+    @contextmanager
+    def _com_thread(self):
+        if getattr(self._local, "attached", False):
+            yield
+            return
+        self.attach_thread()
+        try:
+            yield
+        finally:
+            self.detach_thread()
+
+    def _interface(self) -> Any:
+        interface = getattr(self._local, "interface", None)
+        if interface is None:
+            interface = self._local.interface = self._wmi.WMI(namespace="wmi")
+        return interface
 
     def set_brightness(self, level: int) -> bool:
         if not self._enabled:
             return False
 
         try:
-            methods = self.wmi_interface.WmiMonitorBrightnessMethods()[0]
-            methods.WmiSetBrightness(level, 0)
+            with self._com_thread():
+                # Querying the methods object is a WMI round trip, so do it
+                # once per thread
+                methods = getattr(self._local, "methods", None)
+                if methods is None:
+                    methods = self._local.methods = (
+                        self._interface().WmiMonitorBrightnessMethods()[self.display]
+                    )
+                methods.WmiSetBrightness(level, 0)
             return True
         except Exception as e:
-            logger.error(f"Error setting Windows brightness: {e}")
+            # The cached object goes stale when the monitor is reconnected
+            self._local.methods = None
+            logger.error("Error setting Windows brightness: %s", e)
             return False
 
     def get_brightness(self) -> int:
@@ -47,19 +120,48 @@ class WindowsBrightnessController(BrightnessController):
             return 50
 
         try:
-            brightness = self.wmi_interface.WmiMonitorBrightness()[0]
-            return brightness.CurrentBrightness
+            with self._com_thread():
+                brightness = self._interface().WmiMonitorBrightness()[self.display]
+                return brightness.CurrentBrightness
         except Exception as e:
-            logger.error(f"Error getting Windows brightness: {e}")
+            logger.error("Error getting Windows brightness: %s", e)
             return 50
 
+    @staticmethod
+    def list_displays() -> List[str]:
+        import pythoncom
+        import wmi
+
+        pythoncom.CoInitialize()
+        try:
+            monitors = wmi.WMI(namespace="wmi").WmiMonitorBrightness()
+            return [monitor.InstanceName for monitor in monitors]
+        finally:
+            pythoncom.CoUninitialize()
+
 
 class MacOSBrightnessController(BrightnessController):
-    def __init__(self):
+    SCRIPT = """
+        on set_level(level, display_number)
+            tell application "System Events"
+                set brightness of display display_number to level
+            end tell
+        end set_level
+
+        on get_level(display_number)
+            tell application "System Events"
+                get brightness of display display_number
+            end tell
+        end get_level
+    """
+
+    def __init__(self, display: int = 0):
+        self.display = display
         try:
             import Cocoa
             import Foundation
 
+            self._script = None
             self._enabled = True
         except ImportError:
             logger.error(
@@ -67,7 +169,7 @@ class MacOSBrightnessController(BrightnessController):
             )
             self._enabled = False
         except Exception as e:
-            logger.error(f"Failed to initialize macOS brightness control: {e}")
+            logger.error("Failed to initialize macOS brightness control: %s", e)
             self._enabled = False
 
     def set_brightness(self, level: int) -> bool:
@@ -75,19 +177,10 @@ class MacOSBrightnessController(BrightnessController):
             return False
 
         try:
-            import applescript
-
-            script = applescript.AppleScript(
-                f"""
-                tell application "System Events"
-                    set brightness of display 1 to {level / 100}
-                end tell
-            """
-            )
-            script.run()
+            self._get_script().call("set_level", level / 100, self.display + 1)
             return True
         except Exception as e:
-            logger.error(f"Error setting macOS brightness: {e}")
+            logger.error("Error setting macOS brightness: %s", e)
             return False
 
     def get_brightness(self) -> int:
@@ -95,24 +188,36 @@ class MacOSBrightnessController(BrightnessController):
             return 50
 
         try:
-            import applescript
-
-            script = applescript.AppleScript(
-                """
-                tell application "System Events"
-                    get brightness of display 1
-                end tell
-            """
-            )
-            result = script.run()
+            result = self._get_script().call("get_level", self.display + 1)
             return int(float(result) * 100)
         except Exception as e:
-            logger.error(f"Error getting macOS brightness: {e}")
+            logger.error("Error getting macOS brightness: %s", e)
             return 50
 
+    def _get_script(self):
+        """Compile the AppleScript handlers once and reuse them"""
+        if self._script is None:
+            import applescript
+
+            self._script = applescript.AppleScript(self.SCRIPT)
+        return self._script
+
+    @staticmethod
+    def list_displays() -> List[str]:
+        import Cocoa
+
+        names = []
+        for index, screen in enumerate(Cocoa.NSScreen.screens()):
+            try:
+                names.append(str(screen.localizedName()))
+            except AttributeError:  # Before macOS 10.15
+                names.append(f"display {index + 1}")
+        return names
+
 
 class LinuxBrightnessController(BrightnessController):
-    def __init__(self):
+    def __init__(self, display: int = 0):
+        self.display = display
         try:
             import screen_brightness_control as sbc
 
@@ -124,7 +229,7 @@ class LinuxBrightnessController(BrightnessController):
             )
             self._enabled = False
         except Exception as e:
-            logger.error(f"Failed to initialize Linux brightness control: {e}")
+            logger.error("Failed to initialize Linux brightness control: %s", e)
             self._enabled = False
 
     def set_brightness(self, level: int) -> bool:
@@ -132,10 +237,10 @@ class LinuxBrightnessController(BrightnessController):
             return False
 
         try:
-            self.sbc.set_brightness(level)
+            self.sbc.set_brightness(level, display=self.display)
             return True
         except Exception as e:
-            logger.error(f"Error setting Linux brightness: {e}")
+            logger.error("Error setting Linux brightness: %s", e)
             return False
 
     def get_brightness(self) -> int:
@@ -143,19 +248,470 @@ class LinuxBrightnessController(BrightnessController):
             return 50
 
         try:
-            return self.sbc.get_brightness()[0]
+            return self.sbc.get_brightness(display=self.display)[0]
         except Exception as e:
-            logger.error(f"Error getting Linux brightness: {e}")
+            logger.error("Error getting Linux brightness: %s", e)
             return 50
 
+    @staticmethod
+    def list_displays() -> List[str]:
+        import screen_brightness_control as sbc
 
-def get_brightness_controller() -> BrightnessController:
-    """Factory function to get the appropriate brightness controller for the current platform"""
+        return sbc.list_monitors()
+
+
+class SysfsBacklightController(BrightnessController):
+    """Linux backlight control straight through /sys/class/backlight.
+
+    The device and its max_brightness are looked up once and the brightness
+    attribute stays open, so every write is a single pwrite system call
+    instead of a trip through screen_brightness_control.
+    """
+
+    BACKLIGHT_ROOT = "/sys/class/backlight"
+    # Kernel guidance: prefer firmware interfaces over platform and raw ones
+    TYPE_PRIORITY = {"firmware": 0, "platform": 1, "raw": 2}
+
+    def __init__(self, display: int = 0, root: str = BACKLIGHT_ROOT):
+        self.root = root
+        self._fd: Optional[int] = None
+        try:
+            devices = self.list_displays(root)
+            self.device = devices[display]
+            device_path = os.path.join(root, self.device)
+            with open(os.path.join(device_path, "max_brightness")) as f:
+                self.max_brightness = int(f.read().strip())
+            self._fd = os.open(os.path.join(device_path, "brightness"), os.O_RDWR)
+            self._enabled = self.max_brightness > 0
+        except Exception as e:
+            logger.error("Failed to initialize sysfs backlight control: %s", e)
+            self._enabled = False
+
+    def set_brightness(self, level: int) -> bool:
+        if not self._enabled:
+            return False
+
+        try:
+            raw = round(level * self.max_brightness / 100)
+            # The trailing newline keeps the value parseable when the target
+            # is a regular file (as in tests) rather than a sysfs attribute
+            os.pwrite(self._fd, f"{raw}\n".encode(), 0)
+            return True
+        except Exception as e:
+            logger.error("Error setting sysfs backlight brightness: %s", e)
+            return False
+
+    def get_brightness(self) -> int:
+        if not self._enabled:
+            return 50
+
+        try:
+            raw = int(os.pread(self._fd, 32, 0).split()[0])
+            return round(raw * 100 / self.max_brightness)
+        except Exception as e:
+            logger.error("Error getting sysfs backlight brightness: %s", e)
+            return 50
+
+    def close(self) -> None:
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+            self._enabled = False
+
+    def __del__(self) -> None:
+        self.close()
+
+    @classmethod
+    def list_displays(cls, root: str = BACKLIGHT_ROOT) -> List[str]:
+        """Backlight devices, best interface first"""
+        def priority(device: str) -> Tuple[int, str]:
+            try:
+                with open(os.path.join(root, device, "type")) as f:
+                    kind = f.read().strip()
+            except OSError:
+                kind = "raw"
+            return cls.TYPE_PRIORITY.get(kind, len(cls.TYPE_PRIORITY)), device
+
+        try:
+            return sorted(os.listdir(root), key=priority)
+        except OSError:
+            return []
+
+    @staticmethod
+    def alternate_interfaces(displays: List[str]) -> List[str]:
+        # Laptops commonly expose the same panel several times (acpi_video0
+        # and intel_backlight) with different scales; only the best one,
+        # listed first, is used unless the others are configured explicitly
+        return displays[1:]
+
+    @classmethod
+    def available(cls, root: str = BACKLIGHT_ROOT) -> bool:
+        """Whether a backlight device exists and we may write to it"""
+        devices = cls.list_displays(root)
+        return bool(devices) and os.access(
+            os.path.join(root, devices[0], "brightness"), os.W_OK
+        )
+
+
+class NullBrightnessController(BrightnessController):
+    """Accepts and remembers levels without touching any display.
+
+    Used for benchmarks, replays and machines without brightness control.
+    """
+
+    def __init__(self, level: int = 50):
+        self.level = level
+
+    def set_brightness(self, level: int) -> bool:
+        self.level = level
+        return True
+
+    def get_brightness(self) -> int:
+        return self.level
+
+
+def within_deadband(level: int, reference: Optional[float], deadband: float) -> bool:
+    """Whether going from reference to level is too small a change to act on"""
+    if reference is None:
+        return False
+    if level == reference:
+        return True
+    # Always let the extremes through so the deadband cannot keep the
+    # display just short of fully dimmed or fully bright
+    if level in (0, 100):
+        return False
+    return abs(level - reference) < deadband
+
+
+class CachedBrightnessController(BrightnessController):
+    """Wraps a platform controller to avoid redundant and excessive writes.
+
+    Writes that would not change the level, or only change it by less than
+    the deadband, are skipped. Writes arriving faster than max_rate per
+    second are held back and the most recent one is flushed once the rate
+    allows it, so the final requested level is always applied.
+    """
+
+    def __init__(
+        self,
+        controller: BrightnessController,
+        deadband: int = 0,
+        max_rate: float = 0.0,
+    ):
+        self.controller = controller
+        self.deadband = deadband
+        self.min_interval = 1.0 / max_rate if max_rate > 0 else 0.0
+        self.last_level: Optional[int] = None
+        self.write_count = 0
+        self.skip_count = 0
+
+        self._lock = threading.Lock()
+        self._last_write = 0.0
+        self._pending: Optional[int] = None
+        self._flush_timer: Optional[threading.Timer] = None
+
+    def set_brightness(self, level: int) -> bool:
+        with self._lock:
+            if self._is_redundant(level):
+                self._pending = None
+                self.skip_count += 1
+                return True
+
+            wait = self._last_write + self.min_interval - time.monotonic()
+            if wait > 0:
+                # Too soon: keep only the latest level and flush it later
+                self._pending = level
+                self.skip_count += 1
+                if self._flush_timer is None:
+                    self._flush_timer = threading.Timer(wait, self.flush)
+                    self._flush_timer.daemon = True
+                    self._flush_timer.start()
+                return True
+
+            return self._write(level)
+
+    def flush(self) -> bool:
+        """Apply a held back level immediately, if there is one"""
+        with self._lock:
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+            if self._pending is None:
+                return True
+            return self._write(self._pending)
+
+    def get_brightness(self) -> int:
+        if self.last_level is not None:
+            return self.last_level
+        return self.controller.get_brightness()
+
+    def invalidate(self) -> None:
+        """Forget the cached level, e.g. after the user changed it by hand"""
+        with self._lock:
+            self.last_level = None
+
+    def _is_redundant(self, level: int) -> bool:
+        return within_deadband(level, self.last_level, self.deadband)
+
+    def _write(self, level: int) -> bool:
+        self._pending = None
+        self._last_write = time.monotonic()
+        if not self.controller.set_brightness(level):
+            return False
+        self.last_level = level
+        self.write_count += 1
+        return True
+
+
+class AsyncBrightnessController(BrightnessController):
+    """Applies brightness levels on a background thread.
+
+    set_brightness only records the requested level and returns immediately.
+    The worker always applies the most recent level, dropping any that were
+    superseded while the previous OS call was still running. Failures are
+    reported through on_failure, and the duration of every OS call through
+    on_applied(latency_ms), both from the worker thread.
+    """
+
+    def __init__(
+        self,
+        controller: BrightnessController,
+        on_failure: Optional[Callable[[], None]] = None,
+        on_applied: Optional[Callable[[float], None]] = None,
+    ):
+        self.controller = controller
+        self.on_failure = on_failure
+        self.on_applied = on_applied
+        self.call_count = 0
+        self.last_latency_ms = 0.0
+        self.average_latency_ms = 0.0
+        self.max_latency_ms = 0.0
+
+        self._condition = threading.Condition()
+        self._pending: Optional[int] = None
+        self._busy = False
+        self._closed = False
+        self._worker: Optional[threading.Thread] = None
+
+    def set_brightness(self, level: int) -> bool:
+        with self._condition:
+            self._pending = level
+            self._closed = False
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(
+                    target=self._run, name="BrightnessApplier", daemon=True
+                )
+                self._worker.start()
+            self._condition.notify()
+        return True
+
+    def get_brightness(self) -> int:
+        return self.controller.get_brightness()
+
+    def wait_idle(self, timeout: Optional[float] = None) -> bool:
+        """Block until no level is pending or being applied"""
+        with self._condition:
+            return self._condition.wait_for(
+                lambda: self._pending is None and not self._busy, timeout
+            )
+
+    def close(self, timeout: Optional[float] = 2.0) -> None:
+        """Apply the pending level, if any, and stop the worker thread"""
+        self.wait_idle(timeout)
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        if self._worker is not None:
+            self._worker.join(timeout)
+            self._worker = None
+
+    def _run(self) -> None:
+        self.controller.attach_thread()
+        try:
+            self._apply_pending()
+        finally:
+            self.controller.detach_thread()
+
+    def _apply_pending(self) -> None:
+        while True:
+            with self._condition:
+                self._condition.wait_for(
+                    lambda: self._pending is not None or self._closed
+                )
+                if self._pending is None:
+                    return
+                level, self._pending = self._pending, None
+                self._busy = True
+
+            started = time.perf_counter()
+            try:
+                success = self.controller.set_brightness(level)
+            except Exception as e:
+                logger.error("Error applying brightness: %s", e)
+                success = False
+            self._record_latency((time.perf_counter() - started) * 1000)
+
+            with self._condition:
+                self._busy = False
+                self._condition.notify_all()
+
+            if not success and self.on_failure is not None:
+                self.on_failure()
+
+    def _record_latency(self, latency_ms: float) -> None:
+        self.call_count += 1
+        self.last_latency_ms = latency_ms
+        self.max_latency_ms = max(self.max_latency_ms, latency_ms)
+        self.average_latency_ms += (latency_ms - self.average_latency_ms) / self.call_count
+        logger.debug("Brightness applied in %.1f ms", latency_ms)
+        if self.on_applied is not None:
+            self.on_applied(latency_ms)
+
+
+class DisplayMapping:
+    """Per-display adjustment of the computed brightness level"""
+
+    def __init__(
+        self,
+        offset: float = 0.0,
+        scale: float = 1.0,
+        min_level: int = 0,
+        max_level: int = 100,
+    ):
+        self.offset = offset
+        self.scale = scale
+        self.min_level = min_level
+        self.max_level = max_level
+
+    def apply(self, level: int) -> int:
+        mapped = int(round(level * self.scale + self.offset))
+        return min(self.max_level, max(self.min_level, mapped))
+
+    @classmethod
+    def from_config(cls, settings: Dict[str, Any]) -> "DisplayMapping":
+        return cls(
+            offset=settings.get("offset", 0.0),
+            scale=settings.get("scale", 1.0),
+            min_level=settings.get("min", 0),
+            max_level=settings.get("max", 100),
+        )
+
+
+class MultiDisplayBrightnessController(BrightnessController):
+    """Applies a level to several displays at once.
+
+    Every display gets its own mapped level, and all displays are written in
+    parallel so a slow DDC/CI monitor does not hold up the others. Each
+    display has a single writer thread of its own, which is attached to
+    the display's controller for its whole lifetime. The threads are
+    started on the first write and stopped by close().
+    """
+
+    def __init__(self, displays: List[Tuple[str, BrightnessController, DisplayMapping]]):
+        self.displays = displays
+        self._lock = threading.Lock()
+        self._executors: Optional[List[ThreadPoolExecutor]] = None
+
+    def _writers(self) -> List[ThreadPoolExecutor]:
+        with self._lock:
+            if self._executors is None:
+                self._executors = [
+                    ThreadPoolExecutor(
+                        max_workers=1,
+                        thread_name_prefix=f"DisplayWriter-{index}",
+                        initializer=controller.attach_thread,
+                    )
+                    for index, (_, controller, _) in enumerate(self.displays)
+                ]
+            return self._executors
+
+    def set_brightness(self, level: int) -> bool:
+        futures = [
+            (name, executor.submit(controller.set_brightness, mapping.apply(level)))
+            for executor, (name, controller, mapping) in zip(self._writers(), self.displays)
+        ]
+        success = True
+        for name, future in futures:
+            try:
+                if not future.result():
+                    success = False
+            except Exception as e:
+                logger.error("Error setting brightness of display %s: %s", name, e)
+                success = False
+        return success
+
+    def get_brightness(self) -> int:
+        if not self.displays:
+            return 50
+        return self.displays[0][1].get_brightness()
+
+    def close(self) -> None:
+        """Stop the writer threads; the next write starts new ones"""
+        with self._lock:
+            executors, self._executors = self._executors, None
+        for executor, (_, controller, _) in zip(executors or [], self.displays):
+            # Queued behind any pending write, on the thread that attached
+            executor.submit(controller.detach_thread)
+            executor.shutdown(wait=False)
+
+
+# Enumerating displays can take hundreds of milliseconds (DDC/CI probing),
+# so it is only done once per process unless explicitly refreshed
+_display_cache: Optional[List[str]] = None
+
+
+def _platform_controller_class() -> type:
     platform = sys.platform
 
     if platform == "win32":
-        return WindowsBrightnessController()
+        return WindowsBrightnessController
     elif platform == "darwin":
-        return MacOSBrightnessController()
-    else:  # Assume Linux/Unix
-        return LinuxBrightnessController()
+        return MacOSBrightnessController
+    elif SysfsBacklightController.available():
+        return SysfsBacklightController
+    else:  # Assume Linux/Unix without a writable backlight device
+        return LinuxBrightnessController
+
+
+def list_displays(refresh: bool = False) -> List[str]:
+    """Names of the connected displays, cached after the first call"""
+    global _display_cache
+    if _display_cache is None or refresh:
+        try:
+            _display_cache = _platform_controller_class().list_displays()
+        except Exception as e:
+            logger.error("Error enumerating displays: %s", e)
+            _display_cache = []
+    return _display_cache
+
+
+def get_brightness_controller(config: Optional[Config] = None) -> BrightnessController:
+    """Factory function to get the appropriate brightness controller for the current platform"""
+    controller_class = _platform_controller_class()
+    displays = list_displays()
+    overrides: Dict[str, Any] = config.get_section("displays") if config else {}
+
+    alternates = set(controller_class.alternate_interfaces(displays))
+    selected = []
+    for index, name in enumerate(displays or ["default"]):
+        # Displays can be configured by name or by index
+        settings = overrides.get(name, overrides.get(str(index)))
+        if settings is None:
+            if name in alternates:
+                continue
+            settings = {}
+        if settings.get("enabled", True) is False:
+            continue
+        selected.append((index, name, settings))
+
+    if len(selected) == 1 and not overrides:
+        return controller_class(display=selected[0][0])
+
+    entries = [
+        (name, controller_class(display=index), DisplayMapping.from_config(settings))
+        for index, name, settings in selected
+    ]
+    logger.info(
+        "Controlling %d display(s): %s", len(entries), ", ".join(entry[0] for entry in entries)
+    )
+    return MultiDisplayBrightnessController(entries)
@@ -0,0 +1,156 @@
+import threading
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .config import Config
+from .logger import logger
+
+# Luminance readings are quantized to one table entry per 8-bit level
+LUT_SIZE = 256
+
+
+class BrightnessCurve:
+    """Maps luminance to brightness through a precomputed lookup table.
+
+    The table holds one brightness level per quantized luminance value, so
+    mapping a reading on the hot path is a single array index.
+    """
+
+    def __init__(self, lut: np.ndarray, threshold: Optional[int] = None):
+        self.lut = lut
+        # Threshold the table was built for, None for a calibrated curve
+        # that does not depend on it
+        self.threshold = threshold
+
+    def map(self, luminance: float) -> int:
+        """Return the brightness level (0-100) for a luminance reading"""
+        return int(self.lut[min(LUT_SIZE - 1, max(0, int(luminance)))])
+
+    def matches(self, threshold: int) -> bool:
+        """Whether the table is still valid for the given threshold"""
+        return self.threshold is None or self.threshold == threshold
+
+    @classmethod
+    def linear(
+        cls, threshold: int, min_brightness: int = 0, max_brightness: int = 100
+    ) -> "BrightnessCurve":
+        """The default curve: full brightness at the threshold luminance"""
+        # Ensure threshold is at least 1 to prevent division by zero
+        fraction = np.clip(np.arange(LUT_SIZE) / max(1, threshold), 0.0, 1.0)
+        levels = min_brightness + (max_brightness - min_brightness) * fraction
+        return cls(levels.astype(np.uint8), threshold)
+
+    @classmethod
+    def from_points(
+        cls,
+        points: Sequence[Sequence[float]],
+        min_brightness: int = 0,
+        max_brightness: int = 100,
+    ) -> "BrightnessCurve":
+        """Interpolate a calibrated curve through (luminance, brightness) points"""
+        xs, ys = zip(*sorted((float(x), float(y)) for x, y in points))
+        # Flat beyond the outermost points
+        levels = np.interp(np.arange(LUT_SIZE), xs, ys)
+        levels = np.clip(np.rint(levels), min_brightness, max_brightness)
+        return cls(levels.astype(np.uint8))
+
+
+def fit_monotone(
+    luminance: Sequence[float], brightness: Sequence[float], weights: Sequence[float]
+) -> List[Tuple[float, float]]:
+    """Weighted isotonic regression (pool adjacent violators).
+
+    Returns non-decreasing (luminance, brightness) points: wherever the
+    recorded brightness drops as luminance rises, the neighbouring samples
+    are pooled into their weighted mean.
+    """
+    # Each block is [sum(w * x), sum(w * y), sum(w)]
+    blocks: List[List[float]] = []
+    for x, y, w in sorted(zip(luminance, brightness, weights)):
+        blocks.append([w * x, w * y, w])
+        while len(blocks) > 1 and (
+            blocks[-2][1] / blocks[-2][2] >= blocks[-1][1] / blocks[-1][2]
+        ):
+            last = blocks.pop()
+            for index in range(3):
+                blocks[-1][index] += last[index]
+    return [(wx / w, wy / w) for wx, wy, w in blocks]
+
+
+class CurveCalibrator:
+    """Collects (luminance, brightness) pairs while the user picks levels.
+
+    Samples are accumulated into one bin per quantized luminance value, so
+    memory stays constant however long calibration runs; the fit weights
+    each bin by how many frames were recorded in it.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sums = np.zeros(LUT_SIZE, dtype=np.float64)
+        self._counts = np.zeros(LUT_SIZE, dtype=np.int64)
+
+    @property
+    def sample_count(self) -> int:
+        return int(self._counts.sum())
+
+    def record(self, luminance: float, brightness: int) -> None:
+        """Record the level the user chose for the current luminance"""
+        index = min(LUT_SIZE - 1, max(0, int(luminance)))
+        with self._lock:
+            self._sums[index] += brightness
+            self._counts[index] += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._sums[:] = 0
+            self._counts[:] = 0
+
+    def fit(self) -> List[Tuple[float, float]]:
+        """Fit a monotone curve to the recorded samples"""
+        with self._lock:
+            bins = np.flatnonzero(self._counts)
+            means = self._sums[bins] / self._counts[bins]
+            weights = self._counts[bins].astype(np.float64)
+        # One luminance level is not enough to define a curve
+        if len(bins) < 2:
+            return []
+        points = fit_monotone(bins.astype(np.float64), means, weights)
+        return [(round(float(x), 1), round(float(y), 1)) for x, y in points]
+
+    def save(self, config: Config) -> bool:
+        """Fit and store the curve in config.json; False if there is too little data"""
+        points = self.fit()
+        if not points:
+            logger.warning("Not enough calibration samples, keeping the previous curve")
+            return False
+        config.set("calibration", "points", [list(point) for point in points])
+        logger.info(
+            "Calibrated brightness curve with %d points from %d samples",
+            len(points),
+            self.sample_count,
+        )
+        return True
+
+
+def clear_calibration(config: Config) -> bool:
+    """Drop the calibrated curve so the threshold applies again; False if none was set"""
+    if not config.get("calibration", "points"):
+        return False
+    config.set("calibration", "points", [])
+    logger.info("Calibration cleared, using the linear mapping")
+    return True
+
+
+def get_brightness_curve(config: Config, threshold: int) -> BrightnessCurve:
+    """Build the calibrated curve from config.json, or the linear default"""
+    min_brightness = config.get("brightness", "min_brightness")
+    max_brightness = config.get("brightness", "max_brightness")
+    points = config.get("calibration", "points")
+    if points:
+        try:
+            return BrightnessCurve.from_points(points, min_brightness, max_brightness)
+        except Exception as e:
+            logger.error("Invalid calibration curve, using the linear mapping: %s", e)
+    return BrightnessCurve.linear(threshold, min_brightness, max_brightness)
@@ -0,0 +1,394 @@
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import cv2
+
+from .config import Config
+from .logger import logger
+from .metrics import Metrics
+
+
+def decode_fourcc(value: float) -> str:
+    """Turn a CAP_PROP_FOURCC value back into its four character code"""
+    code = int(value)
+    return "".join(chr((code >> (8 * i)) & 0xFF) for i in range(4)).strip("\x00")
+
+
+def open_camera(
+    config: Config, exposure: int, report: bool = True
+) -> Tuple[cv2.VideoCapture, Dict[str, Any]]:
+    """Open and configure the camera, returning it with the granted format.
+
+    In metering mode the driver is asked for a small resolution and a low
+    frame rate since only the average light level is needed. Drivers snap
+    the request to the nearest mode they support, so the values that were
+    actually granted are read back and reported.
+    """
+    cap = cv2.VideoCapture(config.get("camera", "device_index"))
+    if not cap.isOpened():
+        raise RuntimeError("Failed to open camera device")
+
+    # Configure camera settings
+    cap.set(cv2.CAP_PROP_AUTO_EXPOSURE, 0.5)  # Manual exposure mode
+    cap.set(cv2.CAP_PROP_EXPOSURE, exposure)
+
+    if config.get("camera", "metering_mode"):
+        # The pixel format has to be chosen before the frame size on most backends
+        pixel_format = config.get("camera", "pixel_format")
+        if pixel_format:
+            cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*pixel_format[:4].ljust(4)))
+        cap.set(cv2.CAP_PROP_FRAME_WIDTH, config.get("camera", "metering_width"))
+        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, config.get("camera", "metering_height"))
+        cap.set(cv2.CAP_PROP_FPS, config.get("camera", "metering_fps"))
+
+    granted = {
+        "width": int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+        "height": int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+        "fps": cap.get(cv2.CAP_PROP_FPS),
+        "pixel_format": decode_fourcc(cap.get(cv2.CAP_PROP_FOURCC)),
+    }
+    if report:
+        logger.info(
+            "Camera granted %sx%s @ %.1f fps, format=%s",
+            granted["width"],
+            granted["height"],
+            granted["fps"],
+            granted["pixel_format"] or "unknown",
+        )
+    return cap, granted
+
+
+def capture_rate(config: Config) -> float:
+    """Frames per second the capture loop polls at"""
+    if config.get("camera", "metering_mode"):
+        return config.get("camera", "metering_fps")
+    return config.get("camera", "fps")
+
+
+class LatestFrameQueue:
+    """Single-slot frame queue that always holds the most recent frame.
+
+    Putting a frame while the previous one has not been consumed replaces it,
+    so a slow consumer never works through a backlog of stale frames.
+
+    Frames that borrow memory from the capture device come with a release
+    callback. It runs once the frame was replaced without being consumed, or
+    once the consumer asks for the next frame and so is done with this one.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._item: Optional[Tuple[Any, float, Optional[Callable[[], None]]]] = None
+        self._in_use: Optional[Callable[[], None]] = None
+        self._closed = False
+        self.dropped_frames = 0
+
+    def put(
+        self, frame: Any, timestamp: float, release: Optional[Callable[[], None]] = None
+    ) -> None:
+        """Store a frame, discarding any frame that was not consumed yet"""
+        with self._condition:
+            stale = self._item
+            if stale is not None:
+                self.dropped_frames += 1
+            self._item = (frame, timestamp, release)
+            self._condition.notify()
+        if stale is not None and stale[2] is not None:
+            stale[2]()
+
+    def get(self, timeout: Optional[float] = None) -> Optional[Tuple[Any, float]]:
+        """Wait for the next frame, returning None on timeout or close"""
+        self._release_in_use()
+        with self._condition:
+            if self._item is None and not self._closed:
+                self._condition.wait(timeout)
+            item, self._item = self._item, None
+        if item is None:
+            return None
+        frame, timestamp, self._in_use = item
+        return frame, timestamp
+
+    def close(self) -> None:
+        """Wake up any waiting consumer and release the pending frame"""
+        with self._condition:
+            self._closed = True
+            item, self._item = self._item, None
+            self._condition.notify_all()
+        if item is not None and item[2] is not None:
+            item[2]()
+
+    def _release_in_use(self) -> None:
+        release, self._in_use = self._in_use, None
+        if release is not None:
+            release()
+
+
+class CaptureThread(threading.Thread):
+    """Background thread that owns the camera device and publishes frames.
+
+    The frame queue belongs to the caller and stays open when the thread
+    exits, so a replacement thread can publish into it after a failure.
+    """
+
+    def __init__(
+        self,
+        config: Config,
+        exposure: int,
+        frame_queue: LatestFrameQueue,
+        on_error: Callable[[str], None],
+        schedule: Optional["AdaptiveInterval"] = None,
+        metrics: Optional[Metrics] = None,
+    ):
+        super().__init__(name="CaptureThread", daemon=True)
+        self.config = config
+        self.exposure = exposure
+        self.fps = capture_rate(config)
+        self.frame_queue = frame_queue
+        self.on_error = on_error
+        # Optional back-off: reads slow down while the scene is static
+        self.schedule = schedule
+        self.metrics = metrics
+        # Set by backends that publish raw limited-range (16-235) luma
+        self.limited_range_luma = False
+        # Share of the time the device is open
+        self.duty_cycle = 1.0
+        # Consecutive failed reads tolerated before giving up on the device
+        self.max_read_failures = config.get("recovery", "read_failures")
+        self._read_failures = 0
+        self.granted: Dict[str, Any] = {}
+        self._stop_event = threading.Event()
+        self._active = threading.Event()
+        self._active.set()
+        self._pending_exposure: Optional[int] = None
+
+    def stop(self) -> None:
+        """Ask the capture loop to exit; the device is released by the thread"""
+        self._stop_event.set()
+        self._active.set()
+
+    def pause(self) -> None:
+        """Stop publishing frames but keep the device open"""
+        self._active.clear()
+
+    def resume(self) -> None:
+        self._active.set()
+
+    @property
+    def paused(self) -> bool:
+        return not self._active.is_set()
+
+    def set_exposure(self, exposure: int) -> None:
+        """Change the exposure of the open device from the capture thread"""
+        self.exposure = exposure
+        self._pending_exposure = exposure
+
+    def _wait_while_paused(self) -> bool:
+        """Block while paused; returns False once the thread should exit"""
+        while not self._active.is_set() and not self._stop_event.is_set():
+            self._active.wait(0.5)
+        return not self._stop_event.is_set()
+
+    def _record_read(self, started: float, captured_at: float) -> None:
+        self._read_failures = 0
+        if self.metrics is not None:
+            self.metrics.observe("read", (captured_at - started) * 1000)
+            self.metrics.frame_captured(captured_at)
+
+    def _read_failed(self, message: str) -> None:
+        """Count a failed read; raises once too many failed in a row"""
+        self._read_failures += 1
+        if self.metrics is not None:
+            self.metrics.increment("read_failures")
+        if self._read_failures > self.max_read_failures:
+            raise RuntimeError(f"{message} ({self._read_failures} times in a row)")
+        logger.debug("%s, retrying", message, key=(self.name, "read"))
+
+    def run(self) -> None:
+        cap: Optional[cv2.VideoCapture] = None
+        try:
+            cap, self.granted = open_camera(self.config, self.exposure)
+
+            min_interval = 1.0 / self.fps
+            next_tick = time.perf_counter()
+            while not self._stop_event.is_set():
+                if self.paused:
+                    if not self._wait_while_paused():
+                        break
+                    next_tick = time.perf_counter()
+
+                # VideoCapture is not thread safe, so settings are applied here
+                exposure, self._pending_exposure = self._pending_exposure, None
+                if exposure is not None:
+                    cap.set(cv2.CAP_PROP_EXPOSURE, exposure)
+
+                read_started = time.perf_counter()
+                ret, frame = cap.read()
+                captured_at = time.perf_counter()
+                if not ret:
+                    # A single dropped frame is not worth reopening the device
+                    self._read_failed("Failed to read frame from camera")
+                    self._stop_event.wait(min_interval)
+                    continue
+                self._record_read(read_started, captured_at)
+                self.frame_queue.put(frame, captured_at)
+
+                # Pace reads to the configured rate without drifting
+                interval = min_interval
+                if self.schedule is not None:
+                    interval = max(min_interval, self.schedule.interval)
+                next_tick = max(next_tick + interval, captured_at)
+                self._stop_event.wait(next_tick - captured_at)
+        except Exception as e:
+            if not self._stop_event.is_set():
+                self.on_error(str(e))
+        finally:
+            if cap is not None:
+                cap.release()
+
+
+class AdaptiveInterval:
+    """Sleep interval that shortens while readings change and grows while stable.
+
+    Readings are reported from the processing thread while the capture
+    thread may already be sleeping, so wait() ends early when a change
+    shortens the interval.
+    """
+
+    def __init__(
+        self,
+        min_interval: float,
+        max_interval: float,
+        change_threshold: float,
+        growth: float = 1.5,
+    ):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.change_threshold = change_threshold
+        self.growth = growth
+        self.interval = min_interval
+        self._last_luminance: Optional[float] = None
+        self._condition = threading.Condition()
+
+    def report(self, luminance: float) -> None:
+        """Feed a new luminance reading into the schedule"""
+        self.report_change(
+            self._last_luminance is not None
+            and abs(luminance - self._last_luminance) > self.change_threshold
+        )
+        self._last_luminance = luminance
+
+    def report_change(self, changed: bool) -> None:
+        """Snap back to the shortest interval on a change, back off otherwise"""
+        with self._condition:
+            if changed:
+                shortened = self.interval > self.min_interval
+                self.interval = self.min_interval
+                if shortened:
+                    self._condition.notify_all()
+            else:
+                self.interval = min(self.max_interval, self.interval * self.growth)
+
+    def wait(self, since: float, stop_event: threading.Event) -> bool:
+        """Sleep until the interval has passed since `since`; False once stop_event is set"""
+        with self._condition:
+            while not stop_event.is_set():
+                remaining = since + self.interval - time.perf_counter()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+        return not stop_event.is_set()
+
+    def wake(self) -> None:
+        """End a pending wait() early, e.g. after its stop_event was set"""
+        with self._condition:
+            self._condition.notify_all()
+
+
+class DutyCycleCaptureThread(CaptureThread):
+    """Capture thread that only holds the camera for short bursts.
+
+    Each cycle opens the device, throws away the frames captured while auto
+    exposure settles, publishes a short burst, releases the device and then
+    sleeps for the interval chosen by the AdaptiveInterval schedule.
+    """
+
+    def __init__(
+        self,
+        config: Config,
+        exposure: int,
+        frame_queue: LatestFrameQueue,
+        on_error: Callable[[str], None],
+        schedule: AdaptiveInterval,
+        metrics: Optional[Metrics] = None,
+    ):
+        super().__init__(config, exposure, frame_queue, on_error, schedule, metrics)
+        self.name = "DutyCycleCaptureThread"
+        self.warmup_frames = config.get("duty_cycle", "warmup_frames")
+        self.burst_frames = max(1, config.get("duty_cycle", "burst_frames"))
+        self.duty_cycle = 0.0
+        self._open_seconds = 0.0
+        # Capture time of the last frame of the latest burst
+        self._burst_end: Optional[float] = None
+
+    def stop(self) -> None:
+        super().stop()
+        self.schedule.wake()
+
+    def run(self) -> None:
+        started_at = time.perf_counter()
+        try:
+            while self._wait_while_paused():
+                # A new exposure is picked up the next time the device opens
+                self._pending_exposure = None
+                opened_at = time.perf_counter()
+                self._capture_burst()
+                released_at = time.perf_counter()
+
+                self._open_seconds += released_at - opened_at
+                self.duty_cycle = self._open_seconds / (released_at - started_at)
+                logger.debug(
+                    "Camera burst took %.0f ms, next in %.1f s, duty cycle %.1f%%",
+                    (released_at - opened_at) * 1000,
+                    self.schedule.interval,
+                    self.duty_cycle * 100,
+                )
+                # The burst is usually reported while this already sleeps
+                self.schedule.wait(released_at, self._stop_event)
+        except Exception as e:
+            if not self._stop_event.is_set():
+                self.on_error(str(e))
+
+    def _capture_burst(self) -> None:
+        # Only report the negotiated format on the first cycle
+        cap, self.granted = open_camera(
+            self.config, self.exposure, report=not self.granted
+        )
+        try:
+            # grab() skips decoding the frames we are going to discard anyway
+            for _ in range(self.warmup_frames):
+                cap.grab()
+            # Each frame is held back until the next read succeeds, so the
+            # last successful one can be marked as the end of the burst
+            held: Optional[Tuple[Any, float]] = None
+            for _ in range(self.burst_frames):
+                read_started = time.perf_counter()
+                ret, frame = cap.read()
+                captured_at = time.perf_counter()
+                if not ret:
+                    self._read_failed("Failed to read frame from camera")
+                    continue
+                self._record_read(read_started, captured_at)
+                if held is not None:
+                    self.frame_queue.put(*held)
+                held = (frame, captured_at)
+            if held is not None:
+                # Set before the frame is published, so the consumer sees it
+                self._burst_end = held[1]
+                self.frame_queue.put(*held)
+        finally:
+            cap.release()
+
+    def ends_burst(self, captured_at: float) -> bool:
+        """Whether the frame captured at captured_at was the last of its burst"""
+        return captured_at == self._burst_end
@@ -1,6 +1,15 @@
+import atexit
 import json
 import os
-from typing import Dict, Any
+import stat
+import tempfile
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .logger import logger
+
+# Mode of a config.json created from scratch
+DEFAULT_FILE_MODE = 0o644
 
 class Config:
     DEFAULT_CONFIG = {
@@ -8,49 +17,167 @@ class Config:
             "device_index": 0,
             "fps": 30,
             "default_exposure": -2,
+            "metering_mode": False,
+            "metering_width": 160,
+            "metering_height": 120,
+            "metering_fps": 5,
+            "pixel_format": "",
+            "keep_open_when_stopped": False,
+            "backend": "opencv",
         },
         "brightness": {
             "default_threshold": 190,
             "smoothing_factor": 0.1,
             "min_brightness": 0,
             "max_brightness": 100,
+            "deadband": 2,
+            "max_writes_per_second": 10,
+            "filter": "one_euro",
+            "filter_window": 5,
+            "one_euro_min_cutoff": 0.5,
+            "one_euro_beta": 0.05,
+            "outlier_rejection": True,
+            "outlier_threshold": 3.0,
+            "outlier_min_deviation": 10.0,
+            "outlier_persistence": 3,
+        },
+        "calibration": {
+            "points": [],
+        },
+        "ramp": {
+            "curve": "ease_out",
+            "rate_hz": 10,
+            "max_slew": 50,
+            "time_constant": 0.5,
+            "gamma": 2.2,
+        },
+        "duty_cycle": {
+            "enabled": False,
+            "warmup_frames": 5,
+            "burst_frames": 3,
+            "min_interval": 1.0,
+            "max_interval": 20.0,
+            "change_threshold": 5.0,
+        },
+        "light_source": {
+            "type": "auto",
+            "sysfs_root": "/sys/bus/iio/devices",
+            "sensor_device": "",
+            "buffered": False,
+            "min_interval": 0.2,
+            "max_interval": 2.0,
+            "change_threshold": 2.0,
+            "max_lux": 1000.0,
+        },
+        "recovery": {
+            "enabled": True,
+            "read_failures": 5,
+            "initial_delay": 0.5,
+            "max_delay": 30.0,
+            "attempt_timeout": 10.0,
+            "hotplug": True,
+        },
+        "scene": {
+            "enabled": True,
+            "threshold": 2.0,
+            "grid_width": 16,
+            "grid_height": 12,
+            "max_interval": 1.0,
+        },
+        "luminance": {
+            "method": "downscale",
+            "stride": 8,
+            "sample_width": 64,
+            "percentile": 50,
+            "roi": [0.0, 0.0, 1.0, 1.0],
+            "exclude_center": 0.0,
+        },
+        "metrics": {
+            "log_interval": 60,
+            "http_port": 0,
+            "http_host": "127.0.0.1",
+        },
+        "trace": {
+            "enabled": False,
+            "path": "",
+            "capacity": 100000,
         },
         "ui": {
             "preview_width": 360,
             "preview_height": 270,
+            "preview_mode": "gauge",
         },
         "advanced": {
             "smooth_transitions": True,
-        }
+            "save_delay": 1.0,
+            "watch_interval": 2.0,
+        },
+        "displays": {},
     }
 
-    def __init__(self):
-        self.config_path = os.path.join(
+    def __init__(self, config_path: Optional[str] = None):
+        self.config_path = config_path or os.path.join(
             os.path.dirname(os.path.dirname(__file__)),
             "config.json"
         )
+        self._lock = threading.RLock()
+        self._save_timer: Optional[threading.Timer] = None
+        self._dirty = False
+        self._file_state: Optional[Tuple[int, int]] = None
+        self._listeners: List[Callable[["Config"], None]] = []
+        self._watch_stop: Optional[threading.Event] = None
         self.settings = self.load_config()
+        # Pending changes are written even if the process exits before the
+        # debounce timer fires
+        atexit.register(self.flush)
 
     def load_config(self) -> Dict[str, Any]:
         """Load configuration from file or create default if not exists"""
         try:
             if os.path.exists(self.config_path):
                 with open(self.config_path, 'r') as f:
-                    return json.load(f)
-            return self.save_config(self.DEFAULT_CONFIG)
+                    settings = json.load(f)
+                self._file_state = self._stat()
+                return settings
+            return self.save_config(json.loads(json.dumps(self.DEFAULT_CONFIG)))
         except Exception as e:
-            print(f"Error loading config: {e}")
-            return dict(self.DEFAULT_CONFIG)
+            logger.error("Error loading config: %s", e)
+            return json.loads(json.dumps(self.DEFAULT_CONFIG))
 
     def save_config(self, config: Dict[str, Any]) -> Dict[str, Any]:
-        """Save configuration to file"""
+        """Save configuration to file atomically"""
         try:
-            with open(self.config_path, 'w') as f:
-                json.dump(config, f, indent=4)
+            self._write(config)
             return config
         except Exception as e:
-            print(f"Error saving config: {e}")
-            return dict(self.DEFAULT_CONFIG)
+            logger.error("Error saving config: %s", e)
+            return json.loads(json.dumps(self.DEFAULT_CONFIG))
+
+    def _write(self, config: Dict[str, Any]) -> None:
+        # Write a temporary file next to config.json and rename it over
+        # the original, so readers never see a half-written file. A
+        # symlinked config.json (e.g. from a dotfiles repository) stays a
+        # link: the file it points to is the one replaced
+        target = os.path.realpath(self.config_path)
+        directory = os.path.dirname(target) or "."
+        fd, temp_path = tempfile.mkstemp(prefix=".config-", suffix=".json", dir=directory)
+        try:
+            # mkstemp creates the file readable by its owner only
+            try:
+                mode = stat.S_IMODE(os.stat(target).st_mode)
+            except FileNotFoundError:
+                mode = DEFAULT_FILE_MODE
+            os.chmod(temp_path, mode)
+            with os.fdopen(fd, 'w') as f:
+                json.dump(config, f, indent=4)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, target)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+        # Remember our own write so the watcher does not reload it
+        self._file_state = self._stat()
 
     def get(self, section: str, key: str, default: Any = None) -> Any:
         """Get a configuration value"""
@@ -61,9 +188,102 @@ class Config:
                 return default
             return self.DEFAULT_CONFIG[section][key]
 
+    def get_section(self, section: str) -> Dict[str, Any]:
+        """Get a whole configuration section"""
+        return self.settings.get(section, self.DEFAULT_CONFIG.get(section, {}))
+
     def set(self, section: str, key: str, value: Any) -> None:
-        """Set a configuration value"""
-        if section not in self.settings:
-            self.settings[section] = {}
-        self.settings[section][key] = value
-        self.save_config(self.settings)
+        """Set a configuration value; it is written to disk after a short delay"""
+        with self._lock:
+            if section not in self.settings:
+                self.settings[section] = {}
+            self.settings[section][key] = value
+            self._dirty = True
+
+            # Every change restarts the timer, so a burst of changes (e.g. a
+            # slider being dragged) results in a single write
+            if self._save_timer is not None:
+                self._save_timer.cancel()
+            self._save_timer = threading.Timer(self.get("advanced", "save_delay"), self.flush)
+            self._save_timer.daemon = True
+            self._save_timer.start()
+
+    def flush(self) -> None:
+        """Write pending changes to disk now"""
+        with self._lock:
+            if self._save_timer is not None:
+                self._save_timer.cancel()
+                self._save_timer = None
+            if not self._dirty:
+                return
+            try:
+                self._write(self.settings)
+            except Exception as e:
+                # Still dirty, so the next change or close() writes it again
+                logger.error("Error saving config, changes are still pending: %s", e)
+                return
+            self._dirty = False
+
+    def subscribe(self, listener: Callable[["Config"], None]) -> None:
+        """Call listener(config) from the watcher thread after a reload"""
+        self._listeners.append(listener)
+
+    def start_watching(self, interval: Optional[float] = None) -> None:
+        """Poll config.json for external edits and hot-reload them"""
+        if self._watch_stop is not None:
+            return
+        self._watch_stop = threading.Event()
+        thread = threading.Thread(
+            target=self._watch,
+            args=(self._watch_stop, interval or self.get("advanced", "watch_interval")),
+            name="ConfigWatcher",
+            daemon=True,
+        )
+        thread.start()
+
+    def close(self) -> None:
+        """Stop watching and write any pending changes"""
+        if self._watch_stop is not None:
+            self._watch_stop.set()
+            self._watch_stop = None
+        self.flush()
+
+    def reload(self) -> None:
+        """Re-read config.json and notify subscribers"""
+        with self._lock:
+            try:
+                with open(self.config_path, 'r') as f:
+                    settings = json.load(f)
+            except Exception as e:
+                # The file may be caught mid-edit; keep the current settings
+                # and pick the change up on the next poll
+                logger.warning("Ignoring unreadable config change: %s", e)
+                return
+            self._file_state = self._stat()
+            # External edits win over changes not yet flushed
+            if self._save_timer is not None:
+                self._save_timer.cancel()
+                self._save_timer = None
+            self._dirty = False
+            self.settings = settings
+        logger.info("Configuration reloaded")
+        for listener in self._listeners:
+            try:
+                listener(self)
+            except Exception as e:
+                logger.error("Error applying reloaded config: %s", e)
+
+    def _watch(self, stop: threading.Event, interval: float) -> None:
+        # mtime polling works on every platform and costs one stat() call
+        # per interval
+        while not stop.wait(interval):
+            state = self._stat()
+            if state is not None and state != self._file_state:
+                self.reload()
+
+    def _stat(self) -> Optional[Tuple[int, int]]:
+        try:
+            info = os.stat(self.config_path)
+            return info.st_mtime_ns, info.st_size
+        except OSError:
+            return None
@@ -0,0 +1,605 @@
+import threading
+import time
+from typing import Callable, Optional, Union
+
+import numpy as np
+
+from .calibration import (
+    BrightnessCurve,
+    CurveCalibrator,
+    clear_calibration,
+    get_brightness_curve,
+)
+from .config import Config
+from .filters import get_luminance_filter
+from .logger import logger
+from .brightness_control import (
+    AsyncBrightnessController,
+    CachedBrightnessController,
+    MultiDisplayBrightnessController,
+    get_brightness_controller,
+    within_deadband,
+)
+from .capture import (
+    AdaptiveInterval,
+    CaptureThread,
+    DutyCycleCaptureThread,
+    LatestFrameQueue,
+    capture_rate,
+)
+from .light_source import LightSource, get_light_source
+from .luminance import get_luminance_estimator, limited_to_full_range
+from .metrics import Metrics, MetricsReporter, MetricsServer
+from .ramp import BrightnessRamp
+from .recovery import CaptureSupervisor
+from .scene import get_scene_detector
+from .settings import RuntimeSettings, SettingsStore
+from .trace import (
+    FLAG_CALIBRATING,
+    FLAG_SENSOR,
+    FLAG_SKIPPED,
+    FLAG_SMOOTH,
+    TraceRecorder,
+    get_trace_recorder,
+)
+
+
+class AutoBrightnessCore:
+    """Capture, metering and brightness control without any Qt dependency.
+
+    The core runs its own capture, processing, ramp and brightness threads.
+    Front-ends (the Qt window, the headless daemon) observe it through the
+    optional callbacks below, which are invoked from worker threads:
+
+        on_reading(luminance, brightness, latency_ms)
+        on_error(message)
+        on_duty_cycle(duty_cycle)
+        on_brightness_failure()
+        on_capture_lost(message)
+        on_capture_recovered(outage_seconds)
+    """
+
+    def __init__(self, config: Optional[Config] = None):
+        self.config = config or Config()
+
+        self.on_reading: Optional[Callable[[float, int, float], None]] = None
+        self.on_error: Optional[Callable[[str], None]] = None
+        self.on_duty_cycle: Optional[Callable[[float], None]] = None
+        self.on_brightness_failure: Optional[Callable[[], None]] = None
+        self.on_capture_lost: Optional[Callable[[str], None]] = None
+        self.on_capture_recovered: Optional[Callable[[float], None]] = None
+
+        self.metrics = Metrics(capture_rate(self.config))
+        self.metrics_reporter = MetricsReporter(
+            self.metrics, self.config.get("metrics", "log_interval")
+        )
+        self.metrics_server: Optional[MetricsServer] = None
+        if self.config.get("metrics", "http_port"):
+            self.metrics_server = MetricsServer(
+                self.metrics,
+                self.config.get("metrics", "http_host"),
+                self.config.get("metrics", "http_port"),
+            )
+
+        # OS calls run on their own thread so frame processing never waits
+        backend = get_brightness_controller(self.config)
+        backend_name = type(backend).__name__
+        self.brightness_applier = AsyncBrightnessController(
+            backend,
+            on_failure=self._on_brightness_failure,
+            on_applied=lambda latency_ms: self.metrics.observe_write(backend_name, latency_ms),
+        )
+        # The deadband applies to targets in update_frame, not to the ramp's
+        # steps, which have to reach the target exactly
+        self.deadband = self.config.get("brightness", "deadband")
+        self.brightness_controller = CachedBrightnessController(
+            self.brightness_applier,
+            max_rate=self.config.get("brightness", "max_writes_per_second"),
+        )
+        self.luminance_estimator = get_luminance_estimator(self.config)
+        # Skips frames that look like the last processed one
+        self.scene_detector = get_scene_detector(self.config)
+        # Rejects momentary events and smooths noise before mapping
+        self.luminance_filter = get_luminance_filter(self.config)
+        # Built lazily for the current threshold, see update_frame
+        self.brightness_curve: Optional[BrightnessCurve] = None
+        # Set while the user is choosing brightness levels to calibrate the curve
+        self.calibrator: Optional[CurveCalibrator] = None
+        self._calibration_level: Optional[int] = None
+        # Transitions run on the ramp's own clock, independent of the capture rate
+        self.ramp = BrightnessRamp(
+            self.brightness_controller,
+            curve=self.config.get("ramp", "curve"),
+            rate_hz=self.config.get("ramp", "rate_hz"),
+            max_slew=self.config.get("ramp", "max_slew"),
+            time_constant=self.config.get("ramp", "time_constant"),
+            gamma=self.config.get("ramp", "gamma"),
+        )
+
+        self.light_source: LightSource = get_light_source(self.config)
+        self.frame_queue: Optional[LatestFrameQueue] = None
+        self.capture_thread: Optional[CaptureThread] = None
+        self.schedule: Optional[AdaptiveInterval] = None
+        # Latest reading of the current duty cycle burst, not yet reported
+        self._burst_reading: Optional[float] = None
+        self.processing_thread: Optional[threading.Thread] = None
+        # Opt-in binary trace of every sample, see trace.py
+        self.trace_recorder: Optional[TraceRecorder] = None
+        # Reopens the light source after failures instead of stopping
+        self.supervisor = CaptureSupervisor(
+            self._restart_reader,
+            self.metrics,
+            initial_delay=self.config.get("recovery", "initial_delay"),
+            max_delay=self.config.get("recovery", "max_delay"),
+            attempt_timeout=self.config.get("recovery", "attempt_timeout"),
+            on_lost=self._on_capture_lost,
+            on_recovered=self._on_capture_recovered,
+        )
+        self._recovery_enabled = False
+        self._stop_event = threading.Event()
+
+        # Parameters owned by the front-end, read lock-free by the workers
+        self.settings = SettingsStore(RuntimeSettings.from_config(self.config))
+        self.settings.subscribe(self._on_settings_changed)
+
+        self.config.subscribe(self._on_config_reloaded)
+
+        self.metrics.register_gauge(
+            "brightness_writes_filtered", lambda: self.brightness_controller.skip_count
+        )
+        self.metrics.register_gauge("camera_duty_cycle", self._duty_cycle)
+
+    @property
+    def running(self) -> bool:
+        return self.processing_thread is not None and not self._stop_event.is_set()
+
+    @property
+    def paused(self) -> bool:
+        return self.running and self.capture_thread.paused
+
+    def start(self) -> None:
+        """Start the capture and processing threads"""
+        if self.paused:
+            self.resume()
+            return
+        # Clean up after a pipeline that stopped itself on an error
+        self.stop()
+
+        self._stop_event.clear()
+        self.frame_queue = LatestFrameQueue()
+        # Chosen on every start, so a sensor plugged in or a changed
+        # config.json is picked up
+        self.light_source = get_light_source(self.config)
+        self.metrics.configured_fps = self.light_source.fps
+        detector = self.scene_detector if self.light_source.frames else None
+        if detector is not None:
+            detector.invalidate()
+        self.luminance_filter.reset()
+        self.trace_recorder = get_trace_recorder(self.config)
+        self.schedule = self.light_source.create_schedule(
+            detector.threshold if detector is not None else None
+        )
+        self._burst_reading = None
+        self._recovery_enabled = self.config.get("recovery", "enabled")
+        self.supervisor.hotplug_watch = (
+            self.light_source.hotplug_watch() if self.config.get("recovery", "hotplug") else None
+        )
+        self.supervisor.start()
+        self.capture_thread = self.light_source.create_reader(
+            self.settings.current.exposure,
+            self.frame_queue,
+            self._on_capture_error,
+            self.schedule,
+            self.metrics,
+        )
+        self.processing_thread = threading.Thread(
+            target=self._processing_loop, name="ProcessingThread", daemon=True
+        )
+        self.ramp.start()
+        self.capture_thread.start()
+        self.processing_thread.start()
+        self.metrics_reporter.start()
+        if self.metrics_server is not None:
+            self.metrics_server.start()
+
+        logger.info("%s started: %s", self.light_source.name, self.light_source.describe())
+
+    def stop(self) -> None:
+        """Stop the capture and processing threads and release the camera"""
+        if self.processing_thread is None:
+            return
+        # No reader may be started while the pipeline shuts down
+        self.supervisor.stop()
+        self._request_stop()
+
+        # Worker threads may end up here through an error path; they must
+        # not wait on themselves
+        current = threading.current_thread()
+        for thread in (self.capture_thread, self.processing_thread):
+            if thread is not None and thread is not current and thread.is_alive():
+                thread.join(timeout=2.0)
+
+        self.capture_thread = None
+        self.processing_thread = None
+        self.frame_queue = None
+        if self.trace_recorder is not None:
+            self.trace_recorder.close()
+            self.trace_recorder = None
+
+        # Make sure the last computed level reaches the display
+        self.ramp.stop()
+        self.brightness_controller.flush()
+        self.brightness_applier.close()
+        backend = self.brightness_applier.controller
+        if isinstance(backend, MultiDisplayBrightnessController):
+            # Its writer threads are started again by the next write
+            backend.close()
+        self.metrics_reporter.stop()
+        if self.metrics_server is not None:
+            self.metrics_server.stop()
+        logger.info("Metrics: %s", self.metrics.summary())
+
+        applier = self.brightness_applier
+        logger.info(
+            "Webcam stopped: %d brightness writes, avg %.1f ms, max %.1f ms",
+            applier.call_count,
+            applier.average_latency_ms,
+            applier.max_latency_ms,
+        )
+        detector = self.scene_detector
+        if detector is not None:
+            logger.info(
+                "Scene detection: %d frames processed, %d skipped (%.0f%%)",
+                detector.processed_frames,
+                detector.skipped_frames,
+                detector.skip_ratio * 100,
+            )
+
+    def pause(self) -> None:
+        """Stop adjusting brightness but keep the camera open for a quick resume"""
+        if not self.running:
+            return
+        self.capture_thread.pause()
+        self.ramp.stop()
+        self.brightness_controller.flush()
+        logger.info("Webcam paused")
+
+    def resume(self) -> None:
+        """Continue after pause() without reopening the camera"""
+        if not self.running:
+            return
+        self.ramp.start()
+        self.capture_thread.resume()
+        logger.info("Webcam resumed")
+
+    def _on_settings_changed(self, previous: RuntimeSettings, updated: RuntimeSettings) -> None:
+        # Exposure goes straight to the open camera
+        if updated.exposure != previous.exposure and self.capture_thread is not None:
+            self.capture_thread.set_exposure(updated.exposure)
+        # A static scene has to be measured again against the new settings
+        self._invalidate_scene()
+
+    def _invalidate_scene(self) -> None:
+        if self.scene_detector is not None:
+            self.scene_detector.invalidate()
+        if self._continuous_schedule():
+            self.schedule.report_change(True)
+
+    def start_calibration(self) -> None:
+        """Let the user pick brightness levels and record them against luminance"""
+        self.calibrator = CurveCalibrator()
+        self._calibration_level = None
+        logger.info("Calibration started")
+
+    def set_calibration_level(self, level: int) -> None:
+        """Apply the level chosen by the user and record it from now on"""
+        self._calibration_level = level
+        self.ramp.jump(level)
+        self._invalidate_scene()
+
+    def finish_calibration(self) -> bool:
+        """Fit the recorded samples and store the curve; False if nothing was saved"""
+        calibrator = self.calibrator
+        if calibrator is None:
+            return False
+        self.calibrator = None
+        saved = calibrator.save(self.config)
+        if saved:
+            self.brightness_curve = None
+            self._invalidate_scene()
+        return saved
+
+    def clear_calibration(self) -> bool:
+        """Discard any calibration in progress and the stored curve"""
+        self.calibrator = None
+        cleared = clear_calibration(self.config)
+        if cleared:
+            self.brightness_curve = None
+            self._invalidate_scene()
+        return cleared
+
+    def _on_config_reloaded(self, config: Config) -> None:
+        """Apply an externally edited config.json to the running pipeline"""
+        # Everything is built and checked before anything is swapped, so an
+        # invalid file leaves the pipeline as it was
+        estimator = get_luminance_estimator(config)
+        detector = get_scene_detector(config)
+        luminance_filter = get_luminance_filter(config)
+        max_rate = config.get("brightness", "max_writes_per_second")
+        deadband = config.get("brightness", "deadband")
+        curve = config.get("ramp", "curve")
+        if curve not in BrightnessRamp.CURVES:
+            raise ValueError(f"unknown ramp curve '{curve}'")
+        rate_hz = config.get("ramp", "rate_hz")
+        if rate_hz <= 0:
+            raise ValueError(f"ramp.rate_hz must be positive, got {rate_hz}")
+        schedule = None
+        if self.schedule is not None:
+            threshold = detector.threshold if detector is not None else None
+            schedule = self.light_source.create_schedule(
+                threshold if self.light_source.frames else None
+            )
+
+        # Each component is swapped or updated attribute by attribute, which
+        # the worker threads pick up on their next frame or tick
+        self.luminance_estimator = estimator
+        self.brightness_curve = None
+        self.scene_detector = detector
+        self.luminance_filter = luminance_filter
+
+        self.deadband = deadband
+        self.brightness_controller.min_interval = 1.0 / max_rate if max_rate > 0 else 0.0
+
+        self.ramp.curve = curve
+        self.ramp.interval = 1.0 / rate_hz
+        self.ramp.max_slew = config.get("ramp", "max_slew")
+        self.ramp.time_constant = config.get("ramp", "time_constant")
+        self.ramp.gamma = config.get("ramp", "gamma")
+
+        if self.schedule is not None:
+            # The reader holds on to its schedule, so it is updated in place.
+            # Without a schedule for the new settings (scene detection turned
+            # off) it stays at its shortest interval, as nothing backs it off
+            if schedule is not None:
+                self.schedule.min_interval = schedule.min_interval
+                self.schedule.max_interval = schedule.max_interval
+                self.schedule.change_threshold = schedule.change_threshold
+            self.schedule.report_change(True)
+
+        # The light source and camera mode are chosen when the pipeline starts
+        if self.running:
+            logger.info("Light source, camera and duty cycle changes take effect on the next start")
+
+    def _request_stop(self) -> None:
+        """Signal both worker threads to exit without waiting for them"""
+        self._stop_event.set()
+        if self.capture_thread is not None:
+            self.capture_thread.stop()
+        if self.frame_queue is not None:
+            self.frame_queue.close()
+
+    def _report_error(self, message: str) -> None:
+        logger.error(message)
+        self.metrics.increment("errors")
+        if self.on_error is not None:
+            self.on_error(message)
+        self._request_stop()
+
+    def _on_capture_error(self, message: str) -> None:
+        if self._recovery_enabled:
+            self.supervisor.failed(message)
+        else:
+            self._report_error(f"Error capturing frame: {message}")
+
+    def _restart_reader(self) -> Optional[CaptureThread]:
+        """Replace a reader that gave up or hung with a new one on the same frame queue"""
+        previous = self.capture_thread
+        # The old reader releases its device on the way out; a hung one is
+        # told to exit whenever its call returns, and is not waited for long
+        if previous is not None and previous.is_alive():
+            previous.stop()
+            previous.join(timeout=2.0)
+        if self._stop_event.is_set():
+            return None
+        reader = self.light_source.create_reader(
+            self.settings.current.exposure,
+            self.frame_queue,
+            self._on_capture_error,
+            self.schedule,
+            self.metrics,
+        )
+        if previous is not None and previous.paused:
+            reader.pause()
+        self.capture_thread = reader
+        reader.start()
+        return reader
+
+    def _on_capture_lost(self, message: str) -> None:
+        if self.on_capture_lost is not None:
+            self.on_capture_lost(message)
+
+    def _on_capture_recovered(self, outage: float) -> None:
+        # Whatever the scene did meanwhile has to be measured again
+        self._invalidate_scene()
+        if self.on_capture_recovered is not None:
+            self.on_capture_recovered(outage)
+
+    def _on_brightness_failure(self) -> None:
+        # The cache recorded the level when it was queued; forget it so the
+        # level is not skipped as already applied next time
+        self.brightness_controller.invalidate()
+        if self.on_brightness_failure is not None:
+            self.on_brightness_failure()
+
+    def _processing_loop(self) -> None:
+        """Consume the most recent frame until stopped"""
+        frame_queue = self.frame_queue
+        dropped = 0
+        while not self._stop_event.is_set():
+            item = frame_queue.get(timeout=0.5)
+            if frame_queue.dropped_frames != dropped:
+                self.metrics.increment("frames_dropped", frame_queue.dropped_frames - dropped)
+                dropped = frame_queue.dropped_frames
+            if item is None:
+                continue
+            self.supervisor.frame_received()
+            frame, captured_at = item
+            self.update_frame(frame, captured_at)
+
+    def _duty_cycle(self) -> float:
+        """Share of the time the camera is open, 1.0 for continuous capture"""
+        capture_thread = self.capture_thread
+        return capture_thread.duty_cycle if capture_thread is not None else 0.0
+
+    def _continuous_schedule(self) -> bool:
+        """Whether the schedule paces continuous capture rather than duty cycles"""
+        return (
+            self.schedule is not None
+            and self.light_source.frames
+            and not isinstance(self.capture_thread, DutyCycleCaptureThread)
+        )
+
+    def _report_to_schedule(self, measured: Optional[float], captured_at: float) -> None:
+        """Feed the duty cycle or sensor schedule; None for a frame skipped as static"""
+        if measured is not None:
+            self._burst_reading = measured
+        capture_thread = self.capture_thread
+        if isinstance(capture_thread, DutyCycleCaptureThread) and not capture_thread.ends_burst(
+            captured_at
+        ):
+            # The interval moves once per burst, on its last frame, with the
+            # latest reading any frame of the burst produced
+            return
+        measured, self._burst_reading = self._burst_reading, None
+        if measured is None:
+            self.schedule.report_change(False)
+        else:
+            self.schedule.report(measured)
+        if self.on_duty_cycle is not None and capture_thread is not None:
+            self.on_duty_cycle(capture_thread.duty_cycle)
+
+    def update_frame(self, frame: Union[np.ndarray, float], captured_at: float) -> None:
+        """Process a captured frame or sensor reading and apply the resulting brightness"""
+        try:
+            metrics = self.metrics
+            started = time.perf_counter()
+
+            # Static frames are dropped before any metering work is done
+            frames = self.light_source.frames
+            detector = self.scene_detector if frames else None
+            continuous_schedule = self.schedule if self._continuous_schedule() else None
+            recorder = self.trace_recorder
+            detect_ms = sample_ms = measure_ms = 0.0
+            if detector is not None:
+                changed = detector.changed(frame)
+                if continuous_schedule is not None:
+                    continuous_schedule.report_change(changed)
+                detected = time.perf_counter()
+                detect_ms = (detected - started) * 1000
+                metrics.observe("detect", detect_ms)
+                if not changed:
+                    metrics.increment("frames_skipped")
+                    if recorder is not None:
+                        recorder.record(
+                            captured_at, 0.0, 0.0, self.ramp.current, 0, 0, self.ramp.level,
+                            FLAG_SKIPPED, (detect_ms, 0.0, 0.0, 0.0, 0.0),
+                        )
+                    # A static scene has to back the duty cycle off as well
+                    if self.schedule is not None and continuous_schedule is None:
+                        self._report_to_schedule(None, captured_at)
+                    return
+                started = detected
+
+            # One snapshot per frame, so all stages see consistent settings
+            settings = self.settings.current
+            if frames:
+                sample = self.luminance_estimator.sample(frame)
+                sampled = time.perf_counter()
+                measured = self.luminance_estimator.measure(sample)
+                # Raw Y samples have to be put on the scale of decoded frames,
+                # so thresholds and calibration apply to both backends
+                capture_thread = self.capture_thread
+                if capture_thread is not None and capture_thread.limited_range_luma:
+                    measured = limited_to_full_range(measured)
+                measured_at = time.perf_counter()
+                sample_ms = (sampled - started) * 1000
+                measure_ms = (measured_at - sampled) * 1000
+                metrics.observe("sample", sample_ms)
+                metrics.observe("measure", measure_ms)
+            else:
+                # Sensor readings already are luminance values
+                measured = frame
+                measured_at = started
+            luminance = self.luminance_filter.update(measured, captured_at)
+            filtered = time.perf_counter()
+            filter_ms = (filtered - measured_at) * 1000
+            metrics.observe("filter", filter_ms)
+            # Keep measuring until the filter has caught up with the scene;
+            # skipping the frames of a now static scene would freeze it
+            # short of the new level
+            if detector is not None and abs(luminance - measured) > detector.threshold:
+                detector.invalidate()
+
+            calibrator = self.calibrator
+            if calibrator is not None:
+                # The user drives the brightness while calibrating
+                final_brightness = self._calibration_level
+                if final_brightness is None:
+                    final_brightness = self.ramp.level or 0
+                else:
+                    calibrator.record(luminance, final_brightness)
+                target_brightness = final_brightness
+            else:
+                # The lookup table only needs rebuilding when the threshold
+                # changes or a new curve was calibrated
+                curve = self.brightness_curve
+                if curve is None or not curve.matches(settings.threshold):
+                    curve = get_brightness_curve(self.config, settings.threshold)
+                    self.brightness_curve = curve
+                target_brightness = curve.map(luminance)
+                # Keep the current target when the new one is within the deadband
+                if within_deadband(target_brightness, self.ramp.target, self.deadband):
+                    target_brightness = int(round(self.ramp.target))
+
+                # The ramp applies the level; repeated and too frequent writes
+                # are filtered further down by the brightness controller
+                if settings.smooth_transitions:
+                    self.ramp.set_target(target_brightness)
+                else:
+                    self.ramp.jump(target_brightness)
+                final_brightness = self.ramp.level
+                if final_brightness is None:
+                    final_brightness = target_brightness
+
+            mapped = time.perf_counter()
+            map_ms = (mapped - filtered) * 1000
+            metrics.observe("map", map_ms)
+            metrics.increment("frames_processed")
+            latency_ms = (mapped - captured_at) * 1000
+            metrics.observe_latency(latency_ms)
+            if recorder is not None:
+                flags = (
+                    (FLAG_SMOOTH if settings.smooth_transitions else 0)
+                    | (FLAG_CALIBRATING if calibrator is not None else 0)
+                    | (0 if frames else FLAG_SENSOR)
+                )
+                recorder.record(
+                    captured_at, measured, luminance, self.ramp.current, target_brightness,
+                    settings.threshold, self.ramp.level, flags,
+                    (detect_ms, sample_ms, measure_ms, filter_ms, map_ms),
+                )
+            if self.on_reading is not None:
+                self.on_reading(luminance, final_brightness, latency_ms)
+
+            if self.schedule is not None and continuous_schedule is None:
+                # The unfiltered reading, so a change the filter is still
+                # holding back gets sampled quickly
+                self._report_to_schedule(measured, captured_at)
+
+        except Exception as e:
+            if self._recovery_enabled:
+                # One bad frame is no reason to stop; repeats are rate limited
+                self.metrics.increment("errors")
+                logger.error("Error processing frame: %s", e)
+            else:
+                self._report_error(f"Error processing frame: {str(e)}")
@@ -0,0 +1,82 @@
+"""Headless Auto Brightness daemon.
+
+Runs the capture and brightness pipeline without importing Qt, for kiosks,
+servers and login autostart:
+
+    python -m src.daemon [--threshold N] [--exposure N] [--verbose]
+"""
+import argparse
+import signal
+import sys
+import threading
+
+from .config import Config
+from .core import AutoBrightnessCore
+from .logger import logger
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Headless Auto Brightness daemon")
+    parser.add_argument("--threshold", type=int, help="brightness threshold (1-255)")
+    parser.add_argument("--exposure", type=int, help="camera exposure")
+    parser.add_argument(
+        "--verbose", action="store_true", help="print every reading to stdout"
+    )
+    args = parser.parse_args()
+
+    config = Config()
+    core = AutoBrightnessCore(config)
+    if args.threshold is not None:
+        core.settings.update(threshold=args.threshold)
+    if args.exposure is not None:
+        core.settings.update(exposure=args.exposure)
+
+    def on_config_reloaded(config: Config) -> None:
+        # Without a window the defaults in config.json are the controls;
+        # command line values keep precedence
+        changes = {"smooth_transitions": config.get("advanced", "smooth_transitions")}
+        if args.threshold is None:
+            changes["threshold"] = config.get("brightness", "default_threshold")
+        if args.exposure is None:
+            changes["exposure"] = config.get("camera", "default_exposure")
+        core.settings.update(**changes)
+
+    config.subscribe(on_config_reloaded)
+    config.start_watching()
+
+    stopped = threading.Event()
+    errors = []
+
+    def on_error(message: str) -> None:
+        errors.append(message)
+        stopped.set()
+
+    core.on_error = on_error
+    if args.verbose:
+        core.on_reading = lambda luminance, brightness, latency_ms: print(
+            f"luminance={luminance:.2f} brightness={brightness}% latency={latency_ms:.1f}ms",
+            flush=True,
+        )
+
+    # Stop cleanly on Ctrl+C and on service manager shutdown
+    signal.signal(signal.SIGINT, lambda signum, frame: stopped.set())
+    signal.signal(signal.SIGTERM, lambda signum, frame: stopped.set())
+
+    try:
+        core.start()
+    except Exception as e:
+        logger.critical("Failed to start daemon: %s", e)
+        config.close()
+        return 1
+    logger.info("Daemon started")
+
+    while not stopped.wait(1.0):
+        pass
+    core.stop()
+    config.close()
+    logger.info("Daemon stopped")
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
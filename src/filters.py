@@ -0,0 +1,247 @@
+import math
+from abc import ABC, abstractmethod
+from typing import List, Optional
+
+import numpy as np
+
+from .config import Config
+from .logger import logger
+
+# Scales the median absolute deviation to a standard deviation for
+# normally distributed noise
+MAD_SCALE = 1.4826
+
+
+class RingBuffer:
+    """Fixed-size window of recent readings backed by preallocated arrays.
+
+    Order statistics are computed by partitioning a preallocated scratch
+    array in place, so pushing and taking medians never allocates.
+    """
+
+    def __init__(self, size: int):
+        self.size = max(1, int(size))
+        self.count = 0
+        self._data = np.zeros(self.size, dtype=np.float64)
+        self._scratch = np.empty(self.size, dtype=np.float64)
+        self._index = 0
+
+    def push(self, value: float) -> None:
+        self._data[self._index] = value
+        self._index = (self._index + 1) % self.size
+        self.count = min(self.count + 1, self.size)
+
+    def clear(self) -> None:
+        self.count = 0
+        self._index = 0
+
+    def median(self) -> float:
+        scratch = self._scratch[:self.count]
+        np.copyto(scratch, self._data[:self.count])
+        return self._median_in_place(scratch)
+
+    def median_absolute_deviation(self, median: float) -> float:
+        scratch = self._scratch[:self.count]
+        np.subtract(self._data[:self.count], median, out=scratch)
+        np.abs(scratch, out=scratch)
+        return self._median_in_place(scratch)
+
+    @staticmethod
+    def _median_in_place(values: np.ndarray) -> float:
+        middle = len(values) // 2
+        values.partition(middle)
+        if len(values) % 2:
+            return float(values[middle])
+        return (float(values[:middle].max()) + float(values[middle])) / 2
+
+
+class LuminanceFilter(ABC):
+    """Filters the stream of luminance readings before they are mapped"""
+
+    @abstractmethod
+    def update(self, value: float, timestamp: float) -> float:
+        """Feed a reading taken at timestamp (seconds) and return the filtered value"""
+        pass
+
+    @abstractmethod
+    def reset(self) -> None:
+        """Forget all history, e.g. when the camera is restarted"""
+        pass
+
+
+class PassThroughFilter(LuminanceFilter):
+    def update(self, value: float, timestamp: float) -> float:
+        return value
+
+    def reset(self) -> None:
+        pass
+
+
+class EmaFilter(LuminanceFilter):
+    """Exponential moving average with a fixed smoothing factor"""
+
+    def __init__(self, alpha: float = 0.1):
+        self.alpha = min(1.0, max(0.0, alpha))
+        self._value: Optional[float] = None
+
+    def update(self, value: float, timestamp: float) -> float:
+        if self._value is None:
+            self._value = value
+        else:
+            self._value += self.alpha * (value - self._value)
+        return self._value
+
+    def reset(self) -> None:
+        self._value = None
+
+
+class MedianFilter(LuminanceFilter):
+    """Median of the last `window` readings; ignores short spikes entirely"""
+
+    def __init__(self, window: int = 5):
+        self._buffer = RingBuffer(window)
+
+    def update(self, value: float, timestamp: float) -> float:
+        self._buffer.push(value)
+        return self._buffer.median()
+
+    def reset(self) -> None:
+        self._buffer.clear()
+
+
+class OneEuroFilter(LuminanceFilter):
+    """Speed-adaptive low-pass filter (Casiez et al., the "1 euro filter").
+
+    The cutoff frequency rises with the rate of change: slow drifts and
+    noise are smoothed heavily, while a real lighting change passes through
+    with little lag. Timestamps make it independent of the frame rate.
+    """
+
+    def __init__(self, min_cutoff: float = 0.5, beta: float = 0.05, d_cutoff: float = 1.0):
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.d_cutoff = d_cutoff
+        self._value: Optional[float] = None
+        self._derivative = 0.0
+        self._timestamp = 0.0
+
+    @staticmethod
+    def _alpha(cutoff: float, dt: float) -> float:
+        tau = 1.0 / (2 * math.pi * cutoff)
+        return 1.0 / (1.0 + tau / dt)
+
+    def update(self, value: float, timestamp: float) -> float:
+        if self._value is None:
+            self._value = value
+            self._timestamp = timestamp
+            return value
+        dt = timestamp - self._timestamp
+        if dt <= 0:
+            return self._value
+        self._timestamp = timestamp
+
+        derivative = (value - self._value) / dt
+        self._derivative += self._alpha(self.d_cutoff, dt) * (derivative - self._derivative)
+        cutoff = self.min_cutoff + self.beta * abs(self._derivative)
+        self._value += self._alpha(cutoff, dt) * (value - self._value)
+        return self._value
+
+    def reset(self) -> None:
+        self._value = None
+        self._derivative = 0.0
+
+
+class OutlierRejector(LuminanceFilter):
+    """Holds the previous reading when a new one is far off the recent median.
+
+    A reading counts as an outlier when it deviates from the median of the
+    window by more than `threshold` robust standard deviations (and at
+    least `min_deviation` levels). Momentary events such as someone
+    walking past are dropped; once `persistence` outliers arrive in a row
+    the change is accepted as real and the window restarts from there.
+    """
+
+    def __init__(
+        self,
+        window: int = 5,
+        threshold: float = 3.0,
+        min_deviation: float = 10.0,
+        persistence: int = 3,
+    ):
+        self.threshold = threshold
+        self.min_deviation = min_deviation
+        self.persistence = max(1, persistence)
+        self.rejected_count = 0
+        self._buffer = RingBuffer(window)
+        self._last: Optional[float] = None
+        self._consecutive = 0
+
+    def update(self, value: float, timestamp: float) -> float:
+        buffer = self._buffer
+        if buffer.count >= min(3, buffer.size):
+            median = buffer.median()
+            spread = MAD_SCALE * buffer.median_absolute_deviation(median)
+            if abs(value - median) > max(self.threshold * spread, self.min_deviation):
+                self._consecutive += 1
+                if self._consecutive < self.persistence:
+                    self.rejected_count += 1
+                    return self._last
+                buffer.clear()
+        self._consecutive = 0
+        buffer.push(value)
+        self._last = value
+        return value
+
+    def reset(self) -> None:
+        self._buffer.clear()
+        self._last = None
+        self._consecutive = 0
+
+
+class FilterChain(LuminanceFilter):
+    """Runs a reading through several filters in order"""
+
+    def __init__(self, filters: List[LuminanceFilter]):
+        self.filters = filters
+
+    def update(self, value: float, timestamp: float) -> float:
+        for luminance_filter in self.filters:
+            value = luminance_filter.update(value, timestamp)
+        return value
+
+    def reset(self) -> None:
+        for luminance_filter in self.filters:
+            luminance_filter.reset()
+
+
+def get_luminance_filter(
+    config: Optional[Config] = None, method: Optional[str] = None
+) -> LuminanceFilter:
+    """Factory function to build the filter selected in config.json"""
+    config = config or Config()
+    window = config.get("brightness", "filter_window")
+    method = method or config.get("brightness", "filter")
+
+    if method == "one_euro":
+        smoothing = OneEuroFilter(
+            min_cutoff=config.get("brightness", "one_euro_min_cutoff"),
+            beta=config.get("brightness", "one_euro_beta"),
+        )
+    elif method == "median":
+        smoothing = MedianFilter(window)
+    elif method == "ema":
+        smoothing = EmaFilter(config.get("brightness", "smoothing_factor"))
+    else:
+        if method != "none":
+            logger.warning("Unknown filter '%s', luminance is not filtered", method)
+        smoothing = PassThroughFilter()
+
+    if not config.get("brightness", "outlier_rejection"):
+        return smoothing
+    rejector = OutlierRejector(
+        window=window,
+        threshold=config.get("brightness", "outlier_threshold"),
+        min_deviation=config.get("brightness", "outlier_min_deviation"),
+        persistence=config.get("brightness", "outlier_persistence"),
+    )
+    return FilterChain([rejector, smoothing])
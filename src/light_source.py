@@ -0,0 +1,437 @@
+import glob
+import math
+import os
+import re
+import select
+import sys
+import time
+from abc import ABC, abstractmethod
+from typing import Callable, List, Optional, Tuple
+
+from .capture import (
+    AdaptiveInterval,
+    CaptureThread,
+    DutyCycleCaptureThread,
+    LatestFrameQueue,
+    capture_rate,
+)
+from .config import Config
+from .logger import logger
+from .metrics import Metrics
+from .v4l2 import V4L2CaptureThread
+
+IIO_ROOT = "/sys/bus/iio/devices"
+
+
+def lux_to_luminance(lux: float, max_lux: float) -> float:
+    """Map illuminance onto the 0-255 luminance scale used by the camera.
+
+    Perceived brightness is roughly logarithmic in lux, so the mapping is
+    too: max_lux and above reads as 255.
+    """
+    if lux <= 0:
+        return 0.0
+    return min(255.0, 255.0 * math.log10(1.0 + lux) / math.log10(1.0 + max(1.0, max_lux)))
+
+
+class LightSource(ABC):
+    """Where AutoBrightnessCore gets its ambient light readings from.
+
+    A source creates the reader thread that publishes samples into the
+    core's frame queue, and the schedule pacing it.
+    """
+
+    name = ""
+    # Highest rate samples are published at
+    fps = 0.0
+    # Samples are camera frames that go through scene detection and the
+    # luminance estimator; otherwise they already are luminance readings
+    frames = True
+
+    def __init__(self, config: Config):
+        self.config = config
+
+    @abstractmethod
+    def create_schedule(self, scene_threshold: Optional[float]) -> Optional[AdaptiveInterval]:
+        """Schedule for the reader; scene_threshold is set if scenes are detected"""
+        pass
+
+    @abstractmethod
+    def create_reader(
+        self,
+        exposure: int,
+        frame_queue: LatestFrameQueue,
+        on_error: Callable[[str], None],
+        schedule: Optional[AdaptiveInterval],
+        metrics: Optional[Metrics],
+    ) -> CaptureThread:
+        """Create the (not yet started) thread publishing samples"""
+        pass
+
+    @abstractmethod
+    def describe(self) -> str:
+        """Short description for the log"""
+        pass
+
+    def hotplug_watch(self) -> Optional[Tuple[str, str]]:
+        """Directory and name prefix of the device nodes to watch while recovering"""
+        return None
+
+
+class WebcamLightSource(LightSource):
+    name = "Webcam"
+    frames = True
+
+    def __init__(self, config: Config):
+        super().__init__(config)
+        self.device_index = config.get("camera", "device_index")
+        self.fps = capture_rate(config)
+        self.duty_cycle_enabled = config.get("duty_cycle", "enabled")
+        self.backend = config.get("camera", "backend")
+
+    def create_schedule(self, scene_threshold: Optional[float]) -> Optional[AdaptiveInterval]:
+        if self.duty_cycle_enabled:
+            return AdaptiveInterval(
+                self.config.get("duty_cycle", "min_interval"),
+                self.config.get("duty_cycle", "max_interval"),
+                self.config.get("duty_cycle", "change_threshold"),
+            )
+        if scene_threshold is None:
+            return None
+        # While the scene stays static, reads back off towards
+        # scene.max_interval and snap back to full rate on a change
+        return AdaptiveInterval(
+            1.0 / self.fps,
+            max(1.0 / self.fps, self.config.get("scene", "max_interval")),
+            scene_threshold,
+        )
+
+    def create_reader(
+        self,
+        exposure: int,
+        frame_queue: LatestFrameQueue,
+        on_error: Callable[[str], None],
+        schedule: Optional[AdaptiveInterval],
+        metrics: Optional[Metrics],
+    ) -> CaptureThread:
+        if self.duty_cycle_enabled:
+            return DutyCycleCaptureThread(
+                self.config, exposure, frame_queue, on_error, schedule, metrics
+            )
+        thread_class = CaptureThread
+        if self.backend == "v4l2":
+            # Falls back to OpenCV by itself if the device cannot be streamed
+            thread_class = V4L2CaptureThread
+        elif self.backend != "opencv":
+            logger.warning("Unknown capture backend '%s', using OpenCV", self.backend)
+        return thread_class(self.config, exposure, frame_queue, on_error, schedule, metrics)
+
+    def hotplug_watch(self) -> Optional[Tuple[str, str]]:
+        # Video device nodes only exist on Linux
+        if not sys.platform.startswith("linux"):
+            return None
+        return "/dev", "video"
+
+    def describe(self) -> str:
+        if self.duty_cycle_enabled:
+            return f"device={self.device_index}, duty cycled"
+        return f"device={self.device_index}, fps={self.fps}"
+
+
+def find_illuminance_sensors(root: str = IIO_ROOT) -> List[str]:
+    """IIO device directories exposing an illuminance channel"""
+    devices = set()
+    for pattern in ("in_illuminance_raw", "in_illuminance_input"):
+        devices.update(os.path.dirname(path) for path in glob.glob(os.path.join(root, "*", pattern)))
+    return sorted(devices)
+
+
+def _read_number(path: str, default: float) -> float:
+    try:
+        with open(path) as file:
+            return float(file.read().strip())
+    except (OSError, ValueError):
+        return default
+
+
+def _write_attribute(path: str, value: str) -> None:
+    with open(path, "w") as file:
+        file.write(value)
+
+
+class IioLightSensor:
+    """An IIO ambient light sensor read through sysfs or its buffer.
+
+    The channel file stays open and is re-read with pread, which costs a
+    few microseconds per reading. In buffered mode the driver pushes
+    samples into /dev/iio:deviceN and reads block until one arrives.
+    """
+
+    # e.g. "le:u16/16>>0" or "be:s12/16X2>>4"
+    SCAN_TYPE = re.compile(r"([bl]e):([su])(\d+)/(\d+)(?:X(\d+))?>>(\d+)")
+
+    def __init__(self, device_dir: str, dev_root: str = "/dev"):
+        self.device_dir = device_dir
+        self.name = os.path.basename(device_dir)
+        self.dev_root = dev_root
+        self.label = self._read_label()
+
+        # Raw values (sysfs and buffer) are converted to lux with these
+        self.scale = _read_number(os.path.join(device_dir, "in_illuminance_scale"), 1.0)
+        self.offset = _read_number(os.path.join(device_dir, "in_illuminance_offset"), 0.0)
+        processed = os.path.join(device_dir, "in_illuminance_input")
+        # Some drivers only export the value already converted to lux
+        self._processed = os.path.exists(processed)
+        self._path = processed if self._processed else os.path.join(device_dir, "in_illuminance_raw")
+        self._fd = os.open(self._path, os.O_RDONLY)
+        self._buffer_fd: Optional[int] = None
+        self._scan: Optional[Tuple[int, int, Callable[[bytes], float]]] = None
+
+    def _read_label(self) -> str:
+        for attribute in ("label", "name"):
+            path = os.path.join(self.device_dir, attribute)
+            try:
+                with open(path) as file:
+                    return file.read().strip()
+            except OSError:
+                continue
+        return self.name
+
+    def read_lux(self) -> float:
+        """Read the current illuminance from sysfs"""
+        value = float(os.pread(self._fd, 32, 0))
+        if self._processed:
+            return value
+        return (value + self.offset) * self.scale
+
+    def enable_buffer(self, length: int = 16) -> bool:
+        """Switch to buffered reads; False if the device cannot do that"""
+        scan_dir = os.path.join(self.device_dir, "scan_elements")
+        try:
+            _write_attribute(os.path.join(scan_dir, "in_illuminance_en"), "1")
+            self._scan = self._scan_layout(scan_dir)
+            _write_attribute(os.path.join(self.device_dir, "buffer", "length"), str(length))
+            _write_attribute(os.path.join(self.device_dir, "buffer", "enable"), "1")
+            self._buffer_fd = os.open(
+                os.path.join(self.dev_root, self.name), os.O_RDONLY | os.O_NONBLOCK
+            )
+        except (OSError, ValueError) as e:
+            logger.warning("Buffered reads unavailable on %s, polling instead: %s", self.name, e)
+            self._disable_buffer()
+            self._scan = None
+            return False
+        return True
+
+    def _scan_layout(self, scan_dir: str) -> Tuple[int, int, Callable[[bytes], float]]:
+        """Scan size, illuminance offset and decoder from the enabled elements"""
+        elements = []
+        for enabled in glob.glob(os.path.join(scan_dir, "*_en")):
+            if _read_number(enabled, 0.0) != 1:
+                continue
+            prefix = enabled[: -len("_en")]
+            with open(prefix + "_type") as file:
+                match = self.SCAN_TYPE.fullmatch(file.read().strip())
+            if match is None:
+                raise ValueError(f"Unknown scan type in {prefix}_type")
+            index = int(_read_number(prefix + "_index", 0.0))
+            elements.append((index, os.path.basename(prefix), match))
+
+        size = offset = 0
+        alignment = 1
+        decode = None
+        for _, name, match in sorted(elements):
+            endian, sign, bits, storage, repeat, shift = match.groups()
+            storage_bytes = int(storage) // 8 * int(repeat or 1)
+            # Elements are aligned to their own storage size
+            size += -size % (int(storage) // 8)
+            if name == "in_illuminance":
+                offset = size
+                decode = self._decoder(endian, sign == "s", int(bits), int(storage), int(shift))
+            size += storage_bytes
+            alignment = max(alignment, int(storage) // 8)
+        if decode is None:
+            raise ValueError("The illuminance channel is not part of the scan")
+        size += -size % alignment
+        return size, offset, decode
+
+    @staticmethod
+    def _decoder(
+        endian: str, signed: bool, bits: int, storage: int, shift: int
+    ) -> Callable[[bytes], float]:
+        byteorder = "little" if endian == "le" else "big"
+        mask = (1 << bits) - 1
+
+        def decode(data: bytes) -> float:
+            value = (int.from_bytes(data[: storage // 8], byteorder) >> shift) & mask
+            if signed and value & (1 << (bits - 1)):
+                value -= 1 << bits
+            return float(value)
+
+        return decode
+
+    def read_buffered(self, timeout: float) -> Optional[float]:
+        """Wait for buffered samples and return the newest in lux, None on timeout"""
+        size, offset, decode = self._scan
+        ready, _, _ = select.select([self._buffer_fd], [], [], timeout)
+        if not ready:
+            return None
+        try:
+            data = os.read(self._buffer_fd, size * 16)
+        except BlockingIOError:
+            return None
+        if len(data) < size:
+            return None
+        newest = data[(len(data) // size - 1) * size:]
+        return (decode(newest[offset:]) + self.offset) * self.scale
+
+    def _disable_buffer(self) -> None:
+        if self._buffer_fd is not None:
+            os.close(self._buffer_fd)
+            self._buffer_fd = None
+        try:
+            _write_attribute(os.path.join(self.device_dir, "buffer", "enable"), "0")
+        except OSError:
+            pass
+
+    def close(self) -> None:
+        if self._scan is not None:
+            self._disable_buffer()
+            self._scan = None
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+
+class SensorReaderThread(CaptureThread):
+    """Publishes ambient light sensor readings as luminance values.
+
+    Polls at the interval of the AdaptiveInterval schedule, or blocks on
+    the sensor's buffer in buffered mode. The camera is never opened.
+    """
+
+    def __init__(
+        self,
+        config: Config,
+        open_sensor: Callable[[], IioLightSensor],
+        frame_queue: LatestFrameQueue,
+        on_error: Callable[[str], None],
+        schedule: AdaptiveInterval,
+        metrics: Optional[Metrics] = None,
+    ):
+        super().__init__(config, 0, frame_queue, on_error, schedule, metrics)
+        self.name = "SensorReaderThread"
+        self.open_sensor = open_sensor
+        self.buffered = config.get("light_source", "buffered")
+        self.max_lux = config.get("light_source", "max_lux")
+        self.duty_cycle = 0.0
+
+    def run(self) -> None:
+        sensor: Optional[IioLightSensor] = None
+        try:
+            sensor = self.open_sensor()
+            buffered = self.buffered and sensor.enable_buffer()
+            self.granted = {"device": sensor.name, "buffered": buffered}
+            logger.info(
+                "Reading %s (%s), %s",
+                sensor.label,
+                sensor.name,
+                "buffered" if buffered else "polled",
+            )
+            while not self._stop_event.is_set():
+                if self.paused and not self._wait_while_paused():
+                    break
+
+                read_started = time.perf_counter()
+                try:
+                    if buffered:
+                        lux = sensor.read_buffered(timeout=0.5)
+                        if lux is None:
+                            continue
+                    else:
+                        lux = sensor.read_lux()
+                except (OSError, ValueError) as e:
+                    self._read_failed(f"Failed to read {sensor.name}: {e}")
+                    self._stop_event.wait(self.schedule.min_interval)
+                    continue
+                captured_at = time.perf_counter()
+                if buffered:
+                    # The read mostly waited for the sample, only count it
+                    if self.metrics is not None:
+                        self.metrics.frame_captured(captured_at)
+                else:
+                    self._record_read(read_started, captured_at)
+                self.frame_queue.put(lux_to_luminance(lux, self.max_lux), captured_at)
+
+                if not buffered:
+                    self._stop_event.wait(self.schedule.interval)
+        except Exception as e:
+            if not self._stop_event.is_set():
+                self.on_error(str(e))
+        finally:
+            if sensor is not None:
+                sensor.close()
+
+
+class IioLightSource(LightSource):
+    name = "Light sensor"
+    frames = False
+
+    def __init__(self, config: Config, device_dir: str):
+        super().__init__(config)
+        self.device_dir = device_dir
+        self.fps = 1.0 / max(0.001, config.get("light_source", "min_interval"))
+
+    def create_schedule(self, scene_threshold: Optional[float]) -> Optional[AdaptiveInterval]:
+        return AdaptiveInterval(
+            self.config.get("light_source", "min_interval"),
+            self.config.get("light_source", "max_interval"),
+            self.config.get("light_source", "change_threshold"),
+        )
+
+    def create_reader(
+        self,
+        exposure: int,
+        frame_queue: LatestFrameQueue,
+        on_error: Callable[[str], None],
+        schedule: Optional[AdaptiveInterval],
+        metrics: Optional[Metrics],
+    ) -> CaptureThread:
+        return SensorReaderThread(
+            self.config,
+            lambda: IioLightSensor(self.device_dir),
+            frame_queue,
+            on_error,
+            schedule,
+            metrics,
+        )
+
+    def hotplug_watch(self) -> Optional[Tuple[str, str]]:
+        # sysfs sends no inotify events; the watcher polls it instead
+        return os.path.dirname(self.device_dir), "iio:device"
+
+    def describe(self) -> str:
+        mode = "buffered" if self.config.get("light_source", "buffered") else "polled"
+        return f"device={os.path.basename(self.device_dir)}, {mode}"
+
+
+def get_light_source(config: Config) -> LightSource:
+    """Factory function for the light source selected in config.json.
+
+    "auto" picks the first IIO ambient light sensor and falls back to the
+    webcam if there is none.
+    """
+    kind = config.get("light_source", "type")
+    if kind in ("auto", "sensor"):
+        root = config.get("light_source", "sysfs_root")
+        sensors = find_illuminance_sensors(root)
+        device = config.get("light_source", "sensor_device")
+        if device:
+            sensors = [path for path in sensors if os.path.basename(path) == device]
+        if sensors:
+            logger.info("Using ambient light sensor %s", os.path.basename(sensors[0]))
+            return IioLightSource(config, sensors[0])
+        if kind == "sensor":
+            logger.warning("No ambient light sensor found under %s, using the webcam", root)
+    elif kind != "webcam":
+        logger.warning("Unknown light source '%s', using the webcam", kind)
+    return WebcamLightSource(config)
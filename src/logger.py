@@ -1,13 +1,183 @@
+import atexit
+import glob
 import logging
 import os
+import queue
+import re
 import sys
-from datetime import datetime
-from typing import Optional
+import threading
+import time
+from datetime import date, datetime, timedelta
+from logging.handlers import BaseRotatingHandler, QueueHandler, QueueListener
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+
+class SuppressionFormatter(logging.Formatter):
+    """Notes how many repeats of a message the rate limiter dropped before it"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        text = super().format(record)
+        suppressed = getattr(record, "suppressed", 0)
+        if suppressed:
+            text += f" (suppressed {suppressed} repeats)"
+        return text
+
+
+class DailyRotatingFileHandler(BaseRotatingHandler):
+    """Writes to <prefix>_YYYYMMDD.log, starting a new file every day.
+
+    A file growing past max_bytes within a day is moved to .1.log (older
+    ones shift up, at most backup_count per day), and files older than
+    keep_days are deleted when the day changes.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        prefix: str = "autobrightness",
+        max_bytes: int = 10 * 1024 * 1024,
+        backup_count: int = 5,
+        keep_days: int = 14,
+    ):
+        self.directory = directory
+        self.prefix = prefix
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.keep_days = keep_days
+        self._day = date.today()
+        self._next_day: Optional[date] = None
+        super().__init__(self._path_for(self._day), "a", encoding="utf-8", delay=True)
+
+    def _path_for(self, day: date, index: int = 0) -> str:
+        suffix = f".{index}" if index else ""
+        return os.path.join(self.directory, f"{self.prefix}_{day:%Y%m%d}{suffix}.log")
+
+    def shouldRollover(self, record: logging.LogRecord) -> bool:
+        day = date.fromtimestamp(record.created)
+        if day != self._day:
+            self._next_day = day
+            return True
+        if self.max_bytes <= 0:
+            return False
+        if self.stream is None:
+            self.stream = self._open()
+        return self.stream.tell() + len(self.format(record)) + 1 > self.max_bytes
+
+    def doRollover(self) -> None:
+        if self.stream is not None:
+            self.stream.close()
+            self.stream = None
+        if self._next_day is not None:
+            self._day, self._next_day = self._next_day, None
+            self.baseFilename = os.path.abspath(self._path_for(self._day))
+            self._remove_expired()
+            return
+        # Size rollover within the day: shift .1 -> .2 and so on
+        for index in range(self.backup_count - 1, 0, -1):
+            source = self._path_for(self._day, index)
+            if os.path.exists(source):
+                os.replace(source, self._path_for(self._day, index + 1))
+        if self.backup_count > 0:
+            os.replace(self.baseFilename, self._path_for(self._day, 1))
+        else:
+            os.remove(self.baseFilename)
+
+    def _remove_expired(self) -> None:
+        oldest = self._day - timedelta(days=self.keep_days)
+        pattern = re.compile(re.escape(self.prefix) + r"_(\d{8})(\.\d+)?\.log$")
+        for path in glob.glob(os.path.join(self.directory, f"{self.prefix}_*.log")):
+            match = pattern.search(path)
+            if match and datetime.strptime(match.group(1), "%Y%m%d").date() < oldest:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+
+class RateLimiter:
+    """Per-key rate limit: `burst` messages per `interval` seconds.
+
+    Repeats beyond that are only counted. The count is reported with the
+    next message let through for the key, or by expired() once the key
+    has gone quiet.
+    """
+
+    def __init__(self, burst: int = 5, interval: float = 10.0):
+        self.burst = burst
+        self.interval = interval
+        self._lock = threading.Lock()
+        # key -> [window start, messages let through, suppressed, level, message, args]
+        self._windows: Dict[Hashable, List[Any]] = {}
+        self._last_sweep = time.monotonic()
+
+    def allow(self, key: Hashable, level: int, message: str, args: tuple = ()) -> Optional[int]:
+        """None to drop the message, else the number of repeats dropped before it"""
+        now = time.monotonic()
+        with self._lock:
+            window = self._windows.get(key)
+            if window is None or now - window[0] >= self.interval:
+                suppressed = window[2] if window is not None else 0
+                self._windows[key] = [now, 1, 0, level, message, args]
+                return suppressed
+            if window[1] < self.burst:
+                window[1] += 1
+                return 0
+            window[2] += 1
+            window[5] = args
+            return None
+
+    def expired(self, force: bool = False) -> List[Tuple[int, str, tuple, int]]:
+        """(level, message, args of the last repeat, suppressed) of quiet keys"""
+        now = time.monotonic()
+        with self._lock:
+            if not force and now - self._last_sweep < self.interval:
+                return []
+            self._last_sweep = now
+            summaries = []
+            for key, (started, _, suppressed, level, message, args) in list(self._windows.items()):
+                if force or now - started >= self.interval:
+                    del self._windows[key]
+                    if suppressed:
+                        summaries.append((level, message, args, suppressed))
+            return summaries
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """Hands records to the writer thread without blocking or formatting.
+
+    If the writer falls behind and the queue is full, records are dropped
+    and counted rather than making the caller wait.
+    """
+
+    def __init__(self, log_queue: "queue.Queue[logging.LogRecord]"):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Formatting is left to the writer thread; the base class would
+        # format the message here on the caller's thread. Arguments are
+        # therefore rendered a moment later, which is fine for the values
+        # logged here (numbers, strings and exceptions)
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
 
 
 class Logger:
     _instance: Optional["Logger"] = None
 
+    # Per message key: records let through per window and the window length
+    RATE_LIMIT_BURST = 5
+    RATE_LIMIT_INTERVAL = 10.0
+    QUEUE_SIZE = 10000
+    MAX_BYTES = 10 * 1024 * 1024
+    BACKUP_COUNT = 5
+    KEEP_DAYS = 14
+
     def __new__(cls):
         if cls._instance is None:
             cls._instance = super().__new__(cls)
@@ -15,21 +185,29 @@ class Logger:
         return cls._instance
 
     def _initialize_logger(self) -> None:
-        """Initialize the logger with both file and console handlers"""
+        """Initialize the logger with file and console handlers behind a queue.
+
+        Callers only enqueue records; a background thread formats them and
+        does all file and console I/O, so logging never blocks the capture
+        and brightness threads.
+        """
         self.logger = logging.getLogger("AutoBrightness")
         self.logger.setLevel(logging.DEBUG)
+        self.logger.propagate = False
 
         # Create logs directory if it doesn't exist
         logs_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "logs")
         os.makedirs(logs_dir, exist_ok=True)
 
-        # File handler - daily rotating log file
-        log_file = os.path.join(
-            logs_dir, f'autobrightness_{datetime.now().strftime("%Y%m%d")}.log'
+        # File handler - one log file per day, rotated by size as well
+        file_handler = DailyRotatingFileHandler(
+            logs_dir,
+            max_bytes=self.MAX_BYTES,
+            backup_count=self.BACKUP_COUNT,
+            keep_days=self.KEEP_DAYS,
         )
-        file_handler = logging.FileHandler(log_file)
         file_handler.setLevel(logging.DEBUG)
-        file_formatter = logging.Formatter(
+        file_formatter = SuppressionFormatter(
             "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
         )
         file_handler.setFormatter(file_formatter)
@@ -37,36 +215,89 @@ class Logger:
         # Console handler
         console_handler = logging.StreamHandler(sys.stdout)
         console_handler.setLevel(logging.WARNING)
-        console_formatter = logging.Formatter("%(levelname)s: %(message)s")
+        console_formatter = SuppressionFormatter("%(levelname)s: %(message)s")
         console_handler.setFormatter(console_formatter)
 
-        # Add handlers to logger
-        self.logger.addHandler(file_handler)
-        self.logger.addHandler(console_handler)
+        # Records pass through the queue to the writer thread
+        self.rate_limiter = RateLimiter(self.RATE_LIMIT_BURST, self.RATE_LIMIT_INTERVAL)
+        self.queue_handler = NonBlockingQueueHandler(queue.Queue(self.QUEUE_SIZE))
+        self.logger.addHandler(self.queue_handler)
+        self._listener = QueueListener(
+            self.queue_handler.queue, file_handler, console_handler,
+            respect_handler_level=True,
+        )
+        self._listener.start()
+        # Summaries for repeats that simply stopped are written from here,
+        # as no later call with their key will report them
+        self._sweep_stop = threading.Event()
+        threading.Thread(target=self._sweep, name="LogSummaries", daemon=True).start()
+        atexit.register(self.close)
+
+    def close(self) -> None:
+        """Write out everything still queued and stop the writer thread"""
+        if self._listener is None:
+            return
+        self._sweep_stop.set()
+        self._report_suppressed(force=True)
+        if self.queue_handler.dropped:
+            self.logger.warning(
+                "Dropped %d log records while the writer was behind", self.queue_handler.dropped
+            )
+        self._listener.stop()
+        self._listener = None
+
+    def _log(self, level: int, message: str, args: tuple, key: Optional[Hashable]) -> None:
+        # Disabled levels and rate-limited repeats cost one check and a
+        # dictionary lookup; the message is only formatted (from the
+        # template and args) on the writer thread. By default repeats are
+        # keyed by the unformatted message
+        if not self.logger.isEnabledFor(level):
+            return
+        suppressed = self.rate_limiter.allow(
+            (level, message) if key is None else key, level, message, args
+        )
+        if suppressed is None:
+            return
+        self.logger.log(
+            level, message, *args, extra={"suppressed": suppressed} if suppressed else None
+        )
+        self._report_suppressed()
+
+    def _sweep(self) -> None:
+        while not self._sweep_stop.wait(self.rate_limiter.interval):
+            self._report_suppressed()
+
+    def _report_suppressed(self, force: bool = False) -> None:
+        for level, message, args, suppressed in self.rate_limiter.expired(force):
+            try:
+                last = message % args if args else message
+            except (TypeError, ValueError):
+                last = message
+            self.logger.log(level, "Suppressed %d repeats of: %s", suppressed, last)
 
-    def debug(self, message: str) -> None:
+    def debug(self, message: str, *args: Any, key: Optional[Hashable] = None) -> None:
         """Log debug message"""
-        self.logger.debug(message)
+        self._log(logging.DEBUG, message, args, key)
 
-    def info(self, message: str) -> None:
+    def info(self, message: str, *args: Any, key: Optional[Hashable] = None) -> None:
         """Log info message"""
-        self.logger.info(message)
+        self._log(logging.INFO, message, args, key)
 
-    def warning(self, message: str) -> None:
+    def warning(self, message: str, *args: Any, key: Optional[Hashable] = None) -> None:
         """Log warning message"""
-        self.logger.warning(message)
+        self._log(logging.WARNING, message, args, key)
 
-    def error(self, message: str) -> None:
+    def error(self, message: str, *args: Any, key: Optional[Hashable] = None) -> None:
         """Log error message"""
-        self.logger.error(message)
+        self._log(logging.ERROR, message, args, key)
 
-    def critical(self, message: str) -> None:
+    def critical(self, message: str, *args: Any, key: Optional[Hashable] = None) -> None:
         """Log critical message"""
-        self.logger.critical(message)
+        self._log(logging.CRITICAL, message, args, key)
 
-    def exception(self, message: str) -> None:
+    def exception(self, message: str, *args: Any) -> None:
         """Log exception message with traceback"""
-        self.logger.exception(message)
+        self.logger.exception(message, *args)
 
 
 # Create a global logger instance
@@ -0,0 +1,194 @@
+from abc import ABC, abstractmethod
+from typing import Dict, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+from .config import Config
+from .logger import logger
+
+# ITU-R BT.601 luma weights in OpenCV's BGR channel order
+LUMA_WEIGHTS_BGR = (0.114, 0.587, 0.299)
+
+
+class LuminanceEstimator(ABC):
+    """Reduces a camera frame to a single luminance value (0-255).
+
+    Subclasses decide how the frame is reduced to a small sample; the base
+    class takes care of the region of interest and the final measurement.
+    """
+
+    def __init__(
+        self,
+        roi: Optional[Sequence[float]] = None,
+        exclude_center: float = 0.0,
+    ):
+        # roi is (x, y, width, height) as fractions of the frame
+        self.roi = tuple(roi) if roi else (0.0, 0.0, 1.0, 1.0)
+        # Fraction of the (cropped) frame to ignore around its center, e.g.
+        # 0.5 masks out the middle half where the user's face usually is
+        self.exclude_center = exclude_center
+        self._mask_cache: Dict[Tuple[int, int], Optional[np.ndarray]] = {}
+
+    def estimate(self, frame: np.ndarray) -> float:
+        """Return the luminance of a BGR or grayscale frame"""
+        return self.measure(self.sample(frame))
+
+    def sample(self, frame: np.ndarray) -> np.ndarray:
+        """Crop the frame to the region of interest and reduce it"""
+        return self.reduce(self._crop(frame))
+
+    @abstractmethod
+    def reduce(self, region: np.ndarray) -> np.ndarray:
+        """Reduce the region of interest to the sample that gets measured"""
+        pass
+
+    def measure(self, sample: np.ndarray) -> float:
+        """Average luma of the sample, honoring the center exclusion"""
+        mask = self._center_mask(sample.shape[:2])
+        if sample.ndim == 2 and mask is None and not sample.flags.c_contiguous:
+            # OpenCV would copy a strided view such as the V4L2 luma plane
+            # first; numpy averages it in place
+            return float(sample.mean())
+        # The mean is linear, so averaging channels first and weighting them
+        # afterwards avoids a full grayscale conversion
+        means = cv2.mean(sample, mask=mask)
+        if sample.ndim == 2:
+            return float(means[0])
+        return float(
+            means[0] * LUMA_WEIGHTS_BGR[0]
+            + means[1] * LUMA_WEIGHTS_BGR[1]
+            + means[2] * LUMA_WEIGHTS_BGR[2]
+        )
+
+    def _crop(self, frame: np.ndarray) -> np.ndarray:
+        """Return a view of the region of interest (no copy)"""
+        if self.roi == (0.0, 0.0, 1.0, 1.0):
+            return frame
+        height, width = frame.shape[:2]
+        x, y, w, h = self.roi
+        x0 = int(x * width)
+        y0 = int(y * height)
+        x1 = max(x0 + 1, int((x + w) * width))
+        y1 = max(y0 + 1, int((y + h) * height))
+        return frame[y0:y1, x0:x1]
+
+    def _center_mask(self, shape: Tuple[int, int]) -> Optional[np.ndarray]:
+        """Mask excluding the center of the sample, cached per sample shape"""
+        if self.exclude_center <= 0:
+            return None
+        if shape not in self._mask_cache:
+            height, width = shape
+            mask = np.full((height, width), 255, dtype=np.uint8)
+            margin = (1.0 - min(self.exclude_center, 0.95)) / 2
+            y0, y1 = int(height * margin), int(height * (1 - margin))
+            x0, x1 = int(width * margin), int(width * (1 - margin))
+            mask[y0:y1, x0:x1] = 0
+            self._mask_cache[shape] = mask
+        return self._mask_cache[shape]
+
+
+class FullFrameEstimator(LuminanceEstimator):
+    """Averages every pixel of the region of interest"""
+
+    def reduce(self, region: np.ndarray) -> np.ndarray:
+        return region
+
+
+class StridedEstimator(LuminanceEstimator):
+    """Averages every n-th pixel in both directions using a strided view"""
+
+    def __init__(self, stride: int = 8, **kwargs):
+        super().__init__(**kwargs)
+        self.stride = max(1, int(stride))
+
+    def reduce(self, region: np.ndarray) -> np.ndarray:
+        return region[::self.stride, ::self.stride]
+
+
+class DownscaleEstimator(LuminanceEstimator):
+    """Area-averages the region down to a small thumbnail first"""
+
+    # Point samples per thumbnail pixel and axis that get area-averaged
+    SAMPLES_PER_PIXEL = 4
+
+    def __init__(self, sample_width: int = 64, **kwargs):
+        super().__init__(**kwargs)
+        self.sample_width = max(1, int(sample_width))
+
+    def reduce(self, region: np.ndarray) -> np.ndarray:
+        height, width = region.shape[:2]
+        if width <= self.sample_width:
+            return region
+        sample_height = max(1, round(height * self.sample_width / width))
+        # Point-sample with numpy first: OpenCV copies a strided view such
+        # as the V4L2 luma plane whole before resizing it, while this only
+        # copies the samples
+        step = max(1, width // (self.sample_width * self.SAMPLES_PER_PIXEL))
+        if step > 1 or not region.flags.c_contiguous:
+            region = np.ascontiguousarray(region[::step, ::step])
+        return cv2.resize(
+            region,
+            (self.sample_width, sample_height),
+            interpolation=cv2.INTER_AREA,
+        )
+
+
+class PercentileEstimator(DownscaleEstimator):
+    """Histogram metering: reports the given luma percentile of a thumbnail.
+
+    Unlike a plain mean this is not dragged around by small bright or dark
+    objects such as a lamp in the background or a dark shirt.
+    """
+
+    def __init__(self, percentile: float = 50.0, **kwargs):
+        super().__init__(**kwargs)
+        self.percentile = min(100.0, max(0.0, float(percentile)))
+
+    def measure(self, sample: np.ndarray) -> float:
+        gray = sample if sample.ndim == 2 else cv2.cvtColor(sample, cv2.COLOR_BGR2GRAY)
+        mask = self._center_mask(sample.shape[:2])
+        hist = cv2.calcHist([gray], [0], mask, [256], [0, 256]).ravel()
+        cumulative = np.cumsum(hist)
+        if cumulative[-1] == 0:
+            return 0.0
+        target = cumulative[-1] * self.percentile / 100.0
+        return float(np.searchsorted(cumulative, target))
+
+
+def limited_to_full_range(luma: float) -> float:
+    """Expand a limited-range (16-235) luma reading to the full 0-255 scale"""
+    return min(255.0, max(0.0, (luma - 16.0) * 255.0 / 219.0))
+
+
+def luminance_to_brightness(luminance: float, threshold: int) -> int:
+    """Map a luminance reading to a brightness level (0-100)"""
+    # Ensure threshold is at least 1 to prevent division by zero
+    threshold = max(1, threshold)
+    return min(100, max(0, int((luminance / threshold) * 100)))
+
+
+def get_luminance_estimator(config: Optional[Config] = None) -> LuminanceEstimator:
+    """Factory function to build the estimator selected in config.json"""
+    config = config or Config()
+    method = config.get("luminance", "method")
+    common = {
+        "roi": config.get("luminance", "roi"),
+        "exclude_center": config.get("luminance", "exclude_center"),
+    }
+
+    if method == "strided":
+        return StridedEstimator(stride=config.get("luminance", "stride"), **common)
+    elif method == "downscale":
+        return DownscaleEstimator(
+            sample_width=config.get("luminance", "sample_width"), **common
+        )
+    elif method == "percentile":
+        return PercentileEstimator(
+            percentile=config.get("luminance", "percentile"),
+            sample_width=config.get("luminance", "sample_width"),
+            **common,
+        )
+    elif method != "mean":
+        logger.warning("Unknown luminance method '%s', using full-frame mean", method)
+    return FullFrameEstimator(**common)
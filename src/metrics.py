@@ -0,0 +1,336 @@
+import threading
+import time
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Sequence
+
+from .logger import logger
+
+# Stages timed for every processed frame, in pipeline order. "read" is
+# timed on the capture thread, the others in AutoBrightnessCore.update_frame
+STAGES = ("read", "detect", "sample", "measure", "filter", "map")
+
+# Upper bucket bounds in milliseconds, shared by all latency histograms
+LATENCY_BUCKETS_MS = (
+    0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 25.0, 50.0, 100.0, 250.0, 500.0, 1000.0
+)
+
+# Reconnection times can take minutes, so they get their own buckets
+RECOVERY_BUCKETS_MS = (
+    100.0, 250.0, 500.0, 1000.0, 2500.0, 5000.0, 10000.0, 30000.0, 60000.0, 300000.0
+)
+
+COUNTERS = (
+    "frames_captured",
+    "frames_processed",
+    "frames_skipped",
+    "frames_dropped",
+    "errors",
+    # Failed reads tolerated by the reader, readers that gave up on their
+    # device, and outages that ended with a working reader again
+    "read_failures",
+    "capture_failures",
+    "recoveries",
+)
+
+
+class Histogram:
+    """Latency histogram with fixed buckets; observing never allocates"""
+
+    def __init__(self, bounds: Sequence[float] = LATENCY_BUCKETS_MS):
+        self.bounds = tuple(bounds)
+        # The last bucket collects everything above the largest bound
+        self.buckets = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        self.buckets[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-quantile (never above max)"""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        cumulative = 0
+        for bound, bucket in zip(self.bounds, self.buckets):
+            cumulative += bucket
+            if cumulative >= target:
+                return min(bound, self.max)
+        return self.max
+
+
+class Metrics:
+    """Counters and latency histograms for the capture and brightness pipeline.
+
+    Observations come from the capture, processing and brightness threads
+    and only take a short lock; the exporters (log line, stats panel,
+    Prometheus endpoint) read them from their own threads.
+    """
+
+    def __init__(self, configured_fps: float = 0.0):
+        self.configured_fps = configured_fps
+        self.started_at = time.time()
+        self.stages = {stage: Histogram() for stage in STAGES}
+        # Capture to brightness target, per processed frame
+        self.latency = Histogram()
+        # Capture failure to the first sample from a reopened device
+        self.recovery = Histogram(RECOVERY_BUCKETS_MS)
+        # OS call duration per brightness backend
+        self.writes: Dict[str, Histogram] = {}
+        self.counters = {name: 0 for name in COUNTERS}
+        self._gauges: Dict[str, Callable[[], float]] = {}
+        # Reentrant so the report methods can use the accessors below
+        self._lock = threading.RLock()
+        self._frame_interval = 0.0
+        self._last_frame_at: Optional[float] = None
+
+    def observe(self, stage: str, duration_ms: float) -> None:
+        with self._lock:
+            self.stages[stage].observe(duration_ms)
+
+    def observe_latency(self, latency_ms: float) -> None:
+        with self._lock:
+            self.latency.observe(latency_ms)
+
+    def observe_recovery(self, duration_ms: float) -> None:
+        with self._lock:
+            self.recovery.observe(duration_ms)
+
+    def observe_write(self, backend: str, duration_ms: float) -> None:
+        with self._lock:
+            histogram = self.writes.get(backend)
+            if histogram is None:
+                histogram = self.writes[backend] = Histogram()
+            histogram.observe(duration_ms)
+
+    def increment(self, counter: str, amount: int = 1) -> None:
+        with self._lock:
+            self.counters[counter] += amount
+
+    def frame_captured(self, timestamp: float) -> None:
+        """Count a camera frame and update the achieved frame rate"""
+        with self._lock:
+            self.counters["frames_captured"] += 1
+            if self._last_frame_at is not None:
+                interval = timestamp - self._last_frame_at
+                if self._frame_interval:
+                    self._frame_interval += 0.1 * (interval - self._frame_interval)
+                else:
+                    self._frame_interval = interval
+            self._last_frame_at = timestamp
+
+    def register_gauge(self, name: str, read: Callable[[], float]) -> None:
+        """Export a value owned by another component, read on every report"""
+        self._gauges[name] = read
+
+    def achieved_fps(self) -> float:
+        with self._lock:
+            if self._last_frame_at is None or not self._frame_interval:
+                return 0.0
+            # A stalled camera should show up as a falling rate
+            interval = max(self._frame_interval, time.perf_counter() - self._last_frame_at)
+        return 1.0 / interval if interval > 0 else 0.0
+
+    def gauges(self) -> Dict[str, float]:
+        values = {}
+        for name, read in self._gauges.items():
+            try:
+                values[name] = float(read())
+            except Exception as e:
+                logger.debug("Error reading metric %s: %s", name, e)
+        return values
+
+    def summary(self) -> str:
+        """One line for the periodic log message"""
+        with self._lock:
+            counters = dict(self.counters)
+            measure = self.stages["measure"]
+            writes = sum(histogram.count for histogram in self.writes.values())
+            write_total = sum(histogram.total for histogram in self.writes.values())
+            latency_p99 = self.latency.quantile(0.99)
+            measure_p50 = measure.quantile(0.5)
+            measure_p99 = measure.quantile(0.99)
+        summary = (
+            f"{self.achieved_fps():.1f}/{self.configured_fps:g} fps, "
+            f"{counters['frames_processed']} processed, {counters['frames_skipped']} skipped, "
+            f"{counters['frames_dropped']} dropped, {writes} writes "
+            f"(avg {write_total / writes if writes else 0.0:.1f} ms), "
+            f"measure p50 {measure_p50:.2f} ms p99 {measure_p99:.2f} ms, "
+            f"latency p99 {latency_p99:.1f} ms"
+        )
+        if counters["capture_failures"]:
+            summary += (
+                f", {counters['capture_failures']} capture failures, "
+                f"{counters['recoveries']} recoveries"
+            )
+        return summary
+
+    def report_lines(self) -> List[str]:
+        """Multi-line report for the stats panel"""
+        with self._lock:
+            lines = [
+                f"Frame rate: {self.achieved_fps():.1f} fps (configured {self.configured_fps:g})",
+                "Frames: " + ", ".join(
+                    f"{self.counters[f'frames_{name}']} {name}"
+                    for name in ("captured", "processed", "skipped", "dropped")
+                ),
+                "",
+                f"{'stage':<16}{'p50':>9}{'p99':>9}{'max':>9}  ms",
+            ]
+            histograms = [(stage, self.stages[stage]) for stage in STAGES]
+            histograms.append(("latency", self.latency))
+            histograms.extend(
+                (f"write:{backend.replace('BrightnessController', '')}", histogram)
+                for backend, histogram in self.writes.items()
+            )
+            for name, histogram in histograms:
+                lines.append(
+                    f"{name[:16]:<16}{histogram.quantile(0.5):>9.2f}"
+                    f"{histogram.quantile(0.99):>9.2f}{histogram.max:>9.2f}"
+                )
+            writes = sum(histogram.count for histogram in self.writes.values())
+            recovery = (
+                f"Capture: {self.counters['read_failures']} failed reads, "
+                f"{self.counters['capture_failures']} failures, "
+                f"{self.counters['recoveries']} recoveries "
+                f"(max {self.recovery.max / 1000:.1f} s)"
+            )
+        lines.append("")
+        lines.append(f"Brightness writes: {writes}")
+        lines.append(recovery)
+        lines.extend(
+            f"{name.replace('_', ' ').capitalize()}: {value:g}"
+            for name, value in self.gauges().items()
+        )
+        return lines
+
+    def prometheus(self) -> str:
+        """Prometheus text exposition format (durations in seconds)"""
+        lines: List[str] = []
+        with self._lock:
+            for name in COUNTERS:
+                metric = f"autobrightness_{name}_total"
+                lines.append(f"# TYPE {metric} counter")
+                lines.append(f"{metric} {self.counters[name]}")
+            self._prometheus_histograms(
+                lines,
+                "autobrightness_stage_duration_seconds",
+                [(f'stage="{stage}"', self.stages[stage]) for stage in STAGES],
+            )
+            self._prometheus_histograms(
+                lines, "autobrightness_frame_latency_seconds", [("", self.latency)]
+            )
+            self._prometheus_histograms(
+                lines, "autobrightness_recovery_duration_seconds", [("", self.recovery)]
+            )
+            self._prometheus_histograms(
+                lines,
+                "autobrightness_brightness_write_duration_seconds",
+                [(f'backend="{backend}"', histogram) for backend, histogram in self.writes.items()],
+            )
+        gauges = {"fps": self.achieved_fps(), "configured_fps": self.configured_fps}
+        gauges.update(self.gauges())
+        for name, value in gauges.items():
+            lines.append(f"# TYPE autobrightness_{name} gauge")
+            lines.append(f"autobrightness_{name} {value:g}")
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def _prometheus_histograms(lines: List[str], metric: str, series) -> None:
+        lines.append(f"# TYPE {metric} histogram")
+        for labels, histogram in series:
+            prefix = labels + "," if labels else ""
+            cumulative = 0
+            for bound, bucket in zip(histogram.bounds, histogram.buckets):
+                cumulative += bucket
+                lines.append(f'{metric}_bucket{{{prefix}le="{bound / 1000:g}"}} {cumulative}')
+            lines.append(f'{metric}_bucket{{{prefix}le="+Inf"}} {histogram.count}')
+            suffix = f"{{{labels}}}" if labels else ""
+            lines.append(f"{metric}_sum{suffix} {histogram.total / 1000:g}")
+            lines.append(f"{metric}_count{suffix} {histogram.count}")
+
+
+class MetricsReporter:
+    """Writes Metrics.summary() to the log at a fixed interval"""
+
+    def __init__(self, metrics: Metrics, interval: float):
+        self.metrics = metrics
+        self.interval = interval
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self.interval <= 0 or self._thread is not None:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="MetricsReporter", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop_event.wait(self.interval):
+            logger.info("Metrics: %s", self.metrics.summary())
+
+
+class MetricsServer:
+    """Serves Metrics.prometheus() on http://host:port/metrics"""
+
+    def __init__(self, metrics: Metrics, host: str = "127.0.0.1", port: int = 9708):
+        self.metrics = metrics
+        self.host = host
+        self.port = port
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    def start(self) -> None:
+        if self._server is not None:
+            return
+        metrics = self.metrics
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = metrics.prometheus().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format: str, *args) -> None:
+                # Scrapes are frequent; keep them out of the application log
+                pass
+
+        try:
+            self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        except OSError as e:
+            logger.error("Failed to start metrics endpoint on %s:%s: %s", self.host, self.port, e)
+            return
+        self._server.daemon_threads = True
+        thread = threading.Thread(
+            target=self._server.serve_forever, name="MetricsServer", daemon=True
+        )
+        thread.start()
+        logger.info("Metrics available at http://%s:%s/metrics", self.host, self.port)
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
@@ -0,0 +1,82 @@
+from typing import Optional
+
+from PyQt6.QtCore import Qt
+from PyQt6.QtGui import QColor, QPainter, QPixmap
+from PyQt6.QtWidgets import QLabel, QWidget
+
+
+class SwatchPreview(QLabel):
+    """Shows the measured luminance as a flat gray swatch.
+
+    The pixmap is allocated once at the widget's own size and refilled in
+    place, and only when the displayed gray level actually changes.
+    """
+
+    def __init__(self, width: int, height: int):
+        super().__init__()
+        self.setFixedSize(width, height)
+        self.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        self._pixmap = QPixmap(width, height)
+        self._level: Optional[int] = None
+
+    def set_luminance(self, luminance: float) -> None:
+        level = min(255, max(0, int(luminance)))
+        if level == self._level:
+            return
+        self._level = level
+        self._pixmap.fill(QColor(level, level, level))
+        self.setPixmap(self._pixmap)
+
+
+class GaugePreview(QWidget):
+    """Custom painted luminance gauge: a gray swatch with a level bar.
+
+    Nothing is allocated per update; a repaint is only scheduled when the
+    displayed level changes.
+    """
+
+    BAR_HEIGHT = 8
+
+    def __init__(self, width: int, height: int):
+        super().__init__()
+        self.setFixedSize(width, height)
+        self._level: Optional[int] = None
+        self._bar_color = QColor("#3498db")
+
+    def set_luminance(self, luminance: float) -> None:
+        level = min(255, max(0, int(luminance)))
+        if level == self._level:
+            return
+        self._level = level
+        self.update()
+
+    def paintEvent(self, event) -> None:
+        if self._level is None:
+            return
+        painter = QPainter(self)
+        rect = self.rect()
+        painter.fillRect(rect, QColor(self._level, self._level, self._level))
+        bar_width = int(rect.width() * self._level / 255)
+        painter.fillRect(0, 0, bar_width, self.BAR_HEIGHT, self._bar_color)
+        painter.end()
+
+
+class DisabledPreview(QLabel):
+    """Placeholder used when the preview is turned off"""
+
+    def __init__(self, width: int, height: int):
+        super().__init__("Preview disabled")
+        self.setFixedSize(width, height)
+        self.setAlignment(Qt.AlignmentFlag.AlignCenter)
+
+    def set_luminance(self, luminance: float) -> None:
+        pass
+
+
+def create_preview(mode: str, width: int, height: int) -> QWidget:
+    """Factory function for the preview widget selected in config.json"""
+    if mode == "swatch":
+        return SwatchPreview(width, height)
+    elif mode == "off":
+        return DisabledPreview(width, height)
+    return GaugePreview(width, height)
@@ -0,0 +1,155 @@
+import math
+import threading
+import time
+from typing import Optional
+
+from .brightness_control import BrightnessController
+from .logger import logger
+
+
+class BrightnessRamp:
+    """Moves the backlight towards a target level on its own clock.
+
+    Targets can arrive at any rate (every camera frame or once every few
+    seconds); the ramp thread steps the level at rate_hz along the chosen
+    curve, never faster than max_slew percent per second, and goes idle once
+    the target is reached.
+
+    Curves:
+        linear      constant speed of max_slew
+        ease_out    exponential approach with the given time constant,
+                    fast at first and slowing down near the target
+        perceptual  constant speed in perceived lightness (gamma encoded),
+                    so steps look even at both ends of the range
+    """
+
+    CURVES = ("linear", "ease_out", "perceptual")
+
+    def __init__(
+        self,
+        controller: BrightnessController,
+        curve: str = "ease_out",
+        rate_hz: float = 10.0,
+        max_slew: float = 50.0,
+        time_constant: float = 1.0,
+        gamma: float = 2.2,
+    ):
+        if curve not in self.CURVES:
+            logger.warning("Unknown ramp curve '%s', using linear", curve)
+            curve = "linear"
+        self.controller = controller
+        self.curve = curve
+        self.interval = 1.0 / rate_hz
+        self.max_slew = max_slew
+        self.time_constant = time_constant
+        self.gamma = gamma
+
+        self.current: Optional[float] = None
+        self.target: Optional[float] = None
+        self._applied: Optional[int] = None
+
+        self._condition = threading.Condition()
+        self._running = False
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def level(self) -> Optional[int]:
+        """Level most recently handed to the controller"""
+        return self._applied
+
+    def set_target(self, level: float) -> None:
+        """Ramp towards a new level"""
+        with self._condition:
+            self.target = min(100.0, max(0.0, float(level)))
+            if self.current is None:
+                # Nothing to ramp from on the first reading
+                self.current = self.target
+            self._condition.notify()
+
+    def jump(self, level: float) -> None:
+        """Apply a level immediately, bypassing the ramp"""
+        with self._condition:
+            self.target = self.current = min(100.0, max(0.0, float(level)))
+            self._condition.notify()
+
+    def start(self) -> None:
+        with self._condition:
+            if self._running:
+                return
+            self._running = True
+        self._thread = threading.Thread(target=self._run, name="BrightnessRamp", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=1.0)
+        self._thread = None
+
+    def step(self, current: float, target: float, dt: float) -> float:
+        """Advance one tick of length dt seconds along the configured curve"""
+        max_step = self.max_slew * dt
+        if self.curve == "perceptual":
+            # Move at constant speed in gamma-encoded space
+            encode = 1.0 / self.gamma
+            p_current = (current / 100.0) ** encode
+            p_target = (target / 100.0) ** encode
+            p_step = max_step / 100.0
+            p_next = p_current + max(-p_step, min(p_step, p_target - p_current))
+            return 100.0 * p_next ** self.gamma
+
+        delta = target - current
+        if self.curve == "ease_out":
+            delta *= 1.0 - math.exp(-dt / self.time_constant)
+            # Finish off instead of creeping asymptotically below one percent
+            if abs(target - current) < 0.5:
+                delta = target - current
+        return current + max(-max_step, min(max_step, delta))
+
+    def _run(self) -> None:
+        last_tick: Optional[float] = None
+        while True:
+            with self._condition:
+                # Sleep until there is somewhere to go
+                self._condition.wait_for(
+                    lambda: not self._running or self._needs_update()
+                )
+                if not self._running:
+                    return
+                now = time.perf_counter()
+                if last_tick is None:
+                    dt = self.interval
+                else:
+                    dt = min(now - last_tick, 4 * self.interval)
+                last_tick = now
+                self.current = self.step(self.current, self.target, dt)
+                level = int(round(self.current))
+
+            if level != self._applied:
+                self._applied = level
+                try:
+                    self.controller.set_brightness(level)
+                except Exception as e:
+                    logger.error("Error applying ramp step: %s", e)
+
+            # Keep a fixed tick rate no matter how often new targets arrive
+            deadline = now + self.interval
+            with self._condition:
+                while self._running:
+                    remaining = deadline - time.perf_counter()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+                if not self._needs_update():
+                    # Restart the tick clock after idling
+                    last_tick = None
+
+    def _needs_update(self) -> bool:
+        if self.current is None or self.target is None:
+            return False
+        return (
+            abs(self.current - self.target) > 1e-3
+            or int(round(self.current)) != self._applied
+        )
@@ -0,0 +1,331 @@
+import ctypes
+import os
+import random
+import select
+import threading
+import time
+from typing import Callable, Optional, Set, Tuple
+
+from .logger import logger
+from .metrics import Metrics
+
+# inotify(7) event masks for entries of the watched directory
+IN_ATTRIB = 0x00000004
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+
+# udev creates the node first and fixes its permissions a moment later
+HOTPLUG_SETTLE_SECONDS = 0.5
+
+
+class Backoff:
+    """Exponential delay between reconnection attempts, with some jitter"""
+
+    def __init__(self, initial: float, maximum: float, factor: float = 2.0, jitter: float = 0.1):
+        self.initial = initial
+        self.maximum = max(initial, maximum)
+        self.factor = factor
+        self.jitter = jitter
+        self.attempts = 0
+
+    def next(self) -> float:
+        """Delay before the next attempt"""
+        delay = min(self.maximum, self.initial * self.factor ** self.attempts)
+        self.attempts += 1
+        return delay * (1.0 + random.uniform(-self.jitter, self.jitter))
+
+    def reset(self) -> None:
+        self.attempts = 0
+
+
+class DeviceWatcher:
+    """Reports device nodes named prefix* appearing in or leaving a directory.
+
+    Uses inotify where the directory supports it (/dev does, sysfs does
+    not) and otherwise notices changes by listing the directory every
+    poll_interval seconds.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        prefix: str,
+        on_change: Callable[[Set[str], Set[str]], None],
+        poll_interval: float = 1.0,
+    ):
+        self.directory = directory
+        self.prefix = prefix
+        self.on_change = on_change
+        self.poll_interval = poll_interval
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._fd = -1
+        # Written to by stop() to end a select() on the inotify descriptor
+        self._wake_fds: Optional[Tuple[int, int]] = None
+
+    def devices(self) -> Set[str]:
+        try:
+            return {name for name in os.listdir(self.directory) if name.startswith(self.prefix)}
+        except OSError:
+            return set()
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._fd = self._open_inotify()
+        if self._fd >= 0:
+            self._wake_fds = os.pipe()
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="DeviceWatcher", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        if self._wake_fds is not None:
+            os.write(self._wake_fds[1], b"\0")
+        if self._thread is not None:
+            if self._thread is not threading.current_thread():
+                self._thread.join(timeout=2.0)
+            self._thread = None
+        if self._wake_fds is not None:
+            for fd in self._wake_fds:
+                os.close(fd)
+            self._wake_fds = None
+
+    def _open_inotify(self) -> int:
+        """inotify descriptor watching the directory, -1 to poll instead"""
+        try:
+            libc = ctypes.CDLL(None, use_errno=True)
+            fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        except Exception:
+            # No inotify (or no C library to load it from) on this platform
+            return -1
+        if fd < 0:
+            return -1
+        mask = IN_CREATE | IN_DELETE | IN_ATTRIB | IN_MOVED_FROM | IN_MOVED_TO
+        if libc.inotify_add_watch(fd, os.fsencode(self.directory), mask) < 0:
+            os.close(fd)
+            return -1
+        return fd
+
+    def _run(self) -> None:
+        known = self.devices()
+        try:
+            while not self._stop_event.is_set():
+                if self._fd >= 0:
+                    # The timeout catches changes inotify does not report
+                    ready, _, _ = select.select(
+                        [self._fd, self._wake_fds[0]], [], [], self.poll_interval
+                    )
+                    if self._fd in ready:
+                        self._drain()
+                elif self._stop_event.wait(self.poll_interval):
+                    break
+                if self._stop_event.is_set():
+                    break
+                current = self.devices()
+                if current != known:
+                    added, removed = current - known, known - current
+                    known = current
+                    self.on_change(added, removed)
+        except Exception as e:
+            logger.error("Error watching %s for devices: %s", self.directory, e)
+        finally:
+            if self._fd >= 0:
+                os.close(self._fd)
+                self._fd = -1
+
+    def _drain(self) -> None:
+        # The events only wake the loop, which compares listings itself
+        try:
+            while os.read(self._fd, 4096):
+                pass
+        except BlockingIOError:
+            pass
+
+
+class CaptureSupervisor:
+    """Keeps the reader thread running by restarting it after failures.
+
+    A reader that gives up on its device reports failed(). The supervisor
+    then calls restart() after an exponential backoff, or right away when
+    the hotplug watcher sees a matching device node appear. The first
+    frame the new reader publishes (frame_received()) ends the outage;
+    another failure schedules the next attempt. So does a reader that is
+    still running without either after attempt_timeout seconds, as one
+    stuck opening a half-unplugged camera would be.
+    """
+
+    def __init__(
+        self,
+        restart: Callable[[], Optional[threading.Thread]],
+        metrics: Metrics,
+        initial_delay: float = 0.5,
+        max_delay: float = 30.0,
+        attempt_timeout: float = 10.0,
+        hotplug_watch: Optional[Tuple[str, str]] = None,
+        on_lost: Optional[Callable[[str], None]] = None,
+        on_recovered: Optional[Callable[[float], None]] = None,
+    ):
+        self.restart = restart
+        self.metrics = metrics
+        self.backoff = Backoff(initial_delay, max_delay)
+        self.attempt_timeout = attempt_timeout
+        self.hotplug_watch = hotplug_watch
+        self.on_lost = on_lost
+        self.on_recovered = on_recovered
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        # Set when a device node appears or the current attempt ended
+        self._hotplug = threading.Event()
+        self._outcome = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lost_at: Optional[float] = None
+        self._downtime = 0.0
+        # Reconnection attempts in the current outage
+        self.attempts = 0
+
+        metrics.register_gauge("capture_recovering", lambda: 1.0 if self.recovering else 0.0)
+        metrics.register_gauge("capture_downtime_seconds", self.downtime)
+
+    @property
+    def recovering(self) -> bool:
+        return self._lost_at is not None
+
+    def downtime(self) -> float:
+        """Seconds spent without a working reader, including the current outage"""
+        lost_at = self._lost_at
+        current = time.perf_counter() - lost_at if lost_at is not None else 0.0
+        return self._downtime + current
+
+    def failed(self, message: str) -> None:
+        """Called by a reader thread that gave up on its device"""
+        with self._lock:
+            if self._stop_event.is_set():
+                return
+            self.metrics.increment("capture_failures")
+            first = self._lost_at is None
+            if first:
+                self._lost_at = time.perf_counter()
+                self.attempts = 0
+                self.backoff.reset()
+            if first or self._thread is None:
+                # Also replaces a supervisor thread that died on an error
+                self._thread = threading.Thread(
+                    target=self._run, name="CaptureSupervisor", daemon=True
+                )
+                self._thread.start()
+            else:
+                self._outcome.set()
+        if first:
+            logger.warning("Capture failed, reconnecting: %s", message)
+            if self.on_lost is not None:
+                self.on_lost(message)
+        else:
+            logger.info("Reconnection attempt failed: %s", message)
+
+    def frame_received(self) -> None:
+        """Called for every processed sample; ends an outage on the first one"""
+        if self._lost_at is None:
+            return
+        with self._lock:
+            lost_at, self._lost_at = self._lost_at, None
+            if lost_at is None:
+                return
+            outage = time.perf_counter() - lost_at
+            self._downtime += outage
+            self._outcome.set()
+        self.metrics.increment("recoveries")
+        self.metrics.observe_recovery(outage * 1000)
+        logger.info("Capture recovered after %.1f s (%d attempts)", outage, self.attempts)
+        if self.on_recovered is not None:
+            self.on_recovered(outage)
+
+    def start(self) -> None:
+        """Accept failures again after stop()"""
+        self._hotplug.clear()
+        self._outcome.clear()
+        self._stop_event.clear()
+
+    def stop(self) -> None:
+        """Stop reconnecting; a reader started meanwhile is the caller's to stop"""
+        with self._lock:
+            self._stop_event.set()
+            thread, self._thread = self._thread, None
+            # An outage ended by stopping the pipeline counts up to here
+            if self._lost_at is not None:
+                self._downtime += time.perf_counter() - self._lost_at
+                self._lost_at = None
+        self._hotplug.set()
+        self._outcome.set()
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout=2.0)
+
+    def _on_devices_changed(self, added: Set[str], removed: Set[str]) -> None:
+        if removed:
+            logger.info("Device removed: %s", ", ".join(sorted(removed)))
+        if added:
+            logger.info("Device added: %s, reconnecting", ", ".join(sorted(added)))
+            self.backoff.reset()
+            self._hotplug.set()
+
+    def _run(self) -> None:
+        watcher: Optional[DeviceWatcher] = None
+        try:
+            if self.hotplug_watch is not None:
+                watcher = DeviceWatcher(*self.hotplug_watch, self._on_devices_changed)
+                try:
+                    watcher.start()
+                except Exception as e:
+                    # Reconnecting on the backoff alone still works
+                    logger.warning("Hotplug detection unavailable: %s", e)
+                    watcher = None
+            # A thread finishing after a recovery must not join the next outage
+            while (
+                not self._stop_event.is_set()
+                and self.recovering
+                and self._thread is threading.current_thread()
+            ):
+                # Wait out the backoff unless a device shows up first
+                if self._hotplug.wait(self.backoff.next()):
+                    self._stop_event.wait(HOTPLUG_SETTLE_SECONDS)
+                self._hotplug.clear()
+                if self._stop_event.is_set():
+                    break
+
+                self._outcome.clear()
+                self.attempts += 1
+                logger.info("Reopening the light source (attempt %d)", self.attempts)
+                try:
+                    reader = self.restart()
+                except Exception as e:
+                    logger.warning("Failed to restart the reader: %s", e)
+                    continue
+                # A reader that is still opening the device must not be
+                # replaced, so wait for its first sample or its failure
+                self._await_outcome(reader)
+        except Exception as e:
+            logger.error("Error supervising capture: %s", e)
+        finally:
+            if watcher is not None:
+                watcher.stop()
+            with self._lock:
+                if self._thread is threading.current_thread():
+                    self._thread = None
+
+    def _await_outcome(self, reader: Optional[threading.Thread]) -> None:
+        """Wait for the attempt to end, counting a hung reader as failed"""
+        while not self._outcome.wait(self.attempt_timeout):
+            if reader is None or not reader.is_alive():
+                # Stopped without a sample or a failure, nothing to wait for
+                return
+            # A paused reader publishes nothing, which is not a failure
+            if not getattr(reader, "paused", False):
+                self.metrics.increment("capture_failures")
+                logger.info(
+                    "Reconnection attempt failed: no sample within %.1f s",
+                    self.attempt_timeout,
+                )
+                return
@@ -0,0 +1,77 @@
+from typing import Optional, Tuple
+
+import cv2
+import numpy as np
+
+from .config import Config
+
+
+class SceneChangeDetector:
+    """Tells whether a frame differs enough from the last processed one.
+
+    Each frame is reduced to a tiny grayscale thumbnail (point samples
+    area-averaged down to `grid` cells) and compared with the thumbnail of
+    the last frame that was reported as changed. Averaging many samples
+    per cell suppresses sensor noise, and because the mean absolute difference
+    is never smaller than the difference of the means, any luminance change
+    larger than `threshold` is always detected. Slow drifts accumulate
+    against the stored reference until they cross the threshold too.
+    """
+
+    # Samples per thumbnail cell and axis
+    SAMPLES_PER_CELL = 8
+
+    def __init__(self, threshold: float = 2.0, grid: Tuple[int, int] = (16, 12)):
+        self.threshold = threshold
+        self.grid = grid
+        self.processed_frames = 0
+        self.skipped_frames = 0
+        self.last_score = 0.0
+        self._reference: Optional[np.ndarray] = None
+
+    @property
+    def skip_ratio(self) -> float:
+        total = self.processed_frames + self.skipped_frames
+        return self.skipped_frames / total if total else 0.0
+
+    def changed(self, frame: np.ndarray) -> bool:
+        """Compare the frame with the reference and count it as processed or skipped"""
+        thumbnail = self.thumbnail(frame)
+        reference = self._reference
+        if reference is None or reference.shape != thumbnail.shape:
+            self.last_score = float("inf")
+        else:
+            self.last_score = float(cv2.mean(cv2.absdiff(thumbnail, reference))[0])
+            if self.last_score < self.threshold:
+                self.skipped_frames += 1
+                return False
+        self._reference = thumbnail
+        self.processed_frames += 1
+        return True
+
+    def invalidate(self) -> None:
+        """Treat the next frame as changed, e.g. after the settings changed"""
+        self._reference = None
+
+    def thumbnail(self, frame: np.ndarray) -> np.ndarray:
+        height, width = frame.shape[:2]
+        # Point-sample the frame with numpy slicing and copy only the
+        # samples (OpenCV would copy a strided view such as the V4L2 luma
+        # plane whole), then average the samples into the grid cells
+        step_x = max(1, width // (self.grid[0] * self.SAMPLES_PER_CELL))
+        step_y = max(1, height // (self.grid[1] * self.SAMPLES_PER_CELL))
+        sampled = np.ascontiguousarray(frame[::step_y, ::step_x])
+        thumbnail = cv2.resize(sampled, self.grid, interpolation=cv2.INTER_AREA)
+        if thumbnail.ndim == 3:
+            thumbnail = cv2.cvtColor(thumbnail, cv2.COLOR_BGR2GRAY)
+        return thumbnail
+
+
+def get_scene_detector(config: Config) -> Optional[SceneChangeDetector]:
+    """Build the detector configured in config.json, None if disabled"""
+    if not config.get("scene", "enabled"):
+        return None
+    return SceneChangeDetector(
+        threshold=config.get("scene", "threshold"),
+        grid=(config.get("scene", "grid_width"), config.get("scene", "grid_height")),
+    )
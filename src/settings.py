@@ -0,0 +1,50 @@
+import threading
+from typing import Callable, List, NamedTuple
+
+from .config import Config
+
+
+class RuntimeSettings(NamedTuple):
+    """Immutable snapshot of the parameters the processing loop depends on"""
+
+    threshold: int
+    exposure: int
+    smooth_transitions: bool
+
+    @classmethod
+    def from_config(cls, config: Config) -> "RuntimeSettings":
+        return cls(
+            threshold=config.get("brightness", "default_threshold"),
+            exposure=config.get("camera", "default_exposure"),
+            smooth_transitions=config.get("advanced", "smooth_transitions"),
+        )
+
+
+class SettingsStore:
+    """Publishes RuntimeSettings snapshots from the UI to the worker threads.
+
+    Writers replace the whole snapshot under a lock; readers just take the
+    `current` reference, which is a single atomic attribute read, and use
+    that snapshot for the rest of their work without any locking.
+    """
+
+    def __init__(self, initial: RuntimeSettings):
+        self.current = initial
+        self._lock = threading.Lock()
+        self._listeners: List[Callable[[RuntimeSettings, RuntimeSettings], None]] = []
+
+    def update(self, **changes) -> RuntimeSettings:
+        """Publish a new snapshot with the given fields changed"""
+        with self._lock:
+            previous = self.current
+            updated = previous._replace(**changes)
+            if updated == previous:
+                return previous
+            self.current = updated
+        for listener in self._listeners:
+            listener(previous, updated)
+        return updated
+
+    def subscribe(self, listener: Callable[[RuntimeSettings, RuntimeSettings], None]) -> None:
+        """Call listener(previous, updated) whenever a new snapshot is published"""
+        self._listeners.append(listener)
@@ -0,0 +1,41 @@
+import sys
+import time
+from typing import List, Tuple
+
+
+class StartupProfiler:
+    """Collects a timeline of startup milestones for --profile-startup.
+
+    Marks are cheap no-ops unless profiling was enabled, so they can stay in
+    the startup path permanently.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.started = time.perf_counter()
+        self._marks: List[Tuple[str, float, int]] = []
+        self._reported = 0
+
+    def mark(self, label: str) -> None:
+        """Record a milestone together with the number of loaded modules"""
+        if self.enabled:
+            self._marks.append((label, time.perf_counter(), len(sys.modules)))
+
+    def report(self) -> None:
+        """Print the milestones recorded since the last report"""
+        if not self.enabled:
+            return
+        previous = self._marks[self._reported - 1][1] if self._reported else self.started
+        for label, at, modules in self._marks[self._reported:]:
+            print(
+                f"[startup] {(at - self.started) * 1000:8.1f} ms "
+                f"(+{(at - previous) * 1000:7.1f} ms, {modules:4d} modules)  {label}",
+                file=sys.stderr,
+                flush=True,
+            )
+            previous = at
+        self._reported = len(self._marks)
+
+
+# Global profiler shared by the entry point and the application
+profiler = StartupProfiler()
@@ -0,0 +1,49 @@
+from typing import Callable, Optional
+
+from PyQt6.QtCore import QTimer
+from PyQt6.QtGui import QFont
+from PyQt6.QtWidgets import QLabel, QVBoxLayout, QWidget
+
+from .metrics import Metrics
+
+
+class StatsPanel(QWidget):
+    """Separate window showing the pipeline metrics, refreshed once a second.
+
+    The metrics are only read while the window is visible.
+    """
+
+    REFRESH_MS = 1000
+
+    def __init__(self, metrics_source: Callable[[], Optional[Metrics]], parent=None):
+        super().__init__(parent)
+        self.metrics_source = metrics_source
+        self.setWindowTitle("Auto Brightness Statistics")
+        self.setStyleSheet("background-color: #2f3640; color: white;")
+
+        self.label = QLabel()
+        font = QFont("monospace")
+        font.setStyleHint(QFont.StyleHint.Monospace)
+        self.label.setFont(font)
+        layout = QVBoxLayout(self)
+        layout.addWidget(self.label)
+
+        self._timer = QTimer(self)
+        self._timer.setInterval(self.REFRESH_MS)
+        self._timer.timeout.connect(self.refresh)
+
+    def refresh(self) -> None:
+        metrics = self.metrics_source()
+        if metrics is None:
+            self.label.setText("Start the webcam to collect statistics.")
+            return
+        self.label.setText("\n".join(metrics.report_lines()))
+
+    def showEvent(self, event) -> None:
+        super().showEvent(event)
+        self.refresh()
+        self._timer.start()
+
+    def hideEvent(self, event) -> None:
+        super().hideEvent(event)
+        self._timer.stop()
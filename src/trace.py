@@ -0,0 +1,384 @@
+"""Binary session traces: recording in the field and deterministic replay.
+
+The recorder writes one fixed-width record per processed (or skipped)
+sample into a memory-mapped ring file of bounded size, so it can stay on
+for days. A trace can be inspected and replayed through the filter,
+mapping and ramp logic of AutoBrightnessCore.update_frame on a simulated
+clock, far faster than real time:
+
+    python -m src.trace show PATH [--last N]
+    python -m src.trace replay PATH [--threshold N]
+"""
+import argparse
+import mmap
+import os
+import struct
+import sys
+import time
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from .brightness_control import (
+    CachedBrightnessController,
+    NullBrightnessController,
+    within_deadband,
+)
+from .calibration import BrightnessCurve, get_brightness_curve
+from .config import Config
+from .filters import get_luminance_filter
+from .logger import logger
+from .ramp import BrightnessRamp
+
+MAGIC = b"ABTRACE1"
+# magic, record size, capacity, records written
+HEADER = struct.Struct("<8sHIQ")
+HEADER_SIZE = 64
+# timestamp, measured, luminance, smoothed, target, threshold, applied,
+# flags, then the detect/sample/measure/filter/map timings in ms
+RECORD = struct.Struct("<dfffBBhH5f2x")
+
+FLAG_SKIPPED = 1
+FLAG_SMOOTH = 2
+FLAG_CALIBRATING = 4
+FLAG_SENSOR = 8
+
+DEFAULT_TRACE_FILE = os.path.join(
+    os.path.dirname(os.path.dirname(__file__)), "logs", "trace.bin"
+)
+
+
+class TraceRecord(NamedTuple):
+    timestamp: float
+    measured: float
+    luminance: float
+    smoothed: float
+    target: int
+    threshold: int
+    applied: int  # -1 before anything was applied
+    flags: int
+    detect_ms: float
+    sample_ms: float
+    measure_ms: float
+    filter_ms: float
+    map_ms: float
+
+
+class TraceRecorder:
+    """Appends records to a memory-mapped ring file holding the last `capacity`.
+
+    An existing trace with the same layout is continued, so the file keeps
+    the most recent samples across sessions. Only the processing thread
+    writes, so no locking is needed.
+    """
+
+    def __init__(self, path: str = DEFAULT_TRACE_FILE, capacity: int = 100000):
+        self.path = path
+        self.capacity = max(1, int(capacity))
+        size = HEADER_SIZE + self.capacity * RECORD.size
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            existing = os.fstat(fd).st_size
+            if existing != size:
+                os.ftruncate(fd, 0)
+                os.ftruncate(fd, size)
+            self._mapped = mmap.mmap(fd, size)
+        finally:
+            os.close(fd)
+
+        magic, record_size, capacity, written = HEADER.unpack_from(self._mapped, 0)
+        if (magic, record_size, capacity) != (MAGIC, RECORD.size, self.capacity):
+            written = 0
+            HEADER.pack_into(self._mapped, 0, MAGIC, RECORD.size, self.capacity, 0)
+        self.written = written
+        # Capture timestamps come from perf_counter; records hold wall time
+        self._clock_offset = time.time() - time.perf_counter()
+
+    def record(
+        self,
+        captured_at: float,
+        measured: float,
+        luminance: float,
+        smoothed: Optional[float],
+        target: int,
+        threshold: int,
+        applied: Optional[int],
+        flags: int,
+        timings_ms: Tuple[float, float, float, float, float],
+    ) -> None:
+        offset = HEADER_SIZE + (self.written % self.capacity) * RECORD.size
+        RECORD.pack_into(
+            self._mapped,
+            offset,
+            captured_at + self._clock_offset,
+            measured,
+            luminance,
+            -1.0 if smoothed is None else smoothed,
+            min(255, max(0, target)),
+            min(255, max(0, threshold)),
+            -1 if applied is None else applied,
+            flags,
+            *timings_ms,
+        )
+        self.written += 1
+        # The count is published after the record, so readers never see
+        # a half written one as valid
+        struct.pack_into("<Q", self._mapped, HEADER.size - 8, self.written)
+
+    def close(self) -> None:
+        try:
+            self._mapped.flush()
+            self._mapped.close()
+        except (OSError, ValueError) as e:
+            logger.error("Error closing trace %s: %s", self.path, e)
+
+
+def read_trace(path: str) -> List[TraceRecord]:
+    """All records of a trace file, oldest first"""
+    with open(path, "rb") as file:
+        data = file.read()
+    if len(data) < HEADER_SIZE:
+        raise ValueError(f"{path} is not a trace file")
+    magic, record_size, capacity, written = HEADER.unpack_from(data, 0)
+    if magic != MAGIC or record_size != RECORD.size:
+        raise ValueError(f"{path} is not a trace file of this version")
+    count = min(written, capacity)
+    first = written - count
+    records = []
+    for index in range(first, written):
+        offset = HEADER_SIZE + (index % capacity) * RECORD.size
+        records.append(TraceRecord(*RECORD.unpack_from(data, offset)))
+    return records
+
+
+def get_trace_recorder(config: Config) -> Optional[TraceRecorder]:
+    """Recorder configured in config.json, None if tracing is disabled"""
+    if not config.get("trace", "enabled"):
+        return None
+    path = config.get("trace", "path") or DEFAULT_TRACE_FILE
+    try:
+        recorder = TraceRecorder(path, config.get("trace", "capacity"))
+    except OSError as e:
+        logger.error("Failed to open trace file %s: %s", path, e)
+        return None
+    logger.info("Recording trace to %s (%s records)", path, recorder.capacity)
+    return recorder
+
+
+class RecordingBrightnessController(NullBrightnessController):
+    """Fake controller remembering every write and its simulated time"""
+
+    def __init__(self, level: int = 50):
+        super().__init__(level)
+        self.now = 0.0
+        self.writes: List[Tuple[float, int]] = []
+
+    def set_brightness(self, level: int) -> bool:
+        self.writes.append((self.now, level))
+        return super().set_brightness(level)
+
+
+class ReplayResult(NamedTuple):
+    # Per processed record: (timestamp, luminance, target, level on the display)
+    samples: List[Tuple[float, float, int, int]]
+    writes: List[Tuple[float, int]]
+    # Recorded records whose replayed target differs
+    mismatches: int
+
+
+class TraceReplay:
+    """Feeds a trace through the filter, curve and ramp of update_frame.
+
+    The ramp is stepped on a simulated clock at its configured tick rate,
+    targets go through the deadband, and levels are written to a
+    RecordingBrightnessController, so a session of hours replays in a
+    fraction of a second. The write
+    rate limit depends on wall time and is not applied.
+    """
+
+    def __init__(
+        self,
+        config: Optional[Config] = None,
+        threshold: Optional[int] = None,
+        curve: Optional[BrightnessCurve] = None,
+    ):
+        config = config or Config()
+        self.config = config
+        # Fixed threshold instead of the recorded one, to try other settings
+        self.threshold = threshold
+        self.curve = curve
+        self.luminance_filter = get_luminance_filter(config)
+        self.controller = RecordingBrightnessController()
+        self.deadband = config.get("brightness", "deadband")
+        self.cached = CachedBrightnessController(self.controller, max_rate=0)
+        self.ramp = BrightnessRamp(
+            self.cached,
+            curve=config.get("ramp", "curve"),
+            rate_hz=config.get("ramp", "rate_hz"),
+            max_slew=config.get("ramp", "max_slew"),
+            time_constant=config.get("ramp", "time_constant"),
+            gamma=config.get("ramp", "gamma"),
+        )
+        self._curves: Dict[int, BrightnessCurve] = {}
+
+    def _curve_for(self, threshold: int) -> BrightnessCurve:
+        if self.curve is not None:
+            return self.curve
+        if threshold not in self._curves:
+            self._curves[threshold] = get_brightness_curve(self.config, threshold)
+        return self._curves[threshold]
+
+    def _apply(self, now: float, level: int) -> int:
+        """Level the simulated display shows after the write, which may be dropped"""
+        self.controller.now = now
+        self.cached.set_brightness(level)
+        return self.controller.level
+
+    def run(self, records: List[TraceRecord]) -> ReplayResult:
+        samples: List[Tuple[float, float, int, int]] = []
+        mismatches = 0
+        interval = self.ramp.interval
+        current: Optional[float] = None
+        target: Optional[float] = None
+        applied: Optional[int] = None
+        next_tick = 0.0
+
+        for record in records:
+            if record.flags & FLAG_SKIPPED:
+                continue
+            now = record.timestamp
+            # Ramp ticks that fell between the previous sample and this one
+            while current is not None and current != target and next_tick <= now:
+                current = self.ramp.step(current, target, interval)
+                if abs(current - target) <= 1e-3:
+                    current = target
+                level = int(round(current))
+                if level != applied:
+                    applied = self._apply(next_tick, level)
+                next_tick += interval
+
+            luminance = self.luminance_filter.update(record.measured, now)
+            if record.flags & FLAG_CALIBRATING:
+                # The user chose the level, there is nothing to recompute
+                new_target = record.target
+            else:
+                threshold = self.threshold or record.threshold
+                new_target = self._curve_for(threshold).map(luminance)
+                if within_deadband(new_target, target, self.deadband):
+                    new_target = int(round(target))
+                if self.threshold is None and new_target != record.target:
+                    mismatches += 1
+
+            if current is None or current == target:
+                # An idle ramp wakes up as soon as a new target arrives
+                next_tick = now
+            if current is None or not record.flags & FLAG_SMOOTH:
+                current = target = float(new_target)
+                applied = self._apply(now, new_target)
+            else:
+                target = float(new_target)
+            samples.append((now, luminance, new_target, applied if applied is not None else -1))
+
+        return ReplayResult(samples, self.controller.writes, mismatches)
+
+
+def count_reversals(levels: List[int]) -> int:
+    """Direction changes in a sequence of levels, a measure of flicker"""
+    reversals = 0
+    direction = 0
+    for previous, level in zip(levels, levels[1:]):
+        step = (level > previous) - (level < previous)
+        if step and direction and step != direction:
+            reversals += 1
+        if step:
+            direction = step
+    return reversals
+
+
+def _summary(records: List[TraceRecord]) -> None:
+    processed = [record for record in records if not record.flags & FLAG_SKIPPED]
+    if not records:
+        print("Empty trace")
+        return
+    duration = records[-1].timestamp - records[0].timestamp
+    started = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(records[0].timestamp))
+    print(
+        f"{len(records)} records from {started} over {duration:.1f} s, "
+        f"{len(records) - len(processed)} skipped"
+    )
+    applied = [record.applied for record in processed if record.applied >= 0]
+    print(f"Recorded level reversals: {count_reversals(applied)}")
+
+
+def run_show(args: argparse.Namespace) -> None:
+    records = read_trace(args.path)
+    _summary(records)
+    print(
+        f"{'time':<15}{'measured':>9}{'filtered':>9}{'target':>7}{'level':>6}"
+        f"{'thresh':>7}  flags  total ms"
+    )
+    for record in records[-args.last:] if args.last else records:
+        flags = "".join(
+            letter if record.flags & flag else "-"
+            for flag, letter in (
+                (FLAG_SKIPPED, "s"), (FLAG_SMOOTH, "r"), (FLAG_CALIBRATING, "c"), (FLAG_SENSOR, "a")
+            )
+        )
+        total = (
+            record.detect_ms + record.sample_ms + record.measure_ms
+            + record.filter_ms + record.map_ms
+        )
+        stamp = time.strftime("%H:%M:%S", time.localtime(record.timestamp))
+        print(
+            f"{stamp}.{int(record.timestamp * 1000) % 1000:03d}    "
+            f"{record.measured:9.1f}{record.luminance:9.1f}{record.target:7d}"
+            f"{record.applied:6d}{record.threshold:7d}  {flags}   {total:7.3f}"
+        )
+
+
+def run_replay(args: argparse.Namespace) -> None:
+    records = read_trace(args.path)
+    _summary(records)
+    started = time.perf_counter()
+    result = TraceReplay(Config(), threshold=args.threshold).run(records)
+    elapsed = time.perf_counter() - started
+    duration = records[-1].timestamp - records[0].timestamp if records else 0.0
+    print(
+        f"Replayed {len(result.samples)} samples in {elapsed * 1000:.1f} ms "
+        f"({duration / elapsed if elapsed > 0 else 0.0:.0f}x real time)"
+    )
+    levels = [level for _, level in result.writes]
+    print(f"Replayed writes: {len(result.writes)}, level reversals: {count_reversals(levels)}")
+    if args.threshold is None:
+        print(f"Targets differing from the recording: {result.mismatches}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Inspect and replay brightness traces")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    show = subparsers.add_parser("show", help="print the records of a trace")
+    show.add_argument("path", nargs="?", default=DEFAULT_TRACE_FILE)
+    show.add_argument("--last", type=int, default=50, help="records to print, 0 for all")
+    show.set_defaults(func=run_show)
+
+    replay = subparsers.add_parser(
+        "replay", help="replay a trace through the filter, curve and ramp"
+    )
+    replay.add_argument("path", nargs="?", default=DEFAULT_TRACE_FILE)
+    replay.add_argument(
+        "--threshold", type=int, help="use this threshold instead of the recorded ones"
+    )
+    replay.set_defaults(func=run_replay)
+
+    args = parser.parse_args()
+    try:
+        args.func(args)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
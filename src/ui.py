@@ -10,17 +10,23 @@ from PyQt6.QtWidgets import (
 )
 from PyQt6.QtCore import Qt, pyqtSignal
 from PyQt6.QtGui import QFont
+from typing import Optional
 
 from .config import Config
 from .logger import logger
+from .preview import create_preview
 
 class AutoBrightnessUI(QWidget):
     start_stop_signal = pyqtSignal(bool)
     reset_signal = pyqtSignal()
+    calibration_signal = pyqtSignal(bool)
+    stats_signal = pyqtSignal()
+    # Emitted from the config watcher thread, so connected slots are queued
+    config_reloaded_signal = pyqtSignal()
 
-    def __init__(self):
+    def __init__(self, config: Optional[Config] = None):
         super().__init__()
-        self.config = Config()
+        self.config = config or Config()
         self.initUI()
 
     def initUI(self):
@@ -44,6 +50,9 @@ class AutoBrightnessUI(QWidget):
                 QPushButton:hover {
                     background-color: #2980b9;
                 }
+                QPushButton:checked {
+                    background-color: #e67e22;
+                }
                 QFrame {
                     border-radius: 8px;
                     background-color: #3a4254;
@@ -86,10 +95,12 @@ class AutoBrightnessUI(QWidget):
             preview_layout.setContentsMargins(0, 0, 0, 0)
             preview_layout.setSpacing(8)
 
-            self.camera_label = QLabel()
-            self.camera_label.setFixedSize(360, 270)
-            self.camera_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
-            preview_layout.addWidget(self.camera_label)
+            self.preview = create_preview(
+                self.config.get("ui", "preview_mode"),
+                self.config.get("ui", "preview_width"),
+                self.config.get("ui", "preview_height"),
+            )
+            preview_layout.addWidget(self.preview, alignment=Qt.AlignmentFlag.AlignCenter)
 
             self.info_label = QLabel()
             self.info_label.setFixedSize(360, 50)
@@ -123,6 +134,35 @@ class AutoBrightnessUI(QWidget):
             brightness_layout.addWidget(self.brightness_slider)
             controls_layout.addLayout(brightness_layout)
 
+            # Display brightness picked by the user while calibrating; it
+            # takes the place of the threshold, which the calibrated curve
+            # replaces
+            calibration_layout = QVBoxLayout()
+            calibration_header = QHBoxLayout()
+            calibration_label = QLabel("Display Brightness")
+            calibration_header.addWidget(calibration_label)
+            self.calibration_value_label = QLabel("50%")
+            calibration_header.addWidget(self.calibration_value_label)
+            calibration_layout.addLayout(calibration_header)
+
+            self.calibration_slider = QSlider(Qt.Orientation.Horizontal)
+            self.calibration_slider.setRange(0, 100)
+            self.calibration_slider.setValue(50)
+            self.calibration_slider.valueChanged.connect(self.update_calibration_label)
+            calibration_layout.addWidget(self.calibration_slider)
+            controls_layout.addLayout(calibration_layout)
+
+            self.threshold_widgets = (
+                brightness_label, self.brightness_value_label, self.brightness_slider
+            )
+            self.calibration_widgets = (
+                calibration_label, self.calibration_value_label, self.calibration_slider
+            )
+            for widget in self.calibration_widgets:
+                widget.hide()
+            self.update_threshold_controls()
+            self.config_reloaded_signal.connect(self.update_threshold_controls)
+
             # Exposure control
             exposure_layout = QVBoxLayout()
             exposure_header = QHBoxLayout()
@@ -160,6 +200,19 @@ class AutoBrightnessUI(QWidget):
             self.reset_button.clicked.connect(self.reset_values)
             buttons_layout.addWidget(self.reset_button)
 
+            self.calibrate_button = QPushButton("Calibrate")
+            self.calibrate_button.setCheckable(True)
+            self.calibrate_button.setToolTip(
+                "Set the display brightness you want in the current light. "
+                "The curve is fitted and saved when calibration is turned off."
+            )
+            self.calibrate_button.toggled.connect(self.toggle_calibration_controls)
+            buttons_layout.addWidget(self.calibrate_button)
+
+            self.stats_button = QPushButton("Stats")
+            self.stats_button.clicked.connect(self.stats_signal.emit)
+            buttons_layout.addWidget(self.stats_button)
+
             self.start_stop_button = QPushButton("Start")
             self.start_stop_button.clicked.connect(self.toggle_start_stop)
             buttons_layout.addWidget(self.start_stop_button)
@@ -168,21 +221,51 @@ class AutoBrightnessUI(QWidget):
             self.setLayout(main_layout)
 
         except Exception as e:
-            logger.error(f"Error initializing UI: {e}")
+            logger.error("Error initializing UI: %s", e)
 
     def update_brightness_label(self, value: int) -> None:
         """Update brightness slider label"""
         try:
             self.brightness_value_label.setText(f"{value}%")
         except Exception as e:
-            logger.error(f"Error updating brightness label: {e}")
+            logger.error("Error updating brightness label: %s", e)
 
     def update_exposure_label(self, value: int) -> None:
         """Update exposure slider label"""
         try:
             self.exposure_value_label.setText(str(value))
         except Exception as e:
-            logger.error(f"Error updating exposure label: {e}")
+            logger.error("Error updating exposure label: %s", e)
+
+    def update_calibration_label(self, value: int) -> None:
+        """Update calibration slider label"""
+        try:
+            self.calibration_value_label.setText(f"{value}%")
+        except Exception as e:
+            logger.error("Error updating calibration label: %s", e)
+
+    def toggle_calibration_controls(self, enabled: bool) -> None:
+        """Swap the threshold slider for the calibration slider"""
+        try:
+            for widget in self.threshold_widgets:
+                widget.setVisible(not enabled)
+            for widget in self.calibration_widgets:
+                widget.setVisible(enabled)
+            self.calibration_signal.emit(enabled)
+        except Exception as e:
+            logger.error("Error toggling calibration: %s", e)
+
+    def update_threshold_controls(self) -> None:
+        """Disable the threshold slider while a calibrated curve replaces it"""
+        try:
+            calibrated = bool(self.config.get("calibration", "points"))
+            self.brightness_slider.setEnabled(not calibrated)
+            self.brightness_slider.setToolTip(
+                "A calibrated curve is in use; press Reset to return to the threshold."
+                if calibrated else ""
+            )
+        except Exception as e:
+            logger.error("Error updating threshold controls: %s", e)
 
     def reset_values(self) -> None:
         """Reset all values to defaults"""
@@ -198,7 +281,7 @@ class AutoBrightnessUI(QWidget):
             )
             self.reset_signal.emit()
         except Exception as e:
-            logger.error(f"Error resetting values: {e}")
+            logger.error("Error resetting values: %s", e)
 
     def toggle_start_stop(self) -> None:
         """Toggle between start and stop states"""
@@ -212,4 +295,4 @@ class AutoBrightnessUI(QWidget):
                 self.start_stop_button.setStyleSheet("background-color: #3498db;")
                 self.start_stop_signal.emit(False)
         except Exception as e:
-            logger.error(f"Error toggling start/stop: {e}")
+            logger.error("Error toggling start/stop: %s", e)
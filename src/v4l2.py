@@ -0,0 +1,513 @@
+"""Zero-copy V4L2 capture that meters directly on the luma plane.
+
+OpenCV decodes every YUYV frame to BGR, only for the estimator to reduce
+it back to luma. Here the driver's buffers are memory mapped and each
+frame is handed out as a strided view of its Y samples, so nothing is
+decoded or copied. The ioctls are issued through ctypes; there is no
+dependency beyond numpy.
+"""
+import ctypes
+import mmap
+import os
+import select
+import threading
+import time
+from functools import partial
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+
+from .capture import AdaptiveInterval, CaptureThread, LatestFrameQueue, capture_rate
+from .config import Config
+from .logger import logger
+from .metrics import Metrics
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows
+    fcntl = None
+
+
+def _fourcc(code: str) -> int:
+    return sum(ord(char) << (8 * i) for i, char in enumerate(code))
+
+
+V4L2_PIX_FMT_YUYV = _fourcc("YUYV")
+V4L2_BUF_TYPE_VIDEO_CAPTURE = 1
+V4L2_MEMORY_MMAP = 1
+V4L2_FIELD_ANY = 0
+V4L2_CID_EXPOSURE_AUTO = 0x009A0901
+V4L2_CID_EXPOSURE_ABSOLUTE = 0x009A0902
+V4L2_EXPOSURE_MANUAL = 1
+
+
+class v4l2_pix_format(ctypes.Structure):
+    _fields_ = [
+        ("width", ctypes.c_uint32),
+        ("height", ctypes.c_uint32),
+        ("pixelformat", ctypes.c_uint32),
+        ("field", ctypes.c_uint32),
+        ("bytesperline", ctypes.c_uint32),
+        ("sizeimage", ctypes.c_uint32),
+        ("colorspace", ctypes.c_uint32),
+        ("priv", ctypes.c_uint32),
+        ("flags", ctypes.c_uint32),
+        ("ycbcr_enc", ctypes.c_uint32),
+        ("quantization", ctypes.c_uint32),
+        ("xfer_func", ctypes.c_uint32),
+    ]
+
+
+class _v4l2_format_union(ctypes.Union):
+    _fields_ = [
+        ("pix", v4l2_pix_format),
+        ("raw_data", ctypes.c_uint8 * 200),
+        # Other members hold pointers, which aligns the union to 8 bytes
+        ("_align", ctypes.c_void_p),
+    ]
+
+
+class v4l2_format(ctypes.Structure):
+    _fields_ = [("type", ctypes.c_uint32), ("fmt", _v4l2_format_union)]
+
+
+class v4l2_requestbuffers(ctypes.Structure):
+    _fields_ = [
+        ("count", ctypes.c_uint32),
+        ("type", ctypes.c_uint32),
+        ("memory", ctypes.c_uint32),
+        ("capabilities", ctypes.c_uint32),
+        ("flags", ctypes.c_uint8),
+        ("reserved", ctypes.c_uint8 * 3),
+    ]
+
+
+class timeval(ctypes.Structure):
+    _fields_ = [("tv_sec", ctypes.c_long), ("tv_usec", ctypes.c_long)]
+
+
+class v4l2_timecode(ctypes.Structure):
+    _fields_ = [
+        ("type", ctypes.c_uint32),
+        ("flags", ctypes.c_uint32),
+        ("frames", ctypes.c_uint8),
+        ("seconds", ctypes.c_uint8),
+        ("minutes", ctypes.c_uint8),
+        ("hours", ctypes.c_uint8),
+        ("userbits", ctypes.c_uint8 * 4),
+    ]
+
+
+class _v4l2_buffer_m(ctypes.Union):
+    _fields_ = [
+        ("offset", ctypes.c_uint32),
+        ("userptr", ctypes.c_ulong),
+        ("planes", ctypes.c_void_p),
+        ("fd", ctypes.c_int32),
+    ]
+
+
+class v4l2_buffer(ctypes.Structure):
+    _fields_ = [
+        ("index", ctypes.c_uint32),
+        ("type", ctypes.c_uint32),
+        ("bytesused", ctypes.c_uint32),
+        ("flags", ctypes.c_uint32),
+        ("field", ctypes.c_uint32),
+        ("timestamp", timeval),
+        ("timecode", v4l2_timecode),
+        ("sequence", ctypes.c_uint32),
+        ("memory", ctypes.c_uint32),
+        ("m", _v4l2_buffer_m),
+        ("length", ctypes.c_uint32),
+        ("reserved2", ctypes.c_uint32),
+        ("request_fd", ctypes.c_int32),
+    ]
+
+
+class v4l2_fract(ctypes.Structure):
+    _fields_ = [("numerator", ctypes.c_uint32), ("denominator", ctypes.c_uint32)]
+
+
+class v4l2_captureparm(ctypes.Structure):
+    _fields_ = [
+        ("capability", ctypes.c_uint32),
+        ("capturemode", ctypes.c_uint32),
+        ("timeperframe", v4l2_fract),
+        ("extendedmode", ctypes.c_uint32),
+        ("readbuffers", ctypes.c_uint32),
+        ("reserved", ctypes.c_uint32 * 4),
+    ]
+
+
+class _v4l2_streamparm_union(ctypes.Union):
+    _fields_ = [("capture", v4l2_captureparm), ("raw_data", ctypes.c_uint8 * 200)]
+
+
+class v4l2_streamparm(ctypes.Structure):
+    _fields_ = [("type", ctypes.c_uint32), ("parm", _v4l2_streamparm_union)]
+
+
+class v4l2_control(ctypes.Structure):
+    _fields_ = [("id", ctypes.c_uint32), ("value", ctypes.c_int32)]
+
+
+def _ioc(direction: int, number: int, size: int) -> int:
+    # Linux asm-generic layout: dir:2 size:14 type:8 nr:8
+    return (direction << 30) | (size << 16) | (ord("V") << 8) | number
+
+
+_IOC_WRITE = 1
+_IOC_READWRITE = 3
+
+VIDIOC_G_FMT = _ioc(_IOC_READWRITE, 4, ctypes.sizeof(v4l2_format))
+VIDIOC_S_FMT = _ioc(_IOC_READWRITE, 5, ctypes.sizeof(v4l2_format))
+VIDIOC_REQBUFS = _ioc(_IOC_READWRITE, 8, ctypes.sizeof(v4l2_requestbuffers))
+VIDIOC_QUERYBUF = _ioc(_IOC_READWRITE, 9, ctypes.sizeof(v4l2_buffer))
+VIDIOC_QBUF = _ioc(_IOC_READWRITE, 15, ctypes.sizeof(v4l2_buffer))
+VIDIOC_DQBUF = _ioc(_IOC_READWRITE, 17, ctypes.sizeof(v4l2_buffer))
+VIDIOC_STREAMON = _ioc(_IOC_WRITE, 18, ctypes.sizeof(ctypes.c_int))
+VIDIOC_STREAMOFF = _ioc(_IOC_WRITE, 19, ctypes.sizeof(ctypes.c_int))
+VIDIOC_S_PARM = _ioc(_IOC_READWRITE, 22, ctypes.sizeof(v4l2_streamparm))
+VIDIOC_S_CTRL = _ioc(_IOC_READWRITE, 28, ctypes.sizeof(v4l2_control))
+
+
+def luma_view(buffer, width: int, height: int, bytes_per_line: int) -> np.ndarray:
+    """Strided (height, width) view of the Y samples of a packed YUYV buffer"""
+    packed = np.frombuffer(buffer, dtype=np.uint8, count=bytes_per_line * height)
+    return packed.reshape(height, bytes_per_line)[:, : width * 2 : 2]
+
+
+def exposure_to_v4l2(exposure: int) -> int:
+    """Convert the log2-seconds exposure used by the UI to V4L2's 100 us units"""
+    return max(1, round(2.0 ** exposure * 10000))
+
+
+class V4L2Camera:
+    """A V4L2 capture device streaming YUYV into memory-mapped buffers.
+
+    read() returns the index and Y-plane view of the newest filled buffer.
+    The view aliases driver memory, so the buffer must be handed back with
+    requeue(index) once the frame has been metered; until then the driver
+    fills the remaining buffers.
+    """
+
+    def __init__(
+        self,
+        device: str,
+        width: int = 0,
+        height: int = 0,
+        fps: float = 0.0,
+        exposure: Optional[int] = None,
+        buffer_count: int = 4,
+    ):
+        if fcntl is None:
+            raise RuntimeError("V4L2 capture is only available on Linux")
+        self.device = device
+        self._lock = threading.Lock()
+        self._buffers: List[mmap.mmap] = []
+        self._views: List[np.ndarray] = []
+        self._fd = os.open(device, os.O_RDWR | os.O_NONBLOCK)
+        try:
+            self._configure(width, height, fps)
+            if exposure is not None:
+                self.set_exposure(exposure)
+            self._map_buffers(buffer_count)
+            self._ioctl(VIDIOC_STREAMON, ctypes.c_int(V4L2_BUF_TYPE_VIDEO_CAPTURE))
+        except Exception:
+            self.close()
+            raise
+        # Bound once per buffer so handing frames out never allocates
+        self.release_callbacks: List[Callable[[], None]] = [
+            partial(self.requeue, index) for index in range(len(self._views))
+        ]
+        self._dequeued = v4l2_buffer(type=V4L2_BUF_TYPE_VIDEO_CAPTURE, memory=V4L2_MEMORY_MMAP)
+
+    def _ioctl(self, request: int, argument) -> None:
+        fcntl.ioctl(self._fd, request, argument)
+
+    def _configure(self, width: int, height: int, fps: float) -> None:
+        fmt = v4l2_format(type=V4L2_BUF_TYPE_VIDEO_CAPTURE)
+        self._ioctl(VIDIOC_G_FMT, fmt)
+        if width and height:
+            fmt.fmt.pix.width = width
+            fmt.fmt.pix.height = height
+        fmt.fmt.pix.pixelformat = V4L2_PIX_FMT_YUYV
+        fmt.fmt.pix.field = V4L2_FIELD_ANY
+        self._ioctl(VIDIOC_S_FMT, fmt)
+        pix = fmt.fmt.pix
+        if pix.pixelformat != V4L2_PIX_FMT_YUYV:
+            raise RuntimeError(f"{self.device} does not deliver YUYV frames")
+        self.width = pix.width
+        self.height = pix.height
+        self.bytes_per_line = pix.bytesperline or pix.width * 2
+
+        self.fps = 0.0
+        if fps > 0:
+            parm = v4l2_streamparm(type=V4L2_BUF_TYPE_VIDEO_CAPTURE)
+            parm.parm.capture.timeperframe.numerator = 1000
+            parm.parm.capture.timeperframe.denominator = round(fps * 1000)
+            try:
+                self._ioctl(VIDIOC_S_PARM, parm)
+                granted = parm.parm.capture.timeperframe
+                if granted.numerator:
+                    self.fps = granted.denominator / granted.numerator
+            except OSError as e:
+                logger.debug("%s does not support setting the frame rate: %s", self.device, e)
+
+    def _map_buffers(self, count: int) -> None:
+        request = v4l2_requestbuffers(
+            count=count, type=V4L2_BUF_TYPE_VIDEO_CAPTURE, memory=V4L2_MEMORY_MMAP
+        )
+        self._ioctl(VIDIOC_REQBUFS, request)
+        if request.count < 2:
+            raise RuntimeError(f"{self.device} granted too few capture buffers")
+        for index in range(request.count):
+            buffer = v4l2_buffer(
+                index=index, type=V4L2_BUF_TYPE_VIDEO_CAPTURE, memory=V4L2_MEMORY_MMAP
+            )
+            self._ioctl(VIDIOC_QUERYBUF, buffer)
+            mapped = mmap.mmap(
+                self._fd, buffer.length, mmap.MAP_SHARED,
+                mmap.PROT_READ | mmap.PROT_WRITE, offset=buffer.m.offset,
+            )
+            self._buffers.append(mapped)
+            self._views.append(
+                luma_view(mapped, self.width, self.height, self.bytes_per_line)
+            )
+            self._ioctl(VIDIOC_QBUF, buffer)
+
+    def set_exposure(self, exposure: int) -> None:
+        """Switch to manual exposure; unsupported controls are skipped"""
+        for control_id, value in (
+            (V4L2_CID_EXPOSURE_AUTO, V4L2_EXPOSURE_MANUAL),
+            (V4L2_CID_EXPOSURE_ABSOLUTE, exposure_to_v4l2(exposure)),
+        ):
+            try:
+                self._ioctl(VIDIOC_S_CTRL, v4l2_control(id=control_id, value=value))
+            except OSError as e:
+                logger.debug("%s rejected exposure control %#x: %s", self.device, control_id, e)
+
+    def _dequeue(self) -> Optional[int]:
+        """Take a filled buffer from the driver, None if none is ready"""
+        buffer = self._dequeued
+        try:
+            self._ioctl(VIDIOC_DQBUF, buffer)
+        except BlockingIOError:
+            return None
+        return buffer.index
+
+    def read(self, timeout: float = 2.0) -> Tuple[int, np.ndarray]:
+        """Wait for the next frame and return its buffer index and Y plane.
+
+        When several frames queued up while the caller was busy, the older
+        ones go straight back to the driver and only the newest is returned.
+        """
+        ready, _, _ = select.select([self._fd], [], [], timeout)
+        if not ready:
+            raise RuntimeError(f"Timed out waiting for a frame from {self.device}")
+        index = self._dequeue()
+        if index is None:
+            raise RuntimeError(f"No frame available from {self.device}")
+        while True:
+            newer = self._dequeue()
+            if newer is None:
+                return index, self._views[index]
+            self.requeue(index)
+            index = newer
+
+    def requeue(self, index: int) -> None:
+        """Hand a buffer back to the driver once its frame has been used"""
+        with self._lock:
+            if self._fd < 0:
+                return
+            buffer = v4l2_buffer(
+                index=index, type=V4L2_BUF_TYPE_VIDEO_CAPTURE, memory=V4L2_MEMORY_MMAP
+            )
+            try:
+                self._ioctl(VIDIOC_QBUF, buffer)
+            except OSError as e:
+                logger.debug("Failed to requeue buffer %d on %s: %s", index, self.device, e)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._fd < 0:
+                return
+            try:
+                self._ioctl(VIDIOC_STREAMOFF, ctypes.c_int(V4L2_BUF_TYPE_VIDEO_CAPTURE))
+            except OSError:
+                pass
+            self._views = []
+            for buffer in self._buffers:
+                try:
+                    buffer.close()
+                except BufferError:
+                    # A consumer still holds a view; the mapping is
+                    # released once that frame is garbage collected
+                    pass
+            self._buffers = []
+            os.close(self._fd)
+            self._fd = -1
+
+
+class YuyvFileCamera:
+    """Replays a raw YUYV recording through the V4L2Camera interface.
+
+    The file is memory mapped and frames are handed out as Y-plane views in
+    a loop, so the metering path can be tested and benchmarked without a
+    camera. Record one with e.g.
+    `ffmpeg -f v4l2 -input_format yuyv422 -i /dev/video0 -f rawvideo out.yuyv`.
+    """
+
+    def __init__(self, path: str, width: int, height: int, fps: float = 0.0):
+        self.device = path
+        self.width = width
+        self.height = height
+        self.bytes_per_line = width * 2
+        self.fps = fps
+        frame_size = self.bytes_per_line * height
+        with open(path, "rb") as file:
+            self._mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        count = len(self._mapped) // frame_size
+        if count == 0:
+            self._mapped.close()
+            raise RuntimeError(f"{path} holds no complete {width}x{height} YUYV frame")
+        self._views = [
+            luma_view(
+                memoryview(self._mapped)[index * frame_size:(index + 1) * frame_size],
+                width, height, self.bytes_per_line,
+            )
+            for index in range(count)
+        ]
+        self.release_callbacks: List[Callable[[], None]] = [
+            partial(self.requeue, index) for index in range(count)
+        ]
+        self._next = 0
+        self._next_at = time.perf_counter()
+
+    @property
+    def frame_count(self) -> int:
+        return len(self._views)
+
+    def packed_frame(self, index: int) -> np.ndarray:
+        """The whole YUYV frame as a (height, width, 2) view, for decoding"""
+        return self._views[index].base.reshape(self.height, self.width, 2)
+
+    def read(self, timeout: float = 2.0) -> Tuple[int, np.ndarray]:
+        if self.fps > 0:
+            # Play back at the recorded rate like a real device
+            delay = self._next_at - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            self._next_at = max(self._next_at + 1.0 / self.fps, time.perf_counter())
+        index = self._next
+        self._next = (index + 1) % len(self._views)
+        return index, self._views[index]
+
+    def requeue(self, index: int) -> None:
+        pass
+
+    def set_exposure(self, exposure: int) -> None:
+        pass
+
+    def close(self) -> None:
+        self._views = []
+        try:
+            self._mapped.close()
+        except BufferError:
+            pass
+
+
+def open_v4l2_camera(config: Config, exposure: int) -> V4L2Camera:
+    """Open the configured camera through V4L2 in the configured mode"""
+    width = height = 0
+    if config.get("camera", "metering_mode"):
+        width = config.get("camera", "metering_width")
+        height = config.get("camera", "metering_height")
+    camera = V4L2Camera(
+        f"/dev/video{config.get('camera', 'device_index')}",
+        width, height, capture_rate(config), exposure,
+    )
+    logger.info(
+        "Camera granted %sx%s @ %.1f fps, format=YUYV (V4L2, metering on the Y plane)",
+        camera.width,
+        camera.height,
+        camera.fps,
+    )
+    return camera
+
+
+class V4L2CaptureThread(CaptureThread):
+    """Capture thread that publishes zero-copy Y-plane views of V4L2 buffers.
+
+    Each frame is published with a callback that requeues its buffer once
+    the processing thread is done with it. When the device cannot be
+    streamed through V4L2 the thread falls back to cv2.VideoCapture.
+    """
+
+    def __init__(
+        self,
+        config: Config,
+        exposure: int,
+        frame_queue: LatestFrameQueue,
+        on_error: Callable[[str], None],
+        schedule: Optional[AdaptiveInterval] = None,
+        metrics: Optional[Metrics] = None,
+        open_camera: Callable[[Config, int], V4L2Camera] = open_v4l2_camera,
+    ):
+        super().__init__(config, exposure, frame_queue, on_error, schedule, metrics)
+        self.name = "V4L2CaptureThread"
+        self.open_camera = open_camera
+        # YUYV luma uses the limited 16-235 range
+        self.limited_range_luma = True
+
+    def run(self) -> None:
+        try:
+            camera = self.open_camera(self.config, self.exposure)
+        except Exception as e:
+            logger.warning("V4L2 capture unavailable, falling back to OpenCV: %s", e)
+            self.limited_range_luma = False
+            super().run()
+            return
+
+        self.granted = {
+            "width": camera.width,
+            "height": camera.height,
+            "fps": camera.fps,
+            "pixel_format": "YUYV",
+        }
+        try:
+            min_interval = 1.0 / self.fps
+            next_tick = time.perf_counter()
+            while not self._stop_event.is_set():
+                if self.paused:
+                    if not self._wait_while_paused():
+                        break
+                    next_tick = time.perf_counter()
+
+                exposure, self._pending_exposure = self._pending_exposure, None
+                if exposure is not None:
+                    camera.set_exposure(exposure)
+
+                read_started = time.perf_counter()
+                try:
+                    index, frame = camera.read()
+                except (OSError, RuntimeError) as e:
+                    self._read_failed(str(e))
+                    self._stop_event.wait(min_interval)
+                    continue
+                captured_at = time.perf_counter()
+                self._record_read(read_started, captured_at)
+                self.frame_queue.put(frame, captured_at, camera.release_callbacks[index])
+
+                interval = min_interval
+                if self.schedule is not None:
+                    interval = max(min_interval, self.schedule.interval)
+                next_tick = max(next_tick + interval, captured_at)
+                self._stop_event.wait(next_tick - captured_at)
+        except Exception as e:
+            if not self._stop_event.is_set():
+                self.on_error(str(e))
+        finally:
+            # Frames still queued keep their views; requeueing them is a no-op
+            camera.close()
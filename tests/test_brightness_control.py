@@ -0,0 +1,136 @@
+import threading
+
+import pytest
+
+from src import brightness_control
+from src.brightness_control import (
+    BrightnessController,
+    DisplayMapping,
+    MultiDisplayBrightnessController,
+    SysfsBacklightController,
+    get_brightness_controller,
+)
+
+
+class FakeConfig:
+    def __init__(self, displays=None):
+        self.displays = displays or {}
+
+    def get_section(self, section):
+        return self.displays if section == "displays" else {}
+
+
+class ThreadRecordingController(BrightnessController):
+    """Records which threads attached, detached and wrote"""
+
+    def __init__(self):
+        self.attached = []
+        self.detached = []
+        self.writers = []
+
+    def set_brightness(self, level):
+        self.writers.append(threading.current_thread())
+        return True
+
+    def get_brightness(self):
+        return 50
+
+    def attach_thread(self):
+        self.attached.append(threading.current_thread())
+
+    def detach_thread(self):
+        self.detached.append(threading.current_thread())
+
+
+def add_backlight(root, name, kind, max_brightness, brightness=0):
+    device = root / name
+    device.mkdir()
+    (device / "type").write_text(f"{kind}\n")
+    (device / "max_brightness").write_text(f"{max_brightness}\n")
+    (device / "brightness").write_text(f"{brightness}\n")
+
+
+def read_brightness(root, name):
+    return int((root / name / "brightness").read_text().split()[0])
+
+
+@pytest.fixture
+def backlight_root(tmp_path, monkeypatch):
+    """A fake /sys/class/backlight with two interfaces to the same panel"""
+    add_backlight(tmp_path, "intel_backlight", "raw", 96000, 1000)
+    add_backlight(tmp_path, "acpi_video0", "firmware", 15, 1)
+    root = str(tmp_path)
+
+    class Controller(SysfsBacklightController):
+        def __init__(self, display=0):
+            super().__init__(display, root=root)
+
+        @classmethod
+        def list_displays(cls, root=root):
+            return super().list_displays(root)
+
+    monkeypatch.setattr(brightness_control, "_platform_controller_class", lambda: Controller)
+    monkeypatch.setattr(brightness_control, "_display_cache", None)
+    return tmp_path
+
+
+def test_list_displays_puts_the_best_interface_first(backlight_root):
+    assert SysfsBacklightController.list_displays(str(backlight_root)) == [
+        "acpi_video0",
+        "intel_backlight",
+    ]
+
+
+def test_only_the_best_interface_is_written(backlight_root):
+    controller = get_brightness_controller(FakeConfig())
+
+    assert isinstance(controller, SysfsBacklightController)
+    assert controller.device == "acpi_video0"
+    assert controller.set_brightness(60)
+    assert read_brightness(backlight_root, "acpi_video0") == 9
+    assert read_brightness(backlight_root, "intel_backlight") == 1000
+    controller.close()
+
+
+def test_explicitly_mapped_interface_is_written_too(backlight_root):
+    controller = get_brightness_controller(FakeConfig({"intel_backlight": {"scale": 0.5}}))
+
+    assert isinstance(controller, MultiDisplayBrightnessController)
+    assert [name for name, _, _ in controller.displays] == ["acpi_video0", "intel_backlight"]
+    assert controller.set_brightness(60)
+    assert read_brightness(backlight_root, "acpi_video0") == 9
+    assert read_brightness(backlight_root, "intel_backlight") == 28800
+    for _, display, _ in controller.displays:
+        display.close()
+
+
+def test_writes_scale_to_max_brightness(tmp_path):
+    add_backlight(tmp_path, "intel_backlight", "raw", 96000)
+    controller = SysfsBacklightController(root=str(tmp_path))
+
+    assert controller.set_brightness(25)
+    assert read_brightness(tmp_path, "intel_backlight") == 24000
+    assert controller.get_brightness() == 25
+    controller.close()
+
+
+def test_close_stops_the_display_writer_threads():
+    controllers = [ThreadRecordingController(), ThreadRecordingController()]
+    multi = MultiDisplayBrightnessController(
+        [(f"display{i}", controller, DisplayMapping()) for i, controller in enumerate(controllers)]
+    )
+
+    assert multi.set_brightness(40)
+    first_writers = [controller.writers[0] for controller in controllers]
+    multi.close()
+    for thread in first_writers:
+        thread.join(timeout=2.0)
+        assert not thread.is_alive()
+    for controller, thread in zip(controllers, first_writers):
+        assert controller.attached == [thread]
+        assert controller.detached == [thread]
+
+    # The writers are started again for the next pipeline run
+    assert multi.set_brightness(60)
+    assert all(controller.writers[1].is_alive() for controller in controllers)
+    multi.close()
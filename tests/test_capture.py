@@ -0,0 +1,99 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from src import capture
+from src.capture import AdaptiveInterval, DutyCycleCaptureThread, LatestFrameQueue
+from src.config import Config
+
+
+class FakeCapture:
+    """VideoCapture stand-in returning numbered frames, failing the listed reads"""
+
+    def __init__(self, failing=()):
+        self.failing = set(failing)
+        self.reads = 0
+
+    def read(self):
+        self.reads += 1
+        if self.reads in self.failing:
+            return False, None
+        return True, np.full((4, 4, 3), self.reads, dtype=np.uint8)
+
+    def grab(self):
+        return True
+
+    def release(self):
+        pass
+
+
+@pytest.fixture
+def config(tmp_path):
+    config = Config(str(tmp_path / "config.json"))
+    config.set("duty_cycle", "warmup_frames", 0)
+    config.set("duty_cycle", "burst_frames", 3)
+    config.flush()
+    return config
+
+
+def start_thread(config, monkeypatch, schedule, captures):
+    opened = []
+
+    def open_camera(config, exposure, report=True):
+        opened.append(time.perf_counter())
+        return captures.pop(0) if captures else FakeCapture(), {}
+
+    monkeypatch.setattr(capture, "open_camera", open_camera)
+    queue = LatestFrameQueue()
+    thread = DutyCycleCaptureThread(config, 0, queue, lambda message: None, schedule)
+    thread.start()
+    return thread, queue, opened
+
+
+def test_last_successful_frame_ends_the_burst(config, monkeypatch):
+    schedule = AdaptiveInterval(5.0, 5.0, 1.0)
+    thread, queue, _ = start_thread(config, monkeypatch, schedule, [FakeCapture(failing=[3])])
+    try:
+        # The queue keeps the newest frame while the thread sleeps
+        time.sleep(0.2)
+        frame, captured_at = queue.get(timeout=2.0)
+        # The failed third read leaves the second frame as the burst's last
+        assert frame[0, 0, 0] == 2
+        assert thread.ends_burst(captured_at)
+    finally:
+        thread.stop()
+        thread.join(timeout=2.0)
+
+
+def test_change_cuts_the_pause_short(config, monkeypatch):
+    schedule = AdaptiveInterval(0.05, 10.0, 1.0)
+    schedule.interval = 10.0
+    thread, queue, opened = start_thread(config, monkeypatch, schedule, [])
+    try:
+        time.sleep(0.2)
+        _, captured_at = queue.get(timeout=2.0)
+        assert thread.ends_burst(captured_at)
+        reported_at = time.perf_counter()
+        schedule.report_change(True)
+        deadline = time.perf_counter() + 2.0
+        while len(opened) < 2 and time.perf_counter() < deadline:
+            time.sleep(0.01)
+        assert len(opened) == 2
+        assert opened[1] - reported_at < 1.0
+    finally:
+        thread.stop()
+        thread.join(timeout=2.0)
+    assert not thread.is_alive()
+
+
+def test_wait_ends_when_stopped():
+    schedule = AdaptiveInterval(10.0, 10.0, 1.0)
+    stop_event = threading.Event()
+    waiter = threading.Thread(target=schedule.wait, args=(time.perf_counter(), stop_event))
+    waiter.start()
+    stop_event.set()
+    schedule.wake()
+    waiter.join(timeout=2.0)
+    assert not waiter.is_alive()
@@ -0,0 +1,59 @@
+import json
+import os
+
+from src.config import Config
+
+
+def test_flush_writes_pending_changes(tmp_path):
+    path = tmp_path / "config.json"
+    config = Config(str(path))
+    config.set("brightness", "deadband", 3)
+    config.flush()
+
+    assert json.loads(path.read_text())["brightness"]["deadband"] == 3
+    assert os.listdir(tmp_path) == ["config.json"]
+
+
+def test_failed_write_keeps_changes_pending(tmp_path, monkeypatch):
+    path = tmp_path / "config.json"
+    config = Config(str(path))
+    config.set("brightness", "deadband", 3)
+
+    def fail(src, dst):
+        raise OSError("disk full")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(os, "replace", fail)
+        config.flush()
+    assert json.loads(path.read_text())["brightness"]["deadband"] != 3
+    assert os.listdir(tmp_path) == ["config.json"]
+
+    config.flush()
+    assert json.loads(path.read_text())["brightness"]["deadband"] == 3
+
+
+def test_write_keeps_the_file_mode(tmp_path):
+    path = tmp_path / "config.json"
+    config = Config(str(path))
+    path.chmod(0o640)
+    config.set("brightness", "deadband", 3)
+    config.flush()
+
+    assert path.stat().st_mode & 0o777 == 0o640
+
+
+def test_write_keeps_a_symlinked_config(tmp_path):
+    dotfiles = tmp_path / "dotfiles"
+    dotfiles.mkdir()
+    real = dotfiles / "config.json"
+    Config(str(real))
+    link = tmp_path / "config.json"
+    link.symlink_to(real)
+
+    config = Config(str(link))
+    config.set("brightness", "deadband", 3)
+    config.flush()
+
+    assert link.is_symlink()
+    assert json.loads(real.read_text())["brightness"]["deadband"] == 3
+    assert sorted(os.listdir(dotfiles)) == ["config.json"]
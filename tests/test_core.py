@@ -0,0 +1,45 @@
+import json
+
+import pytest
+
+from src.capture import AdaptiveInterval
+from src.config import Config
+from src.core import AutoBrightnessCore
+
+
+@pytest.fixture
+def core(tmp_path):
+    core = AutoBrightnessCore(Config(str(tmp_path / "config.json")))
+    yield core
+    core.brightness_applier.close()
+
+
+def edit_config(core, changes):
+    """Change config.json the way an editor would and reload it"""
+    with open(core.config.config_path) as file:
+        settings = json.load(file)
+    for (section, key), value in changes.items():
+        settings[section][key] = value
+    with open(core.config.config_path, "w") as file:
+        json.dump(settings, file)
+    core.config.reload()
+
+
+def test_invalid_reload_changes_nothing(core):
+    estimator = core.luminance_estimator
+    interval = core.ramp.interval
+
+    edit_config(core, {("luminance", "method"): "mean", ("ramp", "rate_hz"): 0})
+
+    assert core.luminance_estimator is estimator
+    assert core.ramp.interval == interval
+
+
+def test_disabling_scene_detection_restores_the_full_read_rate(core):
+    core.schedule = AdaptiveInterval(0.1, 2.0, 2.0)
+    core.schedule.interval = 2.0
+
+    edit_config(core, {("scene", "enabled"): False})
+
+    assert core.scene_detector is None
+    assert core.schedule.interval == pytest.approx(0.1)
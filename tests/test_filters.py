@@ -0,0 +1,113 @@
+import pytest
+
+from src.config import Config
+from src.filters import (
+    EmaFilter,
+    FilterChain,
+    MedianFilter,
+    OneEuroFilter,
+    OutlierRejector,
+    PassThroughFilter,
+    RingBuffer,
+    get_luminance_filter,
+)
+
+FRAME = 1.0 / 30
+
+
+def feed(luminance_filter, values, start=0.0):
+    return [
+        luminance_filter.update(value, start + index * FRAME) for index, value in enumerate(values)
+    ]
+
+
+def test_ring_buffer_median_of_the_last_readings():
+    buffer = RingBuffer(4)
+    for value in (9.0, 1.0, 2.0, 3.0, 4.0):
+        buffer.push(value)
+
+    assert buffer.count == 4
+    assert buffer.median() == 2.5
+    assert buffer.median_absolute_deviation(2.5) == 1.0
+
+
+def test_median_filter_ignores_a_single_spike():
+    assert feed(MedianFilter(5), [50, 50, 50, 250, 50, 50]) == [50, 50, 50, 50, 50, 50]
+
+
+def test_median_filter_follows_a_step_after_half_the_window():
+    output = feed(MedianFilter(5), [50] * 5 + [150] * 3)
+
+    assert output[5:] == [50, 50, 150]
+
+
+@pytest.mark.parametrize("luminance_filter", [OneEuroFilter(), EmaFilter(0.2), MedianFilter(5)])
+def test_step_input_converges(luminance_filter):
+    output = feed(luminance_filter, [50] * 10 + [150] * 300)
+
+    assert output[9] == pytest.approx(50)
+    assert output[-1] == pytest.approx(150, abs=0.5)
+    # Filtering never overshoots a step
+    assert max(output) <= 150 + 1e-9
+
+
+def test_one_euro_filter_smooths_noise_but_follows_fast_changes():
+    noisy = [100 + (2 if index % 2 else -2) for index in range(60)]
+    smoothed = feed(OneEuroFilter(min_cutoff=0.5, beta=0.05), noisy)
+    assert max(smoothed[30:]) - min(smoothed[30:]) < 1.0
+
+    slow = OneEuroFilter(min_cutoff=0.5, beta=0.0)
+    adaptive = OneEuroFilter(min_cutoff=0.5, beta=0.05)
+    step = [50] * 10 + [200] * 5
+    # A large change raises the cutoff, so the adaptive filter lags less
+    assert feed(adaptive, step)[-1] > feed(slow, step)[-1] + 10
+
+
+def test_one_euro_filter_ignores_repeated_timestamps():
+    one_euro = OneEuroFilter()
+    one_euro.update(50, 1.0)
+
+    assert one_euro.update(200, 1.0) == 50
+
+
+def test_outlier_rejector_drops_a_single_spike():
+    rejector = OutlierRejector(window=5, threshold=3.0, min_deviation=10.0, persistence=3)
+    output = feed(rejector, [50, 51, 49, 50, 200, 50])
+
+    assert output == [50, 51, 49, 50, 50, 50]
+    assert rejector.rejected_count == 1
+
+
+def test_outlier_rejector_accepts_a_persistent_change():
+    rejector = OutlierRejector(window=5, threshold=3.0, min_deviation=10.0, persistence=3)
+    output = feed(rejector, [50, 51, 49, 50, 200, 201, 199, 200])
+
+    # Held for persistence - 1 readings, then the new level passes through
+    assert output[4:6] == [50, 50]
+    assert output[6:] == [199, 200]
+    assert rejector.rejected_count == 2
+
+
+def test_outlier_rejector_passes_small_changes():
+    rejector = OutlierRejector(window=5, threshold=3.0, min_deviation=10.0, persistence=3)
+
+    assert feed(rejector, [50, 50, 50, 50, 58]) == [50, 50, 50, 50, 58]
+
+
+def test_reset_forgets_the_history():
+    rejector = OutlierRejector(window=5, persistence=3)
+    feed(rejector, [50, 50, 50, 50])
+    rejector.reset()
+
+    assert rejector.update(200, 10.0) == 200
+
+
+def test_factory_chains_outlier_rejection_before_smoothing(tmp_path):
+    config = Config(str(tmp_path / "config.json"))
+    chain = get_luminance_filter(config, "median")
+    assert isinstance(chain, FilterChain)
+    assert [type(f) for f in chain.filters] == [OutlierRejector, MedianFilter]
+
+    config.set("brightness", "outlier_rejection", False)
+    assert isinstance(get_luminance_filter(config, "one_euro"), OneEuroFilter)
+    assert isinstance(get_luminance_filter(config, "none"), PassThroughFilter)
@@ -0,0 +1,156 @@
+import struct
+
+import pytest
+
+from src.config import Config
+from src.light_source import (
+    IioLightSensor,
+    IioLightSource,
+    WebcamLightSource,
+    find_illuminance_sensors,
+    get_light_source,
+)
+
+
+def add_sensor(root, name, attributes):
+    """A fake /sys/bus/iio/devices/<name> with the given attribute files"""
+    device = root / name
+    device.mkdir(parents=True)
+    for attribute, value in attributes.items():
+        path = device / attribute
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(f"{value}\n")
+    return device
+
+
+def add_scan_element(device, name, index, scan_type, enabled=1):
+    scan_dir = device / "scan_elements"
+    scan_dir.mkdir(exist_ok=True)
+    (scan_dir / f"{name}_en").write_text(f"{enabled}\n")
+    (scan_dir / f"{name}_index").write_text(f"{index}\n")
+    (scan_dir / f"{name}_type").write_text(f"{scan_type}\n")
+
+
+@pytest.fixture
+def config(tmp_path):
+    config = Config(str(tmp_path / "config.json"))
+    config.set("light_source", "sysfs_root", str(tmp_path / "iio"))
+    config.flush()
+    return config
+
+
+def test_polled_read_applies_scale_and_offset(tmp_path):
+    device = add_sensor(
+        tmp_path,
+        "iio:device0",
+        {"name": "als", "in_illuminance_raw": 100, "in_illuminance_scale": 0.5,
+         "in_illuminance_offset": 10},
+    )
+    sensor = IioLightSensor(str(device))
+    try:
+        assert sensor.label == "als"
+        assert sensor.read_lux() == 55.0
+        # The channel file stays open and is re-read from the start
+        (device / "in_illuminance_raw").write_text("300\n")
+        assert sensor.read_lux() == 155.0
+    finally:
+        sensor.close()
+
+
+def test_processed_value_is_already_in_lux(tmp_path):
+    device = add_sensor(
+        tmp_path, "iio:device0", {"in_illuminance_input": 42.5, "in_illuminance_scale": 0.5}
+    )
+    sensor = IioLightSensor(str(device))
+    try:
+        assert sensor.read_lux() == 42.5
+    finally:
+        sensor.close()
+
+
+def test_scan_layout_aligns_elements(tmp_path):
+    device = add_sensor(tmp_path, "iio:device0", {"in_illuminance_raw": 0})
+    add_scan_element(device, "in_intensity_both", 0, "le:u16/16>>0")
+    add_scan_element(device, "in_illuminance", 1, "be:s12/16>>4")
+    add_scan_element(device, "in_timestamp", 2, "le:s64/64>>0")
+    add_scan_element(device, "in_intensity_ir", 3, "le:u16/16>>0", enabled=0)
+    sensor = IioLightSensor(str(device))
+    try:
+        size, offset, decode = sensor._scan_layout(str(device / "scan_elements"))
+    finally:
+        sensor.close()
+
+    # u16 at 0, the illuminance at 2, the timestamp aligned to 8
+    assert (size, offset) == (16, 2)
+    assert decode(struct.pack(">h", 1000 << 4)) == 1000.0
+    assert decode(struct.pack(">h", -5 << 4)) == -5.0
+
+
+def test_buffered_read_returns_the_newest_sample(tmp_path):
+    device = add_sensor(
+        tmp_path,
+        "iio:device0",
+        {"in_illuminance_raw": 0, "in_illuminance_scale": 2.0,
+         "buffer/length": 0, "buffer/enable": 0},
+    )
+    add_scan_element(device, "in_illuminance", 0, "le:u16/16>>0", enabled=0)
+    add_scan_element(device, "in_timestamp", 1, "le:s64/64>>0")
+    dev_root = tmp_path / "dev"
+    dev_root.mkdir()
+    (dev_root / "iio:device0").write_bytes(
+        struct.pack("<H6xq", 10, 1) + struct.pack("<H6xq", 20, 2)
+    )
+
+    sensor = IioLightSensor(str(device), dev_root=str(dev_root))
+    try:
+        assert sensor.enable_buffer(length=4)
+        assert (device / "buffer" / "enable").read_text() == "1"
+        assert sensor.read_buffered(timeout=1.0) == 40.0
+    finally:
+        sensor.close()
+    assert (device / "buffer" / "enable").read_text() == "0"
+
+
+def test_buffered_read_falls_back_without_scan_elements(tmp_path):
+    device = add_sensor(tmp_path, "iio:device0", {"in_illuminance_raw": 7})
+    sensor = IioLightSensor(str(device), dev_root=str(tmp_path))
+    try:
+        assert not sensor.enable_buffer()
+        assert sensor.read_lux() == 7.0
+    finally:
+        sensor.close()
+
+
+def test_auto_prefers_a_sensor(tmp_path, config):
+    add_sensor(tmp_path / "iio", "iio:device1", {"in_temp_raw": 30})
+    add_sensor(tmp_path / "iio", "iio:device2", {"in_illuminance_raw": 5})
+
+    assert find_illuminance_sensors(str(tmp_path / "iio")) == [
+        str(tmp_path / "iio" / "iio:device2")
+    ]
+    source = get_light_source(config)
+    assert isinstance(source, IioLightSource)
+    assert source.device_dir.endswith("iio:device2")
+
+
+def test_auto_falls_back_to_the_webcam(tmp_path, config):
+    add_sensor(tmp_path / "iio", "iio:device1", {"in_temp_raw": 30})
+
+    assert isinstance(get_light_source(config), WebcamLightSource)
+
+
+def test_sensor_device_selects_among_sensors(tmp_path, config):
+    add_sensor(tmp_path / "iio", "iio:device0", {"in_illuminance_raw": 5})
+    add_sensor(tmp_path / "iio", "iio:device3", {"in_illuminance_input": 5})
+    config.set("light_source", "sensor_device", "iio:device3")
+
+    assert get_light_source(config).device_dir.endswith("iio:device3")
+    config.set("light_source", "sensor_device", "iio:device9")
+    assert isinstance(get_light_source(config), WebcamLightSource)
+
+
+def test_webcam_type_ignores_sensors(tmp_path, config):
+    add_sensor(tmp_path / "iio", "iio:device0", {"in_illuminance_raw": 5})
+    config.set("light_source", "type", "webcam")
+
+    assert isinstance(get_light_source(config), WebcamLightSource)
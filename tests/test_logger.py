@@ -0,0 +1,33 @@
+import time
+
+from src.logger import RateLimiter
+
+
+def test_repeats_beyond_the_burst_are_counted():
+    limiter = RateLimiter(burst=2, interval=60.0)
+    key = (40, "Failed to read %s")
+
+    results = [limiter.allow(key, 40, "Failed to read %s", (f"frame {i}",)) for i in range(5)]
+
+    assert results == [0, 0, None, None, None]
+
+
+def test_quiet_key_is_summarized_with_its_last_arguments():
+    limiter = RateLimiter(burst=1, interval=0.05)
+    for i in range(4):
+        limiter.allow("read", 40, "Failed to read %s", (f"frame {i}",))
+
+    assert limiter.expired() == []
+    time.sleep(0.06)
+    assert limiter.expired() == [(40, "Failed to read %s", ("frame 3",), 3)]
+    # Reported once only
+    assert limiter.expired(force=True) == []
+
+
+def test_next_window_reports_the_suppressed_count():
+    limiter = RateLimiter(burst=1, interval=0.05)
+    for _ in range(3):
+        limiter.allow("read", 40, "Failed to read", ())
+    time.sleep(0.06)
+
+    assert limiter.allow("read", 40, "Failed to read", ()) == 2
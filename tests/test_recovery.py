@@ -0,0 +1,78 @@
+import threading
+import time
+
+from src.metrics import Metrics
+from src.recovery import CaptureSupervisor
+
+
+class FakeReader(threading.Thread):
+    """A reader that blocks until released, as one stuck opening a device"""
+
+    def __init__(self, paused=False):
+        super().__init__(daemon=True)
+        self.paused = paused
+        self.release = threading.Event()
+
+    def run(self):
+        self.release.wait(5.0)
+
+
+def make_supervisor(readers, delivering):
+    """Supervisor whose restarts start the given readers in turn.
+
+    Starting the reader at index delivering publishes a sample right away.
+    """
+    started = []
+
+    def restart():
+        reader = readers[len(started)]
+        started.append(reader)
+        reader.start()
+        if len(started) - 1 == delivering:
+            threading.Thread(target=supervisor.frame_received, daemon=True).start()
+        return reader
+
+    metrics = Metrics()
+    supervisor = CaptureSupervisor(
+        restart, metrics, initial_delay=0.01, max_delay=0.01, attempt_timeout=0.2
+    )
+    return supervisor, metrics, started
+
+
+def wait_until(condition, timeout=3.0):
+    deadline = time.perf_counter() + timeout
+    while not condition() and time.perf_counter() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_hung_reader_counts_as_a_failed_attempt():
+    readers = [FakeReader(), FakeReader()]
+    supervisor, metrics, _ = make_supervisor(readers, delivering=1)
+    try:
+        supervisor.failed("device gone")
+
+        assert wait_until(lambda: not supervisor.recovering)
+        assert supervisor.attempts == 2
+        # The original failure and the attempt that hung
+        assert metrics.counters["capture_failures"] == 2
+    finally:
+        supervisor.stop()
+        for reader in readers:
+            reader.release.set()
+
+
+def test_paused_reader_is_not_replaced():
+    readers = [FakeReader(paused=True), FakeReader()]
+    supervisor, metrics, started = make_supervisor(readers, delivering=1)
+    try:
+        supervisor.failed("device gone")
+        time.sleep(0.6)
+
+        assert len(started) == 1
+        assert supervisor.recovering
+        assert metrics.counters["capture_failures"] == 1
+    finally:
+        supervisor.stop()
+        for reader in readers:
+            reader.release.set()
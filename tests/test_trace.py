@@ -0,0 +1,77 @@
+import pytest
+
+from src.calibration import BrightnessCurve
+from src.config import Config
+from src.trace import FLAG_SMOOTH, TraceRecorder, TraceReplay, read_trace
+
+THRESHOLD = 200
+CURVE = BrightnessCurve.linear(THRESHOLD)
+
+
+@pytest.fixture
+def config(tmp_path):
+    """Defaults, except that luminance goes through unfiltered"""
+    config = Config(str(tmp_path / "config.json"))
+    config.set("brightness", "filter", "none")
+    config.set("brightness", "outlier_rejection", False)
+    config.flush()
+    return config
+
+
+def write_trace(path, samples, capacity=100):
+    """Record (time, measured, flags) samples the way update_frame does"""
+    recorder = TraceRecorder(str(path), capacity)
+    for captured_at, measured, flags in samples:
+        target = CURVE.map(measured)
+        recorder.record(
+            captured_at, measured, measured, measured, target, THRESHOLD, target, flags,
+            (0.0, 0.0, 0.0, 0.0, 0.0),
+        )
+    recorder.close()
+    return read_trace(str(path))
+
+
+def test_ring_keeps_the_most_recent_records(tmp_path):
+    path = tmp_path / "trace.bin"
+    records = write_trace(path, [(float(i), float(i), 0) for i in range(5)], capacity=3)
+
+    assert [record.measured for record in records] == [2.0, 3.0, 4.0]
+    # A new session continues the existing ring
+    assert TraceRecorder(str(path), 3).written == 5
+
+
+def test_replay_reproduces_the_recorded_targets(tmp_path, config):
+    records = write_trace(
+        tmp_path / "trace.bin", [(0.0, 100.0, 0), (1.0, 101.0, 0), (2.0, 160.0, 0), (3.0, 40.0, 0)]
+    )
+    result = TraceReplay(config).run(records)
+
+    assert result.mismatches == 0
+    assert [level for _, _, _, level in result.samples] == [50, 50, 80, 20]
+    # The second sample is within the deadband and writes nothing
+    assert [level for _, level in result.writes] == [50, 80, 20]
+
+
+def test_dropped_write_is_not_reported_as_applied(tmp_path, config):
+    records = write_trace(tmp_path / "trace.bin", [(0.0, 40.0, 0), (1.0, 160.0, 0)])
+    replay = TraceReplay(config)
+    replay.controller.set_brightness = lambda level: False
+    result = replay.run(records)
+
+    assert [target for _, _, target, _ in result.samples] == [20, 80]
+    # The simulated display never left its initial level
+    assert [level for _, _, _, level in result.samples] == [50, 50]
+
+
+def test_smooth_ramp_ends_on_its_target(tmp_path, config):
+    records = write_trace(
+        tmp_path / "trace.bin",
+        [(0.0, 40.0, 0), (0.1, 120.0, FLAG_SMOOTH), (30.0, 121.0, FLAG_SMOOTH)],
+    )
+    result = TraceReplay(config).run(records)
+
+    assert result.mismatches == 0
+    assert result.samples[-1][3] == 60
+    assert result.writes[-1][1] == 60
+    levels = [level for _, level in result.writes]
+    assert levels == sorted(levels)
@@ -0,0 +1,67 @@
+import tracemalloc
+
+import numpy as np
+import pytest
+
+from src.luminance import DownscaleEstimator, FullFrameEstimator, StridedEstimator
+from src.scene import SceneChangeDetector
+from src.v4l2 import YuyvFileCamera
+
+WIDTH, HEIGHT = 1280, 720
+# A copy of the Y plane would take WIDTH * HEIGHT bytes
+SMALL = WIDTH * HEIGHT // 8
+
+
+@pytest.fixture
+def camera(tmp_path):
+    """A raw recording of two frames with a luma gradient and constant chroma"""
+    path = tmp_path / "frames.yuyv"
+    frames = np.empty((2, HEIGHT, WIDTH, 2), dtype=np.uint8)
+    frames[..., 0] = (np.arange(WIDTH) * 200 // WIDTH + 16).astype(np.uint8)
+    frames[1, ..., 0] //= 2
+    frames[..., 1] = 128
+    path.write_bytes(frames.tobytes())
+    camera = YuyvFileCamera(str(path), WIDTH, HEIGHT)
+    yield camera
+    camera.close()
+
+
+def peak_allocation(function, *args):
+    tracemalloc.start()
+    try:
+        function(*args)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def test_frames_are_views_of_the_luma_samples(camera):
+    _, frame = camera.read()
+
+    assert frame.shape == (HEIGHT, WIDTH)
+    assert not frame.flags.owndata
+    assert frame[0, 0] == 16
+    assert frame[0, -1] == 215
+
+
+@pytest.mark.parametrize(
+    "estimator", [DownscaleEstimator(), StridedEstimator(), FullFrameEstimator()]
+)
+def test_metering_does_not_copy_the_frame(camera, estimator):
+    _, frame = camera.read()
+    expected = float(np.mean(frame))
+    estimator.estimate(frame)
+
+    assert peak_allocation(estimator.estimate, frame) < SMALL
+    assert estimator.estimate(frame) == pytest.approx(expected, abs=1.0)
+
+
+def test_scene_detection_does_not_copy_the_frame(camera):
+    detector = SceneChangeDetector()
+    _, first = camera.read()
+    _, second = camera.read()
+    detector.changed(first)
+
+    assert peak_allocation(detector.changed, first) < SMALL
+    assert not detector.changed(first)
+    assert detector.changed(second)